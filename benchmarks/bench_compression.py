@@ -0,0 +1,82 @@
+""" Benchmark of the compressed descriptions: the same full-text synthetic feed is saved to a cache
+with the compression off and to a cache with the compression on, the sizes of the databases
+and the times of the queries are compared.
+
+$ python -m benchmarks.bench_compression [--items 5000] [--paragraphs 8] [--json] [--output results.json] """
+
+import logging
+import os
+import tempfile
+from benchmarks.common import arguments, measure, report
+from benchmarks.synthetic import generate_feed
+
+SOURCE = 'http://bench-compression'
+
+
+def fill_cache(db_path, feed, compression):
+    """The function saves the feed to a new cache database with the compression ('none', 'zlib' or 'zstd')"""
+
+    from reader.compression import COMPRESSION_ENV
+    from reader.db import DBConnector
+    from reader.functions import Parser
+    from reader.models import Item
+
+    os.environ[COMPRESSION_ENV] = compression
+    try:
+        DBConnector.set_db_path(db_path)
+        DBConnector.init_cash_db(Item())
+        Parser(SOURCE).parse_feed(feed, SOURCE)
+    finally:
+        del os.environ[COMPRESSION_ENV]
+    connection = DBConnector.get_connection()
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+    return DBConnector.database_size(connection)['bytes']
+
+
+def cases(parameters) -> dict:
+    from reader.db import DBConnector
+    from reader.models import Item
+
+    def read(limit=0, render=False):
+        def run():
+            for row in DBConnector.iter_rows_from_cash(parameters, limit):
+                item = Item.from_row(row)
+                if render:
+                    item.format_news()
+        return run
+
+    return {
+        'read rows': read(),
+        'read rows, render 20': read(limit=20, render=True),
+        'read and render rows': read(render=True),
+        'search, limit 20': lambda: list(DBConnector.iter_search_from_cash('news', parameters, 20)),
+    }
+
+
+def main():
+    args = arguments(__doc__, items=5000, paragraphs=8, repeat=5)
+    from reader.compression import codec
+    from reader.db import DBConnector
+
+    logging.getLogger('rss_reader_logger').disabled = True
+    old_path = DBConnector.get_db_path()
+    feed = generate_feed(args.items, SOURCE, images=0, seed=1, paragraphs=args.paragraphs)
+    results = dict()
+    sizes = dict()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for compression in ('none', codec()):
+                db_path = os.path.join(directory, f'compression_{compression}.db')
+                sizes[compression] = fill_cache(db_path, feed, compression)
+                for case, func in cases({'source': SOURCE}).items():
+                    results[f'{case} ({compression})'] = measure(func, repeat=args.repeat)
+                DBConnector.close_connection()
+    finally:
+        DBConnector.set_db_path(old_path)
+    sizes = ', '.join(f'{compression} {size / 2 ** 20:.1f} MB' for compression, size in sizes.items())
+    report(f'Compressed descriptions, {args.items} items of {args.paragraphs} paragraph(s), database: {sizes}',
+           results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+""" Benchmark of the publication date parsing: email.utils / datetime against reader.dates.parse_pubdate
+on the mix of the pubDate formats met in the real feeds.
+
+$ python -m benchmarks.bench_dates [--dates N] [--json] """
+
+import random
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from reader.dates import parse_pubdate
+from benchmarks.common import arguments, measure, report
+
+# strftime formats of the pubDate values seen in the feeds
+FORMATS = (
+    '%a, %d %b %Y %H:%M:%S %z',     # Tue, 26 Oct 2021 12:02:57 +0300
+    '%a, %d %b %Y %H:%M:%S GMT',    # Tue, 26 Oct 2021 09:02:57 GMT
+    '%d %b %Y %H:%M:%S %z',         # 26 Oct 2021 12:02:57 +0300
+    '%a, %d %b %Y %H:%M %z',        # Tue, 26 Oct 2021 12:02 +0300
+    '%a, %d %b %y %H:%M:%S %z',     # Tue, 26 Oct 21 12:02:57 +0300
+    '%Y-%m-%dT%H:%M:%S%z',          # 2021-10-26T12:02:57+0300
+    '%Y-%m-%dT%H:%M:%SZ',           # 2021-10-26T09:02:57Z
+    '%Y-%m-%d %H:%M:%S.%f',         # 2021-10-26 12:02:57.440933
+    '%a, %d %B %Y %H:%M:%S EST',    # Tue, 26 October 2021 12:02:57 EST
+)
+
+
+def sample_dates(count, seed=1) -> list:
+    """The function returns `count` pubDate strings of random times and formats"""
+
+    generator = random.Random(seed)
+    start = datetime(2015, 1, 1, tzinfo=timezone(timedelta(hours=3)))
+    dates = []
+    for _ in range(count):
+        moment = start + timedelta(seconds=generator.randrange(10 * 365 * 24 * 3600))
+        text = moment.strftime(generator.choice(FORMATS))
+        # single-digit days are common too: 'Tue, 5 Oct 2021 ...'
+        dates.append(text.replace(', 0', ', ', 1))
+    return dates
+
+
+def stdlib_parse(text):
+    """The function parses the date with the standard library only"""
+
+    try:
+        return parsedate_to_datetime(text).timestamp()
+    except (TypeError, ValueError):
+        try:
+            return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+
+
+def main():
+    args = arguments(__doc__, dates=5000)
+    dates = sample_dates(args.dates)
+    failed = sum(1 for text in dates if parse_pubdate(text)[0] is None)
+    results = {
+        'email.utils / fromisoformat': measure(lambda: [stdlib_parse(text) for text in dates], repeat=3),
+        'parse_pubdate': measure(lambda: [parse_pubdate(text) for text in dates], repeat=3),
+    }
+    report(f'Date parsing, {args.dates} dates, {failed} not parsed', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+""" Benchmark of the ingest with the duplicate detection over growing caches: the time of an ingest
+should grow with the number of the new items, not with the size of the cache.
+
+$ python -m benchmarks.bench_dedup [--sizes 1000,2000,4000,8000] [--json] [--output results.json] """
+
+import os
+import random
+import tempfile
+from benchmarks.common import arguments, measure, report
+from benchmarks.synthetic import WORDS
+
+BATCH = 500
+
+
+def make_items(start, count, rnd):
+    from reader.models import Item
+    return [Item(guid=f'dedup-{num}', source=f'http://dedup/{num % 20}', title=' '.join(rnd.choices(WORDS, k=8)),
+                 description=' '.join(rnd.choices(WORDS, k=40)), pubdate='2021-12-01T10:00:00+00:00')
+            for num in range(start, start + count)]
+
+
+def main():
+    args = arguments(__doc__, sizes='1000,2000,4000,8000')
+    from reader.db import DBConnector
+    from reader.models import Item
+
+    old_path = DBConnector.get_db_path()
+    results = dict()
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for size in [int(size) for size in args.sizes.split(',')]:
+                rnd = random.Random(size)
+                DBConnector.set_db_path(os.path.join(directory, f'dedup_{size}.db'))
+                DBConnector.init_cash_db(Item())
+                DBConnector.ingest(make_items(0, size, rnd))
+                batches = iter(range(size, size + 3 * BATCH, BATCH))
+                # the time of one batch of the new items ingested into the cache of `size` items
+                result = measure(lambda: DBConnector.ingest(make_items(next(batches), BATCH, rnd)), repeat=3)
+                result['cache'] = size
+                results[f'ingest {BATCH} into {size}'] = result
+    finally:
+        DBConnector.set_db_path(old_path)
+    report('Ingest with the duplicate detection', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
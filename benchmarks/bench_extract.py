@@ -0,0 +1,36 @@
+""" Benchmark of the description extraction: BeautifulSoup html.parser against DescriptionExtractor.
+
+$ python -m benchmarks.bench_extract [--items N] [--json] """
+
+from bs4 import BeautifulSoup
+from reader.extract import extract_description
+from benchmarks.common import arguments, measure, report
+
+DESCRIPTION = ('<p><a href="https://realt.onliner.by/2021/10/26/kak-obstavit-spalnyu">'
+               '<img src="https://content.onliner.by/news/thumbnail/1b233fe4fd9c41c0e3c52149adea9c9e.jpeg" alt="" />'
+               '</a></p><p>Как думаете, существует ли идеальный интерьер спальни, в котором приятно просыпаться '
+               'каждое утро и чувствовать себя героем какого-нибудь голливудского фильма?</p>'
+               '<p><a href="https://realt.onliner.by/2021/10/26/kak-obstavit-spalnyu">Читать далее…</a></p>')
+
+
+def soup_extract(html_description, link=''):
+    """The approach used before DescriptionExtractor: one BeautifulSoup tree per description"""
+
+    description_soup = BeautifulSoup(html_description, "html.parser")
+    links = [a.get("href") for a in description_soup.findAll("a") if a.get("href") and a.get("href") != link]
+    images = [image.get("src") for image in description_soup.findAll("img") if image.get("src")]
+    return description_soup.text, list(set(links)), list(set(images))
+
+
+def main():
+    args = arguments(__doc__, items=1000)
+    descriptions = [DESCRIPTION.replace('1b233fe4', f'{num:08x}') for num in range(args.items)]
+    results = {
+        'BeautifulSoup html.parser': measure(lambda: [soup_extract(d) for d in descriptions], repeat=3),
+        'DescriptionExtractor': measure(lambda: [extract_description(d) for d in descriptions], repeat=3),
+    }
+    report(f'Description extraction, {args.items} descriptions', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+""" Benchmark of the full-text search over the cache.
+
+$ python -m benchmarks.bench_search [--items N] [--json] """
+
+import os
+import random
+import tempfile
+from reader.db import DBConnector
+from reader.models import Item
+from benchmarks.common import arguments, measure, report
+
+WORDS = [f'word{num}' for num in range(5000)]
+
+
+def fill_cache(count, chunk=5000):
+    """The function fills the cache database with `count` ITEMS of random words"""
+
+    rnd = random.Random(1)
+    DBConnector.init_cash_db(Item())
+    for start in range(0, count, chunk):
+        DBConnector.ingest([Item(guid=f'bench-{num}', source=f'http://bench/{num % 20}',
+                                 title=' '.join(rnd.choices(WORDS, k=8)),
+                                 description=' '.join(rnd.choices(WORDS, k=60)),
+                                 category=rnd.choices(WORDS[:50], k=2),
+                                 pubdate=f'Wed, {1 + num % 28:02d} Dec 2021 10:00:00 +0000')
+                            for num in range(start, min(start + chunk, count))])
+
+
+def main():
+    args = arguments(__doc__, items=100000)
+
+    def search(query, parameters=None, snippets=False):
+        return lambda: list(DBConnector.iter_search_from_cash(query, parameters or {}, 20, snippets))
+
+    old_path = DBConnector.get_db_path()
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            DBConnector.set_db_path(os.path.join(directory, 'bench_search.db'))
+            fill_cache(args.items)
+            results = {
+                'rare word, limit 20': measure(search('word4999')),
+                'two words, limit 20': measure(search('word10 word20')),
+                'rare word + source + date': measure(search('word4999', {'source': 'http://bench/1',
+                                                                         'filter_date': '2021-12-02'})),
+                'rare word with snippets': measure(search('word4999', snippets=True)),
+                'LIKE scan (before FTS)': measure(lambda: list(DBConnector.get_connection().execute(
+                    "select guid from ITEMS where title like '%word4999%' or description like '%word4999%' limit 20")),
+                    repeat=3),
+            }
+        finally:
+            DBConnector.set_db_path(old_path)
+    report(f'Full-text search, {args.items} items', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
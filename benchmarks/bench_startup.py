@@ -0,0 +1,44 @@
+""" Benchmark of the CLI startup: the import time of the modules and the end-to-end time
+of `rss_reader --version` and of a cache-only query (--date) in a fresh interpreter.
+
+$ python -m benchmarks.bench_startup [--items N] [--json] """
+
+import os
+import subprocess
+import sys
+import tempfile
+from benchmarks.common import arguments, measure, report
+
+
+def run(*args, env=None):
+    subprocess.run([sys.executable, *args], check=True, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def fill_cache(db_path, count):
+    """The function fills the cache database with `count` items of one day in a separate process"""
+
+    code = ('from reader.db import DBConnector; from reader.models import Item; DBConnector.init_cash_db(Item()); '
+            f'DBConnector.ingest([Item(guid=f"startup-{{num}}", title=f"News {{num}}", source="startup", '
+            f'pubdate="Tue, 26 Oct 2021 12:02:57 +0300") for num in range({count})])')
+    run('-c', code, env=dict(os.environ, RSS_READER_DB=db_path))
+
+
+def main():
+    args = arguments(__doc__, items=100, number=5)
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, 'rss_cash.db')
+        fill_cache(db_path, args.items)
+        env = dict(os.environ, RSS_READER_DB=db_path)
+        results = {
+            'python -c pass': measure(lambda: run('-c', 'pass'), args.number),
+            'import reader.__main__': measure(lambda: run('-c', 'import reader.__main__'), args.number),
+            'import reader.functions': measure(lambda: run('-c', 'import reader.functions'), args.number),
+            'rss_reader --version': measure(lambda: run('-m', 'reader', '--version'), args.number),
+            'rss_reader --date --limit 10': measure(lambda: run('-m', 'reader', '--date', '20211026', '--limit', '10',
+                                                                env=env), args.number),
+        }
+    report(f'CLI startup, {args.items} cached items', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
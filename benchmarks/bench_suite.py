@@ -0,0 +1,122 @@
+""" Benchmark suite of the stages of rss_reader over the synthetic feeds served by a local HTTP server:
+fetching and parsing a feed (Parser.update_cash_db) on the first and on a steady-state poll
+(reading the whole feed or stopping after 50 known items),
+the description extraction, the ingest into SQLite, the cache query and the HTML, JSON and PDF rendering.
+
+$ python -m benchmarks.bench_suite [--sizes 100,1000,10000] [--stages parse,extract,...] [--images 1]
+                                   [--pdf-items 200] [--repeat 3] [--json] [--output results.json]
+
+Compare two saved runs with: python -m benchmarks.compare old.json new.json """
+
+import io
+import logging
+import os
+import tempfile
+from benchmarks.common import arguments, measure, report
+from benchmarks.synthetic import SyntheticServer, generate_feed
+
+STAGES = ('parse', 'poll', 'poll_stop', 'extract', 'ingest', 'query', 'html', 'json', 'pdf')
+
+
+class Suite:
+    """Runs the stages for one feed size. Every round of parse and ingest writes to a new database,
+    which is created before the round and is not timed"""
+
+    def __init__(self, server, directory, size, images=1, pdf_items=200):
+        from reader.db import DBConnector
+        from reader.extract import extract_description
+        from reader.functions import Parser
+
+        self.db, self.extract = DBConnector, extract_description
+        self.directory = directory
+        self.rounds = 0
+        self.url = server.url(f'/feed/{size}')
+        server.feeds[f'/feed/{size}'] = generate_feed(size, server.base_url, images, seed=size)
+        self.pdf_items = pdf_items
+
+        self.new_database()
+        self.parser = Parser(self.url)
+        self.items = self.parser.update_cash_db()
+        self.descriptions = [(item.html_description, item.link) for item in self.items]
+
+    def new_database(self):
+        from reader.models import Item
+        self.rounds += 1
+        self.db.set_db_path(os.path.join(self.directory, f'bench_{self.rounds}.db'))
+        self.db.init_cash_db(Item())
+
+    def parse(self):
+        self.parser.update_cash_db()
+
+    def poll(self):
+        # the feed was not changed, but its body is parsed again (no ETag and no body hash)
+        self.parser.process_feed(self.parser.fetch_feed(conditional=False))
+
+    def poll_stop(self):
+        # the same, but the parsing stops after 50 known items in a row
+        self.parser.stop_after_known = 50
+        try:
+            self.poll()
+        finally:
+            self.parser.stop_after_known = 0
+
+    def extract_all(self):
+        for description, link in self.descriptions:
+            self.extract(description, link)
+
+    def ingest(self):
+        self.db.ingest(self.items)
+
+    def query(self):
+        self.db.select_items_from_cash({'source': self.url.lower()})
+
+    def html(self):
+        from reader.export import write_html
+        write_html(self.items, os.path.join(self.directory, 'RSS_ITEMS.html'))
+
+    def json(self):
+        from reader.output import ItemWriter
+        with ItemWriter(io.StringIO(), as_json=True) as writer:
+            for item in self.items:
+                writer.write_item(item)
+
+    def pdf(self):
+        self.parser.create_and_fill_pdf_file(self.directory, self.items[:self.pdf_items])
+
+    def run(self, stages, repeat) -> dict:
+        cases = {'parse': self.parse, 'poll': self.poll, 'poll_stop': self.poll_stop, 'extract': self.extract_all,
+                 'ingest': self.ingest, 'query': self.query, 'html': self.html, 'json': self.json, 'pdf': self.pdf}
+        setups = {'parse': self.new_database, 'ingest': self.new_database}
+        return {stage: measure(cases[stage], repeat=repeat, setup=setups.get(stage)) for stage in stages}
+
+
+def main():
+    args = arguments(__doc__, sizes='100,1000', stages=','.join(STAGES), images=1, pdf_items=200, repeat=3)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    stages = [stage for stage in args.stages.split(',') if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise SystemExit(f'Unknown stage(s): {", ".join(sorted(unknown))}')
+
+    from reader.db import DBConnector
+    from reader.images import ImageCache
+
+    logging.getLogger('rss_reader_logger').disabled = True
+    old_path = DBConnector.get_db_path()
+    results = dict()
+    with tempfile.TemporaryDirectory() as directory, SyntheticServer() as server:
+        try:
+            for size in sizes:
+                suite = Suite(server, directory, size, args.images, args.pdf_items)
+                suite.parser.image_cache = ImageCache(os.path.join(directory, 'images'))
+                for stage, result in suite.run(stages, args.repeat).items():
+                    result['items'] = min(size, args.pdf_items) if stage == 'pdf' else size
+                    results[f'{stage} {size}'] = result
+                suite.parser.image_cache.close()
+        finally:
+            DBConnector.set_db_path(old_path)
+    report(f'Suite, {args.images} image(s) per item', results, args.json, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+""" Helpers of the benchmarks """
+
+import argparse
+import json
+import platform
+import sqlite3
+import time
+from datetime import datetime, timezone
+
+
+def measure(func, number=1, repeat=5, setup=None) -> dict:
+    """The function runs func `number` times in `repeat` rounds and returns the best and the mean
+    time of one call in seconds. setup is called before every call and is not timed"""
+
+    rounds = []
+    for _ in range(repeat):
+        if setup is None:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            rounds.append((time.perf_counter() - start) / number)
+            continue
+        elapsed = 0.0
+        for _ in range(number):
+            setup()
+            start = time.perf_counter()
+            func()
+            elapsed += time.perf_counter() - start
+        rounds.append(elapsed / number)
+    return {'best': min(rounds), 'mean': sum(rounds) / len(rounds), 'number': number, 'repeat': repeat}
+
+
+def arguments(description, **defaults) -> argparse.Namespace:
+    """The function parses the common command line arguments of a benchmark"""
+
+    ap = argparse.ArgumentParser(description=description)
+    ap.add_argument("--json", action="store_true", help="Print the results as JSON")
+    ap.add_argument("--output", type=str, help="Save the results as JSON to the file")
+    for name, value in defaults.items():
+        ap.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    return ap.parse_args()
+
+
+def environment() -> dict:
+    """The function returns the versions and the platform of the run, so the results can be compared"""
+
+    from reader import __version__
+    return {'rss_reader': __version__, 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'machine': platform.machine(),
+            'time': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+
+
+def report(name, results: dict, as_json=False, output=None):
+    """The function prints the results of the benchmark: {case: measure() result}
+    and saves them with the environment of the run to the output file if it is set"""
+
+    payload = {'benchmark': name, 'environment': environment(), 'results': results}
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=4)
+    if as_json:
+        print(json.dumps(payload, indent=4))
+        return
+    print(name)
+    for case, result in results.items():
+        print(f"  {case:<32} best {result['best'] * 1000:10.3f} ms   mean {result['mean'] * 1000:10.3f} ms")
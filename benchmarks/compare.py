@@ -0,0 +1,51 @@
+""" Comparison of two saved runs of a benchmark (--output): the best time of every case and the ratio.
+
+$ python -m benchmarks.compare OLD.json NEW.json [--threshold 1.1] """
+
+import argparse
+import json
+
+
+def load(path) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(old: dict, new: dict) -> list:
+    """The function returns [(case, old best, new best, new / old)] of the cases of both runs"""
+
+    rows = []
+    for case, result in new['results'].items():
+        if case in old['results']:
+            before, after = old['results'][case]['best'], result['best']
+            rows.append((case, before, after, after / before if before else float('inf')))
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("old", help="Saved results of the baseline run")
+    ap.add_argument("new", help="Saved results of the new run")
+    ap.add_argument("--threshold", type=float, default=1.1,
+                    help="Ratio of the best times above which a case is marked as slower")
+    args = ap.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    for run in (old, new):
+        environment = run.get('environment', {})
+        print(f"{run['benchmark']}: rss_reader {environment.get('rss_reader', '?')}, "
+              f"Python {environment.get('python', '?')}, {environment.get('time', '?')}")
+    slower = 0
+    for case, before, after, ratio in compare(old, new):
+        mark = ''
+        if ratio > args.threshold:
+            mark = '  slower'
+            slower += 1
+        elif ratio < 1 / args.threshold:
+            mark = '  faster'
+        print(f"  {case:<32} {before * 1000:10.3f} ms -> {after * 1000:10.3f} ms  x{ratio:6.2f}{mark}")
+    raise SystemExit(1 if slower else 0)
+
+
+if __name__ == '__main__':
+    main()
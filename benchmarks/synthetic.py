@@ -0,0 +1,110 @@
+""" Synthetic RSS feeds and the local HTTP server which serves them to the benchmarks.
+
+The feeds are generated from a seed, so every run of a benchmark parses the same bytes:
+RSS 2.0 with guid, pubDate, categories and an HTML description with links and images. """
+
+import random
+import struct
+import threading
+import zlib
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Vocabulary of pronounceable words, the texts draw from it with a Zipf-like distribution like real news
+_SYLLABLES = [consonant + vowel for consonant in 'bdgklmnprstvz' for vowel in 'aeiou']
+WORDS = [''.join(random.Random(num).choices(_SYLLABLES, k=1 + num % 3)) for num in range(5000)]
+_WEIGHTS = [1 / (rank + 1) for rank in range(len(WORDS))]
+CATEGORIES = ('Realty', 'Auto', 'Tech', 'People', 'Money', 'Sport', 'Weather', 'Culture', 'Health', 'Travel')
+
+# 2021-10-26 00:00:00 UTC, the items are published every 10 minutes before it
+START = 1635206400
+IMAGE_VARIANTS = 16
+
+
+def png(red: int, green: int, blue: int, size=8) -> bytes:
+    """The function returns a PNG image of the size filled with the color"""
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    row = b'\x00' + bytes((red, green, blue)) * size
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(row * size)) + chunk(b'IEND', b''))
+
+
+def _sentence(rnd, words):
+    return ' '.join(rnd.choices(WORDS, _WEIGHTS, k=words)).capitalize()
+
+
+def generate_feed(count: int, base_url='http://127.0.0.1', images=1, categories=2, seed=0,
+                  title='Synthetic feed', paragraphs=0) -> bytes:
+    """The function returns RSS 2.0 XML of `count` items, the newest first. Every item has `images`
+    images (base_url/images/N.png), up to `categories` categories and `paragraphs` more paragraphs
+    of the text in the description (a full-text feed)"""
+
+    rnd = random.Random(seed)
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>{title}</title>'
+             f'<link>{base_url}/</link><description>{title}</description><language>en</language>']
+    for num in range(count):
+        link = f'{base_url}/news/{seed}/{num}'
+        pictures = ''.join(f'<img src="{base_url}/images/{rnd.randrange(IMAGE_VARIANTS)}.png" alt="" />'
+                           for _ in range(images))
+        description = (f'<p><a href="{link}">{pictures}</a></p><p>{_sentence(rnd, 40)}.</p>'
+                       f'<p>{_sentence(rnd, 25)}. <a href="{base_url}/tags/{rnd.choice(WORDS)}">More</a></p>' +
+                       ''.join(f'<p>{_sentence(rnd, 60)}.</p>' for _ in range(paragraphs)))
+        parts.append(f'<item><title>{_sentence(rnd, 8)}</title><link>{link}</link><guid>{link}</guid>'
+                     f'<pubDate>{formatdate(START - num * 600)}</pubDate>')
+        parts.extend(f'<category>{name}</category>'
+                     for name in rnd.sample(CATEGORIES, rnd.randint(0, categories)))
+        parts.append(f'<description><![CDATA[{description}]]></description></item>')
+    parts.append('</channel></rss>')
+    return ''.join(parts).encode('utf-8')
+
+
+class SyntheticServer:
+    """Context manager which serves the synthetic feeds and images on a free local port.
+    `feeds` maps a path to the body of the feed"""
+
+    def __init__(self, feeds=None):
+        self.feeds = dict(feeds or {})
+        self.images = {f'/images/{num}.png': png(num * 16, 255 - num * 16, 128) for num in range(IMAGE_VARIANTS)}
+
+    @property
+    def base_url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def url(self, path):
+        return self.base_url + path
+
+    def __enter__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                body = server.feeds.get(self.path) or server.images.get(self.path)
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                image = self.path.startswith('/images/')
+                self.send_header('Content-Type', 'image/png' if image else 'application/rss+xml')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.server.shutdown()
+        self.server.server_close()
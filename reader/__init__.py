@@ -1 +1,3 @@
+""" Pure Python command-line RSS reader """
 
+__version__ = '1.5'
@@ -1,9 +1,23 @@
-""" Module = entry_points """
+""" Module = entry_points
 
-from reader.functions import Parser
+The heavy modules (requests, lxml, fpdf, sqlite3, ...) are imported only by the commands which use them,
+so the short commands like --version start fast. """
+
+from reader import __version__
+from reader.dates import parse_bound
 from datetime import datetime
 import time
 import argparse
+import json
+import sys
+
+
+def read_feed_list(path):
+    """ Function to read RSS URLs from the feed-list file: one URL per line, # starts a comment. """
+
+    with open(path, encoding='utf-8') as f:
+        lines = [line.split('#', 1)[0].strip() for line in f]
+    return [line for line in lines if line]
 
 
 def init_arguments():
@@ -12,51 +26,236 @@ def init_arguments():
     ap = argparse.ArgumentParser(description="Pure Python command-line RSS reader.", add_help=True)
     ap.add_argument("--date", type=lambda str_date: datetime.strptime(str_date, '%Y%m%d').date(),
                     help="Gets a date in %%Y%%m%%d format. Print news from the specified date.")
+    ap.add_argument("--from", type=parse_bound, dest="date_from", metavar="DATE",
+                    help="Gets a date (%%Y%%m%%d, %%Y-%%m-%%d or ISO 8601 date and time, UTC if no offset). "
+                         "Print news published since the date, newest first.")
+    ap.add_argument("--to", type=lambda str_date: parse_bound(str_date, end=True), dest="date_to", metavar="DATE",
+                    help="Gets a date like --from. Print news published before the end of the date, newest first.")
     ap.add_argument("--to-html", type=str,
                     help="Gets file path. Convert news to html and save them to html file.")
     ap.add_argument("--to-pdf", type=str,
                     help="Gets file path. Convert news to pdf and save them to pdf file.")
+    ap.add_argument("--pdf-workers", type=int, default=1, metavar="N",
+                    help="Render the pdf file in N processes: the news are split into numbered pdf files "
+                         "with an html index (or one merged file with --pdf-merge).")
+    ap.add_argument("--pdf-shard-size", type=int, default=500, metavar="N",
+                    help="Number of news in one pdf file with --pdf-workers (default 500).")
+    ap.add_argument("--pdf-merge", action="store_true",
+                    help="Merge the pdf files of --pdf-workers into one file (requires pypdf).")
     ap.add_argument("--version", action="store_true", help="Print version info")
     ap.add_argument("--json", action="store_true", help="Print result as JSON in stdout")
+    ap.add_argument("--json-lines", action="store_true",
+                    help="Print result as JSON Lines in stdout: one compact JSON object per news. "
+                         "The other messages are printed to stderr.")
     ap.add_argument("--colorize", action="store_true", help="Print the result in colorized mode in stdout.")
     ap.add_argument("--verbose", action="store_true", help="Outputs verbose status messages")
+    ap.add_argument("--profile", action="store_true",
+                    help="Print the timings of the stages, the counters and the peak memory of the run as JSON "
+                         "to stderr at the end of the run.")
+    ap.add_argument("--profile-output", type=str, metavar="PATH",
+                    help="Save the report of --profile to PATH instead of printing it, implies --profile.")
+    ap.add_argument("--cprofile", type=str, metavar="PATH",
+                    help="Save the cProfile statistics of the run to PATH (pstats format), implies --profile.")
     ap.add_argument("--limit", type=int, help="Limit news topics if this parameter provided")
-    ap.add_argument("source", type=str, nargs="?", help="RSS URL")
-    return ap.parse_args()
+    ap.add_argument("--search", type=str,
+                    help="Search news in the cache by keywords (FTS5 query syntax). "
+                         "Can be combined with --date, source and --limit.")
+    ap.add_argument("--snippets", action="store_true", help="Print the found fragment of the news with --search")
+    ap.add_argument("--category", type=str,
+                    help="Print only the news of the category. Can be combined with --date, source and --limit.")
+    ap.add_argument("--top-categories", type=int, metavar="N",
+                    help="Print N most frequent categories of every source and day of the cache "
+                         "(restricted by --date and source if they are provided).")
+    ap.add_argument("--stats", action="store_true",
+                    help="Print the statistics of the cache: the news of every source and day, the news by the hour "
+                         "of the publication (UTC) and the most frequent categories. "
+                         "Can be combined with --date, --from, --to, --category and source.")
+    ap.add_argument("--stats-top", type=int, default=10, metavar="N",
+                    help="Number of the most frequent categories of --stats (default 10).")
+    ap.add_argument("--collapse-duplicates", action="store_true",
+                    help="Print one news of every cluster of duplicates (the same story of several sources "
+                         "or republished with a new guid). The pages of --after are collapsed separately.")
+    ap.add_argument("--after", type=str,
+                    help="Gets a cursor printed by the previous run with --limit. Print the next page of news.")
+    ap.add_argument("--feeds", type=read_feed_list, default=[],
+                    help="Gets file path. Read RSS URLs from the feed-list file, one URL per line.")
+    ap.add_argument("--workers", type=int, default=8,
+                    help="Maximum number of feeds fetched at the same time (multi-source mode).")
+    ap.add_argument("--per-host", type=int, default=2,
+                    help="Maximum number of feeds fetched at the same time from one host (multi-source mode).")
+    ap.add_argument("--deadline", type=float, default=60.0,
+                    help="Overall time limit in seconds for fetching all the feeds (multi-source mode).")
+    ap.add_argument("--stop-after-known", type=int, default=0, metavar="N",
+                    help="Stop reading a feed after N cached news in a row (the feeds list the newest news first).")
+    ap.add_argument("--db", type=str,
+                    help="Gets file path. Path to the cache database (default: $RSS_READER_DB "
+                         "or ~/.cache/rss_reader/rss_cash.db).")
+    ap.add_argument("source", type=str, nargs="*", help="RSS URL(s)")
+    arguments = ap.parse_args()
+    if arguments.search and arguments.after:
+        ap.error("--after can not be used with --search")
+    return arguments
 
 
-def main():
-    """Receives the elements passed by the user and runs them for execution."""
+def print_top_categories(rows, as_json=False):
+    """ Function to print the most frequent categories as a table or JSON. """
 
-    start = time.time()
-    arguments = init_arguments()
-    parser = Parser(arguments.source, arguments.date, arguments.limit, arguments.verbose)
+    if as_json:
+        print(json.dumps(rows, indent=4, ensure_ascii=False))
+        return
+    if not rows:
+        print('The categories list is empty')
+        return
+    print(f"{'Source':<40} {'Date':<10} {'Items':>6}  Category")
+    for row in rows:
+        print(f"{row['source']:<40} {row['filter_date']:<10} {row['items']:>6}  {row['category']}")
+
+
+def print_stats(stats, as_json=False):
+    """ Function to print the statistics of the cache as tables or JSON. """
+
+    if as_json:
+        print(json.dumps(stats, indent=4, ensure_ascii=False))
+        return
+    if not stats['volume']:
+        print('The news list is empty')
+        return
+    print(f"{'Source':<40} {'Date':<10} {'Items':>6}")
+    for row in stats['volume']:
+        print(f"{row['source']:<40} {row['filter_date']:<10} {row['items']:>6}")
+
+    most = max(row['items'] for row in stats['hours']) or 1
+    print(f"\n{'Hour (UTC)':<10} {'Items':>6}")
+    for row in stats['hours']:
+        print(f"{row['hour']:02d}:00      {row['items']:>6}  {'#' * round(40 * row['items'] / most)}")
+
+    if stats['categories']:
+        print(f"\n{'Category':<40} {'Items':>6}")
+        for row in stats['categories']:
+            print(f"{row['category']:<40} {row['items']:>6}")
+
+
+def save_profile(arguments):
+    """ Function to print or save the report of --profile and the cProfile statistics of --cprofile. """
+
+    from reader import instrument
+
+    report = instrument.report()
+    if arguments.cprofile and instrument.dump_profile(arguments.cprofile):
+        report['cprofile'] = arguments.cprofile
+    text = json.dumps(report, indent=4)
+    if arguments.profile_output:
+        with open(arguments.profile_output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text, file=sys.stderr)
+
+
+def run(arguments, start):
+    """Runs the command of the parsed arguments."""
+
+    from reader.db.DBConnector import set_db_path
+    from reader.functions import Parser
+    from reader.output import ItemWriter
+
+    if arguments.db:
+        set_db_path(arguments.db)
+    parser = Parser(arguments.source + arguments.feeds, arguments.date, arguments.limit, arguments.verbose,
+                    arguments.after)
+    parser.max_workers = arguments.workers
+    parser.per_host = arguments.per_host
+    parser.deadline = arguments.deadline
+    parser.search = arguments.search
+    parser.snippets = arguments.snippets
+    parser.category = arguments.category
+    parser.date_from = arguments.date_from
+    parser.date_to = arguments.date_to
+    parser.collapse = arguments.collapse_duplicates
+    parser.stop_after_known = max(0, arguments.stop_after_known)
+    parser.pdf_workers = arguments.pdf_workers
+    parser.pdf_shard_size = max(1, arguments.pdf_shard_size)
+    parser.pdf_merge = arguments.pdf_merge
     parser.logger.info(f'Start program with: {arguments}')
 
-    if arguments.version:
-        print(parser.version)
+    if arguments.top_categories:
+        print_top_categories(parser.get_top_categories(arguments.top_categories), arguments.json)
+    elif arguments.stats:
+        print_stats(parser.get_stats(max(1, arguments.stats_top)), arguments.json)
     else:
-        items_list = parser.get_items()
-        if len(items_list) == 0:
-            print('The news list is empty')
+        # With JSON Lines stdout holds only the news, the messages go to stderr
+        messages = sys.stderr if arguments.json_lines else sys.stdout
+        writer = ItemWriter(sys.stdout, arguments.json, arguments.colorize, arguments.json_lines)
+
+        if arguments.to_pdf:
+            items = parser.get_items()
+            if items:
+                pdf_file = parser.create_and_fill_pdf_file(arguments.to_pdf, items)
+                print(f'PDF file was saved: {pdf_file}', file=messages)
         else:
-            if arguments.to_pdf:
-                pdf_file = parser.create_and_fill_pdf_file(arguments.to_pdf, items_list)
-                print(f'PDF file was saved: {pdf_file}')
+            items = parser.iter_items()
+
+        def written(items_to_write):
+            for item in items_to_write:
+                writer.write_item(item)
+                yield item
 
+        with writer:
             if arguments.to_html:
-                html_file = parser.create_and_fill_html_file(arguments.to_html, items_list)
-                print(f'HTML file was saved: {html_file}')
+                # The news are printed while they are streamed to the html file
+                html_file = parser.create_and_fill_html_file(arguments.to_html, written(items))
+                if html_file:
+                    writer.flush()
+                    print(f'HTML file was saved: {html_file}', file=messages)
+            else:
+                for _ in written(items):
+                    pass
+        if writer.count == 0:
+            print('The news list is empty', file=messages)
 
-            for item in items_list:
-                if arguments.colorize:
-                    item.colorized(arguments.json)
-                else:
-                    item.print_news(arguments.json)
+        if parser.next_cursor:
+            print(f'Next page: --after {parser.next_cursor}', file=sys.stderr)
+
+        if parser.failed_sources:
+            print(f'Failed to get {len(parser.failed_sources)} source(s):', file=sys.stderr)
+            for source, error in parser.failed_sources.items():
+                print(f'  {source}: {error}', file=sys.stderr)
 
     parser.logger.info(f'Took time : {time.time() - start}')
     parser.logger.info(2 * '\n')
 
 
+def main():
+    """Receives the elements passed by the user and runs them for execution."""
+
+    if sys.argv[1:2] == ['watch']:
+        from reader.watch import main as watch
+        watch(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['maintenance']:
+        from reader.maintenance import main as maintenance
+        maintenance(sys.argv[2:])
+        return
+    if sys.argv[1:2] == ['serve']:
+        from reader.serve import main as serve
+        serve(sys.argv[2:])
+        return
+
+    start = time.time()
+    arguments = init_arguments()
+    if arguments.version:
+        print(__version__)
+        return
+    if arguments.profile or arguments.profile_output or arguments.cprofile:
+        from reader import instrument
+        instrument.enable(memory=True, profiler=bool(arguments.cprofile))
+        try:
+            run(arguments, start)
+        finally:
+            instrument.disable()
+            save_profile(arguments)
+    else:
+        run(arguments, start)
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,75 @@
+""" Module of the compression of the large text columns of the cache database.
+
+A text of at least MIN_SIZE characters is saved as a BLOB: one byte of the codec and the compressed UTF-8 text.
+A shorter text stays TEXT, so the small values are read as they are. The codec is zstd if the `zstandard`
+package is installed and zlib otherwise; the RSS_READER_COMPRESSION environment variable selects
+'zstd', 'zlib' or 'none'. Both codecs are always read. """
+
+import os
+import zlib
+
+COMPRESSION_ENV = 'RSS_READER_COMPRESSION'
+
+# Characters of the smallest compressed text and the zlib level
+MIN_SIZE = 512
+ZLIB_LEVEL = 6
+
+ZLIB = b'\x01'
+ZSTD = b'\x02'
+
+_zstd = None
+
+
+def _zstandard():
+    """The function returns the zstandard module or None if it is not installed"""
+
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd or None
+
+
+def codec() -> str:
+    """The function returns the codec of the new values: 'zstd', 'zlib' or 'none'"""
+
+    name = os.environ.get(COMPRESSION_ENV, '').lower()
+    if name in ('none', 'zlib'):
+        return name
+    if name in ('', 'zstd') and _zstandard() is not None:
+        return 'zstd'
+    return 'zlib'
+
+
+def compress_text(text, name=None):
+    """The function returns the value of the text for the cache database: the compressed BLOB
+    or the text itself if it is short, compression is off or compression does not make it smaller"""
+
+    name = name or codec()
+    if not isinstance(text, str) or len(text) < MIN_SIZE or name == 'none':
+        return text
+    data = text.encode('utf-8')
+    if name == 'zstd':
+        value = ZSTD + _zstandard().ZstdCompressor().compress(data)
+    else:
+        value = ZLIB + zlib.compress(data, ZLIB_LEVEL)
+    return value if len(value) < len(data) else text
+
+
+def decompress_text(value):
+    """The function returns the text of the value of the cache database (TEXT, NULL or the compressed BLOB)"""
+
+    if not isinstance(value, bytes):
+        return value
+    header, data = value[:1], value[1:]
+    if header == ZLIB:
+        return zlib.decompress(data).decode('utf-8')
+    if header == ZSTD:
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise ValueError('The cache is compressed with zstd, install the zstandard package to read it')
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    raise ValueError('Unknown compression of the cached value')
@@ -0,0 +1,134 @@
+""" Module for parsing the publication dates of the news.
+
+RSS feeds mostly use the RFC 822 format ('Tue, 26 Oct 2021 12:02:57 +0300'), but ISO 8601,
+single-digit days, named time zones and missing seconds are common as well.
+The common formats are parsed with regular expressions, the rest with email.utils. """
+
+import re
+from calendar import monthrange, timegm
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+_months = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12,
+}
+
+# Offsets of the named time zones in minutes (RFC 822 and the common abbreviations)
+_zones = {
+    'gmt': 0, 'ut': 0, 'utc': 0, 'z': 0,
+    'est': -300, 'edt': -240, 'cst': -360, 'cdt': -300, 'mst': -420, 'mdt': -360, 'pst': -480, 'pdt': -420,
+    'cet': 60, 'cest': 120, 'eet': 120, 'eest': 180, 'msk': 180, 'bst': 60, 'ist': 330, 'jst': 540,
+}
+
+_rfc822 = re.compile(
+    r'^\s*(?:[A-Za-z]+,?\s*)?(\d{1,2})[\s-]+([A-Za-z]{3})[A-Za-z]*\.?[\s-]+(\d{2,4})\s+'
+    r'(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\.\d+)?\s*([+-]\d{2}:?\d{2}|[A-Za-z]{1,5})?')
+
+_iso8601 = re.compile(
+    r'^\s*(\d{4})-(\d{1,2})-(\d{1,2})(?:[T\s](\d{1,2}):(\d{2})(?::(\d{2})(?:[.,]\d+)?)?)?'
+    r'\s*(Z|[+-]\d{2}(?::?\d{2})?)?\s*$', re.IGNORECASE)
+
+
+def _year(year: str) -> int:
+    value = int(year)
+    if len(year) == 2:
+        value += 2000 if value < 50 else 1900
+    return value
+
+
+@lru_cache(maxsize=256)
+def _offset(zone) -> int:
+    """The function returns the offset of the zone ('+0300', '+03:00', '-05', 'GMT') in minutes or None"""
+
+    if not zone:
+        return 0
+    if zone[0] in '+-':
+        digits = zone[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + (int(digits[2:4]) if len(digits) > 2 else 0)
+        return -minutes if zone[0] == '-' else minutes
+    return _zones.get(zone.lower())
+
+
+@lru_cache(maxsize=1024)
+def _month(year, month) -> tuple:
+    """The function returns (UTC epoch of the first day, number of days) of the month"""
+
+    return timegm((year, month, 1, 0, 0, 0, 0, 0, 0)), monthrange(year, month)[1]
+
+
+def _result(year, month, day, hour, minute, second, offset):
+    """The function returns (UTC epoch, 'YYYY-MM-DD' date as written in the source) or None"""
+
+    if offset is None or not (1 <= month <= 12 and hour <= 24 and minute < 60 and second <= 61):
+        return None
+    start, days = _month(year, month)
+    if not 1 <= day <= days:
+        return None
+    epoch = start + (day - 1) * 86400 + hour * 3600 + minute * 60 + min(second, 59) - offset * 60
+    return epoch, f'{year:04d}-{month:02d}-{day:02d}'
+
+
+def parse_pubdate(pubdate):
+    """The function parses the publication date.
+    Returns (UTC epoch seconds, 'YYYY-MM-DD' date in the time zone of the source)
+    or (None, None) if the date can not be parsed. A date without a time zone is treated as UTC"""
+
+    text = str(pubdate or '')
+    if text[4:5] == '-' and text[:4].isdigit():
+        # ISO 8601: datetime.fromisoformat is the fastest, the regular expression covers the rest
+        try:
+            moment = datetime.fromisoformat(text)
+        except ValueError:
+            moment = None
+        if moment is not None:
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=timezone.utc)
+            return int(moment.timestamp()), moment.strftime('%Y-%m-%d')
+
+    match = _rfc822.match(text)
+    if match:
+        day, month, year, hour, minute, second, zone = match.groups()
+        month = _months.get(month.lower())
+        if month:
+            result = _result(_year(year), month, int(day), int(hour), int(minute), int(second or 0), _offset(zone))
+            if result:
+                return result
+
+    match = _iso8601.match(text)
+    if match:
+        year, month, day, hour, minute, second, zone = match.groups()
+        result = _result(int(year), int(month), int(day), int(hour or 0), int(minute or 0), int(second or 0),
+                         _offset(zone))
+        if result:
+            return result
+
+    from email.utils import parsedate_tz
+
+    parsed = parsedate_tz(text) if text else None
+    if parsed:
+        year, month, day, hour, minute, second = parsed[:6]
+        result = _result(_year(str(year)), month, day, hour, minute, second, (parsed[9] or 0) // 60)
+        if result:
+            return result
+    return None, None
+
+
+def parse_bound(text: str, end=False) -> int:
+    """The function converts the --from / --to argument ('YYYYMMDD', 'YYYY-MM-DD' or ISO 8601 date and time)
+    into UTC epoch seconds. A date without a time is the start of the day,
+    or the start of the next day for the end of the range"""
+
+    text = text.strip()
+    if re.fullmatch(r'\d{8}', text):
+        text = f'{text[:4]}-{text[4:6]}-{text[6:]}'
+    epoch, _ = parse_pubdate(text)
+    if epoch is None:
+        raise ValueError(f'Wrong date {text}')
+    if end and re.fullmatch(r'\d{4}-\d{1,2}-\d{1,2}', text):
+        epoch += 24 * 60 * 60
+    return epoch
+
+
+def epoch_to_datetime(epoch) -> datetime:
+    return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(seconds=epoch)
@@ -1,115 +1,1167 @@
 """ A module for working with a cache database """
+import base64
+import heapq
+import itertools
+import json
+import logging
+import os
 from os import path
+from pathlib import Path
+import queue
+import shutil
 import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from reader.dates import parse_pubdate, epoch_to_datetime
+from reader import dedup, instrument
+from reader.compression import MIN_SIZE, codec, compress_text, decompress_text
 
-DIRECTORY = path.abspath(path.dirname(__file__))
 DB_NAME = 'rss_cash.db'
+DB_PATH_ENV = 'RSS_READER_DB'
+# The cache of the versions which kept it in the package directory
+LEGACY_DB_PATH = path.join(path.abspath(path.dirname(__file__)), DB_NAME)
+
+# Milliseconds to wait for the lock of another process before "database is locked"
+BUSY_TIMEOUT = 30000
+
+PRAGMAS = (
+    # Takes effect only in a new database, `rss_reader maintenance` converts the old ones
+    'PRAGMA auto_vacuum = INCREMENTAL',
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT}',
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA temp_store = MEMORY',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 134217728',
+)
+
+_db_path = None
+_connection = None
+_connection_pid = None
+_lock = threading.RLock()
+
+
+def default_db_path() -> str:
+    """The function returns the path of the cache database:
+    $RSS_READER_DB or rss_cash.db in the user cache directory"""
+
+    if os.environ.get(DB_PATH_ENV):
+        return os.environ[DB_PATH_ENV]
+    cache_home = os.environ.get('XDG_CACHE_HOME') or path.join(path.expanduser('~'), '.cache')
+    return path.join(cache_home, 'rss_reader', DB_NAME)
+
+
+def move_legacy_db(db_path=None) -> bool:
+    """The function moves the cache of the old versions from the package directory to the default path
+    once: if the old cache exists and the new one does not. If the old one can not be removed
+    (a read-only installation), it is copied. Returns True if the cache was moved or copied"""
+
+    db_path = db_path or default_db_path()
+    if path.exists(db_path) or not path.isfile(LEGACY_DB_PATH):
+        return False
+    os.makedirs(path.dirname(path.abspath(db_path)), exist_ok=True)
+    logger = logging.getLogger("rss_reader_logger")
+    try:
+        shutil.move(LEGACY_DB_PATH, db_path)
+        logger.info(f'The cache database is moved from {LEGACY_DB_PATH} to {db_path}')
+    except OSError:
+        shutil.copy2(LEGACY_DB_PATH, db_path)
+        logger.info(f'The cache database is copied from {LEGACY_DB_PATH} to {db_path}')
+    return True
+
+
+def get_db_path() -> str:
+    return _db_path or default_db_path()
+
+
+def set_db_path(db_path) -> None:
+    """The function changes the path of the cache database and closes the connection to the old one"""
+
+    global _db_path
+    with _lock:
+        close_connection()
+        _db_path = path.abspath(path.expanduser(db_path)) if db_path else None
+
+
+def connect(db_path=None) -> sqlite3.Connection:
+    """The function opens a new connection to the cache database with the tuned pragmas.
+    Transactions are managed explicitly by the SQLite context manager"""
+
+    db_path = db_path or get_db_path()
+    directory = path.dirname(path.abspath(db_path))
+    if not path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT / 1000, isolation_level=None,
+                                 check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    connection.create_function('decompress', 1, decompress_text, deterministic=True)
+    return connection
+
+
+def get_connection() -> sqlite3.Connection:
+    """The function returns the connection of the current process. It is opened on the first call
+    and reopened in a forked child, because a connection must not be shared between processes.
+    The cache of the old versions is moved to the default path before the first connection to it"""
+
+    global _connection, _connection_pid
+    with _lock:
+        if _connection is None or _connection_pid != os.getpid():
+            if _db_path is None and not os.environ.get(DB_PATH_ENV):
+                move_legacy_db()
+            _connection = connect()
+            _connection_pid = os.getpid()
+        return _connection
+
+
+def close_connection() -> None:
+    """The function closes the connection of the current process"""
+
+    global _connection, _connection_pid
+    with _lock:
+        if _connection is not None and _connection_pid == os.getpid():
+            _connection.close()
+        _connection = None
+        _connection_pid = None
+
+
+class ConnectionPool:
+    """ Pool of the read-only connections to the cache database for the concurrent readers (`rss_reader serve`).
+
+    The connections are opened on demand up to `size`, a reader waits for a free connection when all are taken.
+    Every read runs in its own transaction, so the readers see the last committed snapshot (WAL mode)
+    without the lock of the process connection."""
+
+    def __init__(self, size=8, db_path=None):
+        self.size = size
+        self.db_path = db_path
+        self.opened = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def _get(self) -> sqlite3.Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.opened < self.size:
+                connection = connect(self.db_path)
+                connection.execute('PRAGMA query_only = ON')
+                self.opened += 1
+                return connection
+        return self.idle.get()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def read(self, func, *args, **kwargs):
+        """The function calls func(cursor, *args, **kwargs) in a read transaction
+        of a connection of the pool and returns its result"""
+
+        connection = self._get()
+        try:
+            cursor = connection.cursor()
+            cursor.execute('BEGIN')
+            try:
+                return func(cursor, *args, **kwargs)
+            finally:
+                connection.rollback()
+        finally:
+            self.idle.put(connection)
+
+    def close(self):
+        """The function closes the idle connections of the pool"""
+
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self.lock:
+                self.opened -= 1
 
 
 class SQLite:
-    """ Creates a context manager for working with Sqlite """
+    """ Creates a context manager for working with Sqlite.
 
-    def __init__(self, file='rss_cash.db'):
-        self.file = path.join(DIRECTORY, file)
+    Uses the long-lived connection of the process. A writer takes the write lock at once
+    (BEGIN IMMEDIATE), so concurrent writers wait for each other in the busy handler
+    while readers keep reading the last committed snapshot (WAL mode)."""
+
+    def __init__(self, write=True):
+        self.write = write
 
     def __enter__(self):
-        self.connect = sqlite3.connect(self.file)
-        self.connect.row_factory = sqlite3.Row
+        _lock.acquire()
+        try:
+            self.connect = get_connection()
+            self.owner = not self.connect.in_transaction
+            if self.owner:
+                self.connect.execute('BEGIN IMMEDIATE' if self.write else 'BEGIN')
+        except BaseException:
+            _lock.release()
+            raise
         return self.connect.cursor()
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        self.connect.commit()
-        self.connect.close()
+        try:
+            if self.owner and self.connect.in_transaction:
+                if exc_type is None:
+                    self.connect.commit()
+                else:
+                    self.connect.rollback()
+        finally:
+            _lock.release()
 
 
-def init_cash_db(item_obj) -> bool:
-    """The function creates an sqlite database based on the received fields of the item object"""
+# Columns of the ITEMS table which are managed by the cache and not by the Item object.
+# raw_hash is the hash of the raw fields of the <item>, an unchanged known item is skipped by the parser
+SERVICE_COLUMNS = {'content_hash': 'TEXT', 'raw_hash': 'TEXT'}
+
+# Multi-valued fields of the ITEM are kept in the child tables keyed by guid.
+# They are read back as ';'-joined columns of the same names
+LIST_COLUMNS = {
+    'category': "(SELECT group_concat(name, ';') FROM ITEM_CATEGORIES WHERE ITEM_CATEGORIES.guid = ITEMS.guid)",
+    'links': "(SELECT group_concat(url, ';') FROM ITEM_LINKS "
+             "WHERE ITEM_LINKS.guid = ITEMS.guid AND ITEM_LINKS.kind = 'link')",
+    'image_links': "(SELECT group_concat(url, ';') FROM ITEM_LINKS "
+                   "WHERE ITEM_LINKS.guid = ITEMS.guid AND ITEM_LINKS.kind = 'image')",
+}
+
+# Columns of the SOURCES table: the HTTP validators and the guids of the feed (in its order, one per line)
+# of the last poll and the registry of the feeds polled by `rss_reader watch` with their schedule and statistics
+SOURCE_COLUMNS = {
+    'etag': 'TEXT', 'last_modified': 'TEXT', 'body_hash': 'TEXT',
+    'url': 'TEXT', 'watched': 'INTEGER NOT NULL DEFAULT 0', 'poll_interval': 'REAL', 'next_poll': 'REAL',
+    'failures': 'INTEGER NOT NULL DEFAULT 0', 'last_error': 'TEXT', 'last_fetch': 'REAL', 'last_latency': 'REAL',
+    'last_new': 'INTEGER', 'last_change': 'REAL', 'polls': 'INTEGER NOT NULL DEFAULT 0',
+    'new_items': 'INTEGER NOT NULL DEFAULT 0', 'ttl': 'INTEGER', 'skip_hours': 'TEXT', 'guids': 'TEXT',
+}
+
+# Days to remember the guids of the pruned ITEMS, the archived ones are remembered while the archive exists
+REMOVED_DAYS = 180
+
+# Columns of the ITEMS table which are not TEXT
+COLUMN_TYPES = {'published': 'INTEGER'}
+
+# Large text columns of the ITEMS table. Their long values are saved compressed (reader.compression),
+# the Item decompresses them on the first access and the SQL function decompress() reads them in the queries
+COMPRESSED_COLUMNS = ('description', 'html_description')
 
-    fields = ''
-    for field in item_obj.get_fields():
-        fields += field + ' TEXT,'
+# The cluster of the duplicates of the ITEM: the guid of the first cached ITEM of the cluster
+CLUSTER_COLUMN = "coalesce((SELECT cluster FROM ITEM_FINGERPRINTS " \
+                 "WHERE ITEM_FINGERPRINTS.guid = ITEMS.guid), ITEMS.guid)"
 
-    fields = fields[:len(fields) - 1]
+# Version of the layout of the cache database (PRAGMA user_version).
+# It is increased by every new table or index, a database of this version has all of them
+SCHEMA_VERSION = 5
+
+
+def _schema_ready(cursor, columns: dict) -> bool:
+    """The function checks without the write lock that the cache database has the current layout:
+    the current version and all the columns of the ITEMS and SOURCES tables"""
+
+    if cursor.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+        return False
+    existing = {row['name'] for row in cursor.execute('PRAGMA table_info(ITEMS)')}
+    existing_sources = {row['name'] for row in cursor.execute('PRAGMA table_info(SOURCES)')}
+    return set(columns) <= existing and set(SOURCE_COLUMNS) <= existing_sources
+
+
+def init_cash_db(item_obj) -> bool:
+    """The function creates an sqlite database based on the received fields of the item object.
+    The write lock is taken only if the database has to be created or migrated,
+    so the commands which only read the cache do not wait for the writers"""
+
+    columns = {field: COLUMN_TYPES.get(field, 'TEXT') for field in item_obj.get_fields() if field not in LIST_COLUMNS}
+    columns.update(SERVICE_COLUMNS)
+    fields = ', '.join(f'{column} {column_type}' for column, column_type in columns.items())
     fields = fields.replace('guid TEXT', 'guid TEXT NOT NULL UNIQUE')
 
+    with SQLite(write=False) as cursor:
+        if _schema_ready(cursor, columns):
+            return True
     with SQLite() as cursor:
         cursor.execute(f"""CREATE TABLE IF NOT EXISTS ITEMS({fields}); """)
+        existing = {row['name'] for row in cursor.execute('PRAGMA table_info(ITEMS)')}
+        for column, column_type in columns.items():
+            if column not in existing:
+                cursor.execute(f"""ALTER TABLE ITEMS ADD COLUMN {column} {column_type}; """)
         cursor.execute(f"""CREATE INDEX IF NOT EXISTS filter_date on ITEMS (filter_date); """)
         cursor.execute(f"""CREATE INDEX IF NOT EXISTS source_filter_date on ITEMS (source, filter_date); """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS published on ITEMS (published); """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS source_published on ITEMS (source, published); """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS source_guid on ITEMS (source, guid, raw_hash); """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS ITEM_CATEGORIES(guid TEXT NOT NULL, name TEXT NOT NULL,
+                           PRIMARY KEY (guid, name)) WITHOUT ROWID; """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS categories_name
+                           on ITEM_CATEGORIES (name COLLATE NOCASE, guid); """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS ITEM_LINKS(guid TEXT NOT NULL, kind TEXT NOT NULL,
+                           url TEXT NOT NULL, PRIMARY KEY (guid, kind, url)) WITHOUT ROWID; """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS ITEM_FINGERPRINTS(guid TEXT NOT NULL PRIMARY KEY,
+                           exact TEXT, simhash INTEGER, cluster TEXT NOT NULL) WITHOUT ROWID; """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS fingerprints_exact on ITEM_FINGERPRINTS (exact); """)
+        cursor.execute(f"""CREATE INDEX IF NOT EXISTS fingerprints_cluster on ITEM_FINGERPRINTS (cluster); """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS ITEM_BANDS(band INTEGER NOT NULL, value INTEGER NOT NULL,
+                           guid TEXT NOT NULL, PRIMARY KEY (band, value, guid)) WITHOUT ROWID; """)
+        source_fields = ', '.join(f'{column} {column_type}' for column, column_type in SOURCE_COLUMNS.items())
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS SOURCES(source TEXT NOT NULL UNIQUE, {source_fields}); """)
+        existing_sources = {row['name'] for row in cursor.execute('PRAGMA table_info(SOURCES)')}
+        for column, column_type in SOURCE_COLUMNS.items():
+            if column not in existing_sources:
+                cursor.execute(f"""ALTER TABLE SOURCES ADD COLUMN {column} {column_type}; """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS ARCHIVES(month TEXT NOT NULL PRIMARY KEY, path TEXT NOT NULL,
+                           items INTEGER NOT NULL DEFAULT 0, archived REAL); """)
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS REMOVED_ITEMS(guid TEXT NOT NULL PRIMARY KEY, source TEXT,
+                           raw_hash TEXT, month TEXT, removed REAL) WITHOUT ROWID; """)
+        _migrate(cursor, existing)
+        _init_fts(cursor)
     return True
 
 
+def _migrate(cursor, existing: set):
+    """The function moves the data of the old layouts of the cache database to the current one.
+    Version 1: category, links and image_links are moved from the ';'-joined columns to the child tables.
+    Version 2: published (UTC epoch) is filled and filter_date is fixed by the parsed pubdate.
+    Version 3: the fingerprints of the cached ITEMS are computed and the duplicates are clustered.
+    Version 4: the long descriptions are compressed.
+    Version 5: the index of the SimHashes is rebuilt with the keys of the pairs of the blocks"""
+
+    version = cursor.execute('PRAGMA user_version').fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    legacy = [column for column in LIST_COLUMNS if column in existing]
+    if version < 1 and legacy:
+        not_empty = ' or '.join(f"coalesce({column}, '') != ''" for column in legacy)
+        rows = cursor.execute(f"SELECT guid, {', '.join(legacy)} FROM ITEMS WHERE {not_empty}").fetchall()
+        lists = dict()
+        for row in rows:
+            lists[row['guid']] = {column: (row[column] or '').split(';') for column in legacy}
+        _write_lists(cursor, lists)
+        cursor.execute(f"UPDATE ITEMS SET {', '.join(f'{column} = NULL' for column in legacy)}")
+
+    if version < 2:
+        rows = cursor.execute('SELECT rowid, pubdate, filter_date FROM ITEMS WHERE published IS NULL').fetchall()
+        values = []
+        for row in rows:
+            published, filter_date = parse_pubdate(row['pubdate'])
+            if published is not None:
+                values.append((published, filter_date, row['rowid']))
+        cursor.executemany('UPDATE ITEMS SET published = ?, filter_date = ? WHERE rowid = ?', values)
+
+    if version < 3:
+        rows = cursor.execute('SELECT guid, title, description FROM ITEMS ORDER BY rowid').fetchall()
+        _write_fingerprints(cursor, {row['guid']: (row['title'], row['description']) for row in rows})
+
+    if version < 4:
+        _compress_columns(cursor)
+
+    if 3 <= version < 5:
+        cursor.execute('DELETE FROM ITEM_BANDS')
+        rows = cursor.execute('SELECT guid, simhash FROM ITEM_FINGERPRINTS WHERE simhash IS NOT NULL')
+        cursor.executemany('INSERT OR IGNORE INTO ITEM_BANDS(band, value, guid) VALUES(?, ?, ?)',
+                           [(band, value, row['guid']) for row in rows.fetchall()
+                            for band, value in dedup.bands(row['simhash'])])
+
+    cursor.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+
+def _compress_columns(cursor) -> int:
+    """The function compresses the long TEXT values of COMPRESSED_COLUMNS, which were saved before
+    the compression or with the compression off. Returns the number of the compressed values"""
+
+    name = codec()
+    if name == 'none':
+        return 0
+    count = 0
+    for column in COMPRESSED_COLUMNS:
+        rows = cursor.execute(f"SELECT rowid, {column} FROM ITEMS "
+                              f"WHERE typeof({column}) = 'text' AND length({column}) >= ?", [MIN_SIZE]).fetchall()
+        values = [(compress_text(row[column], name), row['rowid']) for row in rows]
+        values = [(value, rowid) for value, rowid in values if isinstance(value, bytes)]
+        cursor.executemany(f'UPDATE ITEMS SET {column} = ? WHERE rowid = ?', values)
+        count += len(values)
+    return count
+
+
+def compress_items() -> int:
+    """The function compresses the long descriptions of the cache database which are saved uncompressed.
+    Returns the number of the compressed values"""
+
+    with SQLite() as cursor:
+        return _compress_columns(cursor)
+
+
+def _write_lists(cursor, lists: dict):
+    """The function replaces the rows of the child tables of the received guids.
+    `lists` is {guid: {'category': [...], 'links': [...], 'image_links': [...]}}"""
+
+    guids = list(lists)
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        condition = f"guid in ({', '.join('?' * len(chunk))})"
+        cursor.execute(f"DELETE FROM ITEM_CATEGORIES WHERE {condition}", chunk)
+        cursor.execute(f"DELETE FROM ITEM_LINKS WHERE {condition}", chunk)
+
+    cursor.executemany("INSERT OR IGNORE INTO ITEM_CATEGORIES(guid, name) VALUES(?, ?)",
+                       ((guid, name) for guid, fields in lists.items()
+                        for name in fields.get('category', ()) if name))
+    cursor.executemany("INSERT OR IGNORE INTO ITEM_LINKS(guid, kind, url) VALUES(?, ?, ?)",
+                       ((guid, kind, url) for guid, fields in lists.items()
+                        for kind, column in (('link', 'links'), ('image', 'image_links'))
+                        for url in fields.get(column, ()) if url))
+
+
+def _find_cluster(cursor, guid, exact, simhash):
+    """The function returns the cluster of the cached duplicate of the ITEM or None.
+    The exact duplicate is found by the index of the hashes. The near-duplicates are the ITEMS which share
+    a key of the SimHash (the primary key of ITEM_BANDS), the nearest within dedup.MAX_DISTANCE is taken"""
+
+    if exact is None:
+        return None
+    row = cursor.execute('SELECT cluster FROM ITEM_FINGERPRINTS WHERE exact = ? AND guid != ? LIMIT 1',
+                         [exact, guid]).fetchone()
+    if row is not None:
+        return row['cluster']
+    if simhash is None:
+        return None
+
+    best = None
+    seen = set()
+    for band, value in dedup.bands(simhash):
+        for row in cursor.execute("""SELECT ITEM_BANDS.guid, ITEM_FINGERPRINTS.simhash, ITEM_FINGERPRINTS.cluster
+                                     FROM ITEM_BANDS JOIN ITEM_FINGERPRINTS ON ITEM_FINGERPRINTS.guid = ITEM_BANDS.guid
+                                     WHERE ITEM_BANDS.band = ? AND ITEM_BANDS.value = ? AND ITEM_BANDS.guid != ?""",
+                                  [band, value, guid]):
+            if row['guid'] in seen:
+                continue
+            seen.add(row['guid'])
+            distance = dedup.distance(simhash, row['simhash'])
+            if distance <= dedup.MAX_DISTANCE and (best is None or distance < best[0]):
+                best = (distance, row['cluster'])
+    return best[1] if best else None
+
+
+def _delete_bands(cursor, guids: list):
+    """The function removes the keys of the SimHashes of the guids from ITEM_BANDS by its primary key"""
+
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        rows = cursor.execute(f"SELECT guid, simhash FROM ITEM_FINGERPRINTS "
+                              f"WHERE guid in ({', '.join('?' * len(chunk))}) AND simhash IS NOT NULL", chunk)
+        cursor.executemany('DELETE FROM ITEM_BANDS WHERE band = ? AND value = ? AND guid = ?',
+                           [(band, value, row['guid']) for row in rows.fetchall()
+                            for band, value in dedup.bands(row['simhash'])])
+
+
+def _write_fingerprints(cursor, texts: dict) -> dict:
+    """The function fingerprints the ITEMS one by one, so the duplicates inside one batch are clustered too.
+    `texts` is {guid: (title, description)}. Returns {guid: cluster}"""
+
+    clusters = dict()
+    for guid, (title, description) in texts.items():
+        exact, simhash = dedup.fingerprint(title, description)
+        cluster = _find_cluster(cursor, guid, exact, simhash) or guid
+        _delete_bands(cursor, [guid])
+        cursor.execute('INSERT OR REPLACE INTO ITEM_FINGERPRINTS(guid, exact, simhash, cluster) VALUES(?, ?, ?, ?)',
+                       [guid, exact, simhash, cluster])
+        if simhash is not None:
+            cursor.executemany('INSERT OR IGNORE INTO ITEM_BANDS(band, value, guid) VALUES(?, ?, ?)',
+                               ((band, value, guid) for band, value in dedup.bands(simhash)))
+        clusters[guid] = cluster
+    return clusters
+
+
+def _item_columns(cursor) -> str:
+    """The function returns the columns of the ITEMS query: rowid, the columns of the ITEMS table,
+    the multi-valued fields read from the child tables and the cluster of the duplicates"""
+
+    names = [row['name'] for row in cursor.execute('PRAGMA table_info(ITEMS)') if row['name'] not in LIST_COLUMNS]
+    return ', '.join(['ITEMS.rowid'] + [f'ITEMS.{name}' for name in names] +
+                     [f'{expression} AS {name}' for name, expression in LIST_COLUMNS.items()] +
+                     [f'{CLUSTER_COLUMN} AS cluster'])
+
+
+# Columns of the full-text index and their bm25 weights
+FTS_COLUMNS = {'title': 10.0, 'description': 1.0, 'category': 5.0}
+
+
+def _init_fts(cursor):
+    """The function creates the FTS5 index of the ITEMS (rowid of the index = rowid of the ITEMS)
+    and fills it with the ITEMS which are already in the cache"""
+
+    if cursor.execute("select 1 from sqlite_master where name = 'ITEMS_FTS'").fetchone():
+        return
+    try:
+        cursor.execute(f"""CREATE VIRTUAL TABLE ITEMS_FTS USING fts5({', '.join(FTS_COLUMNS)},
+                           tokenize = 'unicode61 remove_diacritics 2'); """)
+    except sqlite3.OperationalError:
+        # SQLite is built without FTS5, --search is not available
+        return
+    weights = ', '.join(str(weight) for weight in FTS_COLUMNS.values())
+    cursor.execute(f"INSERT INTO ITEMS_FTS(ITEMS_FTS, rank) VALUES('rank', 'bm25({weights})')")
+    cursor.execute(f"""INSERT INTO ITEMS_FTS(rowid, {', '.join(FTS_COLUMNS)})
+                       SELECT rowid, {', '.join(_fts_expressions())} FROM ITEMS""")
+
+
+def _fts_expressions() -> list:
+    return [LIST_COLUMNS.get(column, f'decompress({column})' if column in COMPRESSED_COLUMNS else column)
+            for column in FTS_COLUMNS]
+
+
+def _has_fts(cursor) -> bool:
+    return cursor.execute("select 1 from sqlite_master where name = 'ITEMS_FTS'").fetchone() is not None
+
+
+def _update_fts(cursor, guids: list, delete_only=False):
+    """The function replaces the rows of the full-text index of the received guids by the current data"""
+
+    if not _has_fts(cursor):
+        return
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        condition = f"guid in ({', '.join('?' * len(chunk))})"
+        cursor.execute(f"DELETE FROM ITEMS_FTS WHERE rowid in (SELECT rowid FROM ITEMS WHERE {condition})", chunk)
+        if not delete_only:
+            cursor.execute(f"""INSERT INTO ITEMS_FTS(rowid, {', '.join(FTS_COLUMNS)})
+                               SELECT rowid, {', '.join(_fts_expressions())} FROM ITEMS WHERE {condition}""", chunk)
+
+
+def select_source(source) -> dict:
+    """The function returns the saved HTTP validators (etag, last_modified, body_hash) of the source"""
+
+    with SQLite(write=False) as cursor:
+        row = cursor.execute('select * from SOURCES where source = ?', [source]).fetchone()
+    return dict(row) if row is not None else dict()
+
+
+def save_source(source, **fields) -> bool:
+    """The function saves the received fields of the source to the cache database"""
+
+    columns = ['source'] + list(fields)
+    q_text = f"INSERT INTO SOURCES({', '.join(columns)}) VALUES({', '.join('?' * len(columns))}) " \
+             f"ON CONFLICT(source) DO UPDATE SET {', '.join(f'{key} = excluded.{key}' for key in fields)};"
+
+    with SQLite() as cursor:
+        cursor.execute(q_text, [source] + list(fields.values()))
+    return True
+
+
+def select_watched_sources() -> list:
+    """The function returns the sources of the watch registry as dictionaries, the next to poll first"""
+
+    with SQLite(write=False) as cursor:
+        rows = cursor.execute('select * from SOURCES where watched = 1 order by coalesce(next_poll, 0), source')
+        return [dict(row) for row in rows]
+
+
+# SQLite limits the number of host parameters in one statement
+MAX_VARIABLES = 500
+
+
+def _select_content_hashes(cursor, guids: list) -> dict:
+    """The function returns {guid: (content_hash, raw_hash)} of the received guids which are already in the cache"""
+
+    result = dict()
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        q_text = f"select guid, content_hash, raw_hash from ITEMS where guid in ({', '.join('?' * len(chunk))})"
+        for row in cursor.execute(q_text, chunk):
+            result[row['guid']] = (row['content_hash'], row['raw_hash'])
+    return result
+
+
+def select_known_guids(source) -> dict:
+    """The function returns {guid: raw_hash} of the cached ITEMS of the source.
+    It is a range scan of the covering index source_guid"""
+
+    with SQLite(write=False) as cursor:
+        rows = cursor.execute('select guid, raw_hash from ITEMS where source = ? and raw_hash is not null', [source])
+        return {guid: raw_hash for guid, raw_hash in rows}
+
+
+def select_rows_by_guids(guids: list) -> dict:
+    """The function returns {guid: sqlite3.Row} of the cached ITEMS of the guids"""
+
+    result = dict()
+    with SQLite(write=False) as cursor:
+        columns = _item_columns(cursor)
+        for start in range(0, len(guids), MAX_VARIABLES):
+            chunk = guids[start:start + MAX_VARIABLES]
+            q_text = f"SELECT {columns} FROM ITEMS WHERE guid in ({', '.join('?' * len(chunk))})"
+            for row in cursor.execute(q_text, chunk):
+                result[row['guid']] = row
+    return result
+
+
+def ingest(items_list: list) -> dict:
+    """The function saves the received ITEMS LIST to the cache database in one transaction.
+    Only new ITEMS and ITEMS with the changed content are written, they are fingerprinted
+    and linked to the cluster of their duplicates (item.cluster).
+    Returns the numbers of inserted, updated and unchanged ITEMS"""
+
+    counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+    if not items_list:
+        return counts
+
+    rows = dict()
+    items = dict()
+    name = codec()
+    for item in items_list:
+        row = item.serialize()
+        row.update((column, getattr(item, column)) for column in COLUMN_TYPES)
+        row.update((column, compress_text(row[column], name)) for column in COMPRESSED_COLUMNS)
+        row['content_hash'] = item.content_hash()
+        row['raw_hash'] = item.raw_hash
+        rows[item.guid] = row
+        items[item.guid] = item
+
+    columns = [field for field in items_list[0].get_fields() if field not in LIST_COLUMNS] + list(SERVICE_COLUMNS)
+    q_text = f"INSERT INTO ITEMS({', '.join(columns)}) VALUES({', '.join('?' * len(columns))}) " \
+             f"ON CONFLICT(guid) DO UPDATE SET " \
+             f"{', '.join(f'{column} = excluded.{column}' for column in columns if column != 'guid')};"
+
+    with instrument.stage('db.ingest'), SQLite() as cursor:
+        known = _select_content_hashes(cursor, list(rows))
+        removed = _select_removed(cursor, [guid for guid in rows if guid not in known])
+        changed = []
+        raw_hashes = []
+        for guid, row in rows.items():
+            if guid in removed:
+                # the ITEM was archived or pruned, it is not brought back by the next poll
+                counts['unchanged'] += 1
+                continue
+            if guid not in known:
+                counts['inserted'] += 1
+            elif known[guid][0] != row['content_hash']:
+                counts['updated'] += 1
+            else:
+                counts['unchanged'] += 1
+                if row['raw_hash'] is not None and known[guid][1] != row['raw_hash']:
+                    raw_hashes.append((row['raw_hash'], guid))
+                continue
+            changed.append(guid)
+        cursor.executemany(q_text, ([rows[guid][column] for column in columns] for guid in changed))
+        cursor.executemany('UPDATE ITEMS SET raw_hash = ? WHERE guid = ?', raw_hashes)
+        _write_lists(cursor, {guid: {column: getattr(items[guid], column) for column in LIST_COLUMNS}
+                              for guid in changed})
+        _update_fts(cursor, changed)
+        with instrument.stage('db.dedup'):
+            clusters = _write_fingerprints(cursor, {guid: (items[guid].title, items[guid].description)
+                                                    for guid in changed})
+    for guid, cluster in clusters.items():
+        items[guid].cluster = cluster
+    instrument.count('rows_written', len(changed))
+    return counts
+
+
+def _select_removed(cursor, guids: list) -> set:
+    """The function returns the guids of the received ones which were archived or pruned"""
+
+    result = set()
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        result.update(row[0] for row in cursor.execute(
+            f"SELECT guid FROM REMOVED_ITEMS WHERE guid in ({', '.join('?' * len(chunk))})", chunk))
+    return result
+
+
+def _remember_removed(cursor, guids: list, month=None):
+    """The function saves the guids of the ITEMS which are archived (to the month) or pruned (month is None),
+    so the polls of the feeds which still have them do not save them to the cache again"""
+
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        cursor.execute(f"""INSERT OR REPLACE INTO main.REMOVED_ITEMS(guid, source, raw_hash, month, removed)
+                            SELECT guid, source, raw_hash, ?, ? FROM main.ITEMS
+                            WHERE guid in ({', '.join('?' * len(chunk))})""", [month, time.time()] + chunk)
+
+
+def forget_removed(days=REMOVED_DAYS) -> int:
+    """The function forgets the ITEMS pruned more than `days` days ago: the feeds do not keep them so long.
+    The archived ITEMS are not forgotten. Returns the number of the forgotten ITEMS"""
+
+    with SQLite() as cursor:
+        return cursor.execute('DELETE FROM REMOVED_ITEMS WHERE month IS NULL AND removed < ?',
+                              [time.time() - days * 24 * 60 * 60]).rowcount
+
+
 def insert(item) -> bool:
     """The function saves the received ITEM to the cache database"""
 
-    with SQLite() as cursor:
-        result = cursor.execute('select guid from ITEMS where guid = ?', [item.guid])
-        if result.fetchone() is None:
-            column_list = ''
-            values_list = ''
-            serialize_data = item.serialize()
-            for key in serialize_data:
-                column_list += f'{key}, '
-                values_list += f'?, '
-            column_list = column_list[:len(column_list) - 2]
-            values_list = values_list[:len(values_list) - 2]
-            q_text = f"INSERT INTO ITEMS({column_list}) VALUES({values_list});"
-            cursor.execute(q_text, [value for value in serialize_data.values()])
+    ingest([item])
     return True
 
 
 def insert_many(items_list: list) -> bool:
     """The function saves the received ITEMS LIST to the cache database"""
 
-    column_list = ''
-    values_list = ''
-    for key in items_list[0].serialize():
-        column_list += f'{key}, '
-        values_list += f'?, '
-    column_list = column_list[:len(column_list) - 2]
-    values_list = values_list[:len(values_list) - 2]
-    q_text = f"INSERT OR REPLACE INTO ITEMS({column_list}) VALUES({values_list});"
-
-    with SQLite() as cursor:
-        for item in items_list:
-            cursor.execute(q_text, [val for val in item.serialize().values()])
+    ingest(items_list)
     return True
 
 
-def select_items_from_cash(parameters: dict, limit=0) -> list:
-    """the function retrieves data from the database cache
-    and returns a list of dictionaries for creating ITEMS"""
+# Orderings of the cache reads: (columns, direction). The indexes keep the rowid, so source_filter_date
+# serves the 'source' ordering and published / source_published serve the 'newest' one
+# together with the keyset pagination without sorting
+ORDERS = {
+    'source': (('source', 'filter_date', 'rowid'), 'ASC'),
+    'newest': (('published', 'rowid'), 'DESC'),
+}
+ORDER_COLUMNS = ORDERS['source'][0]
+
+# Range conditions of the parameters: published_from is inclusive, published_to is exclusive
+RANGE_CONDITIONS = {'published_from': 'published >= ?', 'published_to': 'published < ?'}
+
+
+def encode_cursor(row, order='source') -> str:
+    """The function returns the opaque cursor pointing after the received row"""
+
+    key = [row[column] for column in ORDERS[order][0]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii').rstrip('=')
 
-    q_text = """SELECT * from ITEMS """
-    if parameters:
-        request_conditions = ''
-        for key in parameters.keys():
-            request_conditions += f'{key}= ? and '
 
-        if request_conditions:
-            request_conditions = request_conditions[:len(request_conditions) - 4]
-            q_text += 'Where ' + request_conditions
+def decode_cursor(cursor: str, order='source') -> list:
+    """The function returns the values of the ordering columns saved in the cursor"""
 
-    q_text += ' order by source, filter_date '
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError(f'Wrong cursor {cursor}')
+    if not isinstance(key, list) or len(key) != len(ORDERS[order][0]):
+        raise ValueError(f'Wrong cursor {cursor}')
+    return key
+
+
+def _conditions(parameters: dict, table='') -> tuple:
+    """The function returns the conditions text ('key = ? and ...') of the parameters and their values"""
+
+    prefix = f'{table}.' if table else ''
+    request_conditions = ''
+    values = []
+    for key, value in (parameters or dict()).items():
+        if key == 'category':
+            names = list(value) if isinstance(value, (list, tuple, set)) else [value]
+            request_conditions += f'{prefix}guid in (SELECT guid FROM ITEM_CATEGORIES ' \
+                                  f'WHERE name COLLATE NOCASE in ({", ".join("?" * len(names))})) and '
+            values.extend(names)
+        elif key in RANGE_CONDITIONS:
+            request_conditions += f'{prefix}{RANGE_CONDITIONS[key]} and '
+            values.append(value)
+        elif isinstance(value, (list, tuple, set)):
+            request_conditions += f'{prefix}{key} in ({", ".join("?" * len(value))}) and '
+            values.extend(value)
+        else:
+            request_conditions += f'{prefix}{key}= ? and '
+            values.append(value)
+    return request_conditions, values
+
+
+def _select_query(cursor, parameters: dict, limit=0, after=None, order='source') -> tuple:
+    """The function builds the query of the ITEMS by the parameters and returns the query text and values.
+    `after` is the cursor of the last row of the previous page, `order` is the key of ORDERS"""
+
+    q_text = f"""SELECT {_item_columns(cursor)} from ITEMS """
+    request_conditions, values = _conditions(parameters, 'ITEMS')
+    columns, direction = ORDERS[order]
+
+    if after:
+        request_conditions += f'({", ".join("ITEMS." + column for column in columns)}) ' \
+                              f'{">" if direction == "ASC" else "<"} ({", ".join("?" * len(columns))}) and '
+        values.extend(decode_cursor(after, order))
+
+    if request_conditions:
+        request_conditions = request_conditions[:len(request_conditions) - 4]
+        q_text += 'Where ' + request_conditions
+
+    q_text += f' order by {", ".join(f"ITEMS.{column} {direction}" for column in columns)} '
     if limit:
-        q_text += f'LIMIT {limit}'
+        q_text += f'LIMIT {int(limit)}'
+    return q_text, values
+
+
+def _iter_cursor(cursor, chunk_size=500):
+    rows = cursor.fetchmany(chunk_size)
+    while rows:
+        yield from rows
+        rows = cursor.fetchmany(chunk_size)
+
+
+def _iter_archive(archive_path, parameters: dict, limit=0, after=None, chunk_size=500, order='source'):
+    """The function yields the rows of the query from the archive database (read-only connection)"""
+
+    if not path.isfile(archive_path):
+        return
+    # the path is quoted in the URI, it may have the characters of the URI syntax (?, #, %)
+    connection = sqlite3.connect(Path(archive_path).resolve().as_uri() + '?mode=ro', uri=True,
+                                 timeout=BUSY_TIMEOUT / 1000)
+    connection.row_factory = sqlite3.Row
+    try:
+        cursor = connection.cursor()
+        cursor.execute(*_select_query(cursor, parameters, limit, after, order))
+        yield from _iter_cursor(cursor, chunk_size)
+    finally:
+        connection.close()
+
+
+def _order_key(columns):
+    # NULL is the smallest value in SQLite, None can not be compared in Python
+    return lambda row: [(row[column] is not None, row[column]) for column in columns]
+
+
+def iter_rows_from_cash(parameters: dict, limit=0, after=None, chunk_size=500, order='source'):
+    """the function retrieves data from the database cache chunk by chunk
+    and yields sqlite3.Row for creating ITEMS with Item.from_row.
+    If the dates of the parameters reach the archived months, the rows of the archives are merged in order
+    and every guid is read once. The archived rows keep their rowid, so the cursors (--after) work across
+    the databases"""
+
+    with SQLite(write=False) as cursor:
+        yield from _iter_rows(cursor, parameters, limit, after, chunk_size, order)
+
+
+def _iter_rows(cursor, parameters: dict, limit=0, after=None, chunk_size=500, order='source'):
+    archives = _select_archive_paths(cursor, parameters)
+    if not archives:
+        cursor.execute(*_select_query(cursor, parameters, limit, after, order))
+        yield from _iter_cursor(cursor, chunk_size)
+        return
+    # the streams are read lazily and not limited, the limit is applied after the duplicates are skipped
+    cursor.execute(*_select_query(cursor, parameters, 0, after, order))
+    columns, direction = ORDERS[order]
+    rows = heapq.merge(_iter_cursor(cursor, chunk_size),
+                       *(_iter_archive(archive, parameters, 0, after, chunk_size, order)
+                         for archive in archives),
+                       key=_order_key(columns), reverse=direction == 'DESC')
+    yield from itertools.islice(_unique_guids(rows), limit or None)
+
+
+def _unique_guids(rows):
+    # an ITEM saved again after it was archived is read once
+    seen = set()
+    for row in rows:
+        if row['guid'] not in seen:
+            seen.add(row['guid'])
+            yield row
+
+
+def select_page(cursor, parameters: dict, limit: int, after=None, order='source') -> tuple:
+    """The function reads one page of the ITEMS with the cursor (ConnectionPool.read).
+    Returns the list of sqlite3.Row and the cursor of the next page (None if it is the last page)"""
+
+    # one more row tells if there is the next page
+    rows = list(_iter_rows(cursor, parameters, limit + 1, after, order=order))
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor(rows[limit - 1], order)
+
+
+def select_sources_summary(cursor) -> list:
+    """The function returns the sources of the cache with the number of the ITEMS and the first and last dates:
+    a list of sqlite3.Row with source, items, first_date and last_date columns (source_filter_date index)"""
+
+    return cursor.execute('''SELECT source, count(*) AS items, min(filter_date) AS first_date,
+                                    max(filter_date) AS last_date
+                             FROM ITEMS GROUP BY source ORDER BY source''').fetchall()
+
+
+def _fts_terms(query: str) -> str:
+    """The function turns the query into the FTS5 query of quoted terms, so any text can be searched"""
+
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+def iter_search_from_cash(query: str, parameters: dict, limit=0, snippets=False, chunk_size=500):
+    """the function searches the query in the title, description and category of the ITEMS with FTS5
+    and yields sqlite3.Row ranked by bm25 (best first). The row has the `rank` column
+    and the `snippet` column (the description with the found terms in [brackets]) if snippets are requested.
+    The query supports the FTS5 syntax, if it is wrong the words of the query are searched"""
+
+    request_conditions, values = _conditions(parameters, 'ITEMS')
+
+    with SQLite(write=False) as cursor:
+        if not _has_fts(cursor):
+            raise sqlite3.OperationalError('Full-text search is not available: SQLite is built without FTS5')
+        columns = f'{_item_columns(cursor)}, ITEMS_FTS.rank'
+        if snippets:
+            columns += ", snippet(ITEMS_FTS, 1, '[', ']', '...', 16) as snippet"
+        q_text = f"""SELECT {columns} FROM ITEMS_FTS JOIN ITEMS ON ITEMS.rowid = ITEMS_FTS.rowid
+                     WHERE {request_conditions} ITEMS_FTS MATCH ? ORDER BY ITEMS_FTS.rank """
+        if limit:
+            q_text += f'LIMIT {int(limit)}'
+        try:
+            cursor.execute(q_text, values + [query])
+        except sqlite3.OperationalError:
+            cursor.execute(q_text, values + [_fts_terms(query)])
+        rows = cursor.fetchmany(chunk_size)
+        while rows:
+            yield from rows
+            rows = cursor.fetchmany(chunk_size)
+
+
+def select_rows_from_cash(parameters: dict, limit=0) -> list:
+    """the function retrieves data from the database cache
+    and returns a list of sqlite3.Row for creating ITEMS with Item.from_row"""
+
+    with SQLite(write=False) as cursor:
+        return cursor.execute(*_select_query(cursor, parameters, limit)).fetchall()
+
+
+def select_items_from_cash(parameters: dict, limit=0) -> list:
+    """the function retrieves data from the database cache
+    and returns a list of dictionaries for creating ITEMS"""
 
     result = []
-    with SQLite() as cursor:
-        fetchall = cursor.execute(q_text, [val for val in parameters.values()])
-        for row in fetchall:
-            body = dict()
-            for key in row.keys():
-                if row[key]:
-                    body[key] = row[key]
-            result.append(body)
+    for row in select_rows_from_cash(parameters, limit):
+        body = dict()
+        for key in row.keys():
+            if row[key]:
+                body[key] = decompress_text(row[key]) if key in COMPRESSED_COLUMNS else row[key]
+        result.append(body)
 
     return result
 
 
+def _delete_guids(cursor, guids: list) -> int:
+    """The function removes the ITEMS of the received guids with their rows of the child tables,
+    the full-text index and the fingerprints. Returns the number of the removed ITEMS"""
+
+    _update_fts(cursor, guids, delete_only=True)
+    _delete_bands(cursor, guids)
+    count = 0
+    for start in range(0, len(guids), MAX_VARIABLES):
+        chunk = guids[start:start + MAX_VARIABLES]
+        condition = f"guid in ({', '.join('?' * len(chunk))})"
+        for table in ('ITEM_CATEGORIES', 'ITEM_LINKS', 'ITEM_FINGERPRINTS'):
+            cursor.execute(f'delete from {table} where {condition}', chunk)
+        count += cursor.execute(f'delete from ITEMS where {condition}', chunk).rowcount
+    return count
+
+
 def delete(item) -> bool:
     """Removes ITEM from the database cache by guid"""
 
     with SQLite() as cursor:
-        cursor.execute('delete from ITEMS where guid = ?', [item.guid])
+        _delete_guids(cursor, [item.guid])
     return True
+
+
+def prune(max_age=None, max_items=None, today=None) -> int:
+    """The function removes the ITEMS older than max_age days (by filter_date)
+    and all but the max_items newest ITEMS of every source. The removed ITEMS are remembered,
+    so they are not saved again by the next polls. Returns the number of the removed ITEMS"""
+
+    count = 0
+    with SQLite() as cursor:
+        if max_age is not None:
+            cutoff = str((today or date.today()) - timedelta(days=max_age))
+            guids = [row['guid'] for row in cursor.execute('select guid from ITEMS where filter_date < ?', [cutoff])]
+            _remember_removed(cursor, guids)
+            count += _delete_guids(cursor, guids)
+        if max_items is not None:
+            rows = cursor.execute("""SELECT guid FROM (
+                                         SELECT guid, row_number() OVER (PARTITION BY source
+                                                                         ORDER BY published DESC, rowid DESC) AS place
+                                         FROM ITEMS)
+                                     WHERE place > ?""", [int(max_items)])
+            guids = [row['guid'] for row in rows]
+            _remember_removed(cursor, guids)
+            count += _delete_guids(cursor, guids)
+    return count
+
+
+# Tables of the ITEMS which are moved to the archive databases
+ARCHIVED_TABLES = ('ITEMS', 'ITEM_CATEGORIES', 'ITEM_LINKS', 'ITEM_FINGERPRINTS')
+
+
+def archive_path(month: str) -> str:
+    """The function returns the path of the archive database of the month (YYYY-MM) next to the cache database"""
+
+    return f'{path.splitext(get_db_path())[0]}.{month}.db'
+
+
+def _month_range(month: str) -> tuple:
+    year, number = map(int, month.split('-'))
+    year, number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return f'{month}-01', f'{year:04d}-{number:02d}-01'
+
+
+def select_archives() -> dict:
+    """The function returns {month: path of the archive database} of the archived months"""
+
+    with SQLite(write=False) as cursor:
+        return {row['month']: row['path'] for row in cursor.execute('select month, path from ARCHIVES order by month')}
+
+
+def _select_archive_paths(cursor, parameters: dict) -> list:
+    """The function returns the paths of the archives which can hold the ITEMS of the date parameters.
+    Queries without a date are served by the cache database only"""
+
+    parameters = parameters or dict()
+    if 'filter_date' in parameters:
+        months = [str(parameters['filter_date'])[:7]]
+        rows = cursor.execute('select path from ARCHIVES where month = ?', months)
+    elif 'published_from' in parameters or 'published_to' in parameters:
+        # filter_date is the date in the time zone of the source, so the range is widened by a day
+        first = parameters.get('published_from')
+        last = parameters.get('published_to')
+        first = epoch_to_datetime(first - 86400).strftime('%Y-%m') if first is not None else '0000-00'
+        last = epoch_to_datetime(last + 86400).strftime('%Y-%m') if last is not None else '9999-99'
+        rows = cursor.execute('select path from ARCHIVES where month between ? and ?', [first, last])
+    else:
+        return []
+    return [row['path'] for row in rows]
+
+
+def _copy_schema(cursor, schema: str):
+    """The function creates the archived tables and their indexes in the attached database"""
+
+    rows = cursor.execute(f"""select type, sql from main.sqlite_master
+                              where tbl_name in ({', '.join('?' * len(ARCHIVED_TABLES))}) and sql is not null
+                              order by type = 'index'""", ARCHIVED_TABLES).fetchall()
+    for row in rows:
+        kind = 'TABLE' if row['type'] == 'table' else 'INDEX'
+        cursor.execute(row['sql'].replace(f'CREATE {kind} ', f'CREATE {kind} IF NOT EXISTS {schema}.', 1))
+    # The columns which were added to the cache after the archive was created
+    existing = {row['name'] for row in cursor.execute(f'PRAGMA {schema}.table_info(ITEMS)')}
+    for row in cursor.execute('PRAGMA main.table_info(ITEMS)').fetchall():
+        if row['name'] not in existing:
+            cursor.execute(f"ALTER TABLE {schema}.ITEMS ADD COLUMN {row['name']} {row['type']}")
+
+
+def select_months(before: str) -> list:
+    """The function returns the months (YYYY-MM) of the cached ITEMS which are earlier than the month"""
+
+    with SQLite(write=False) as cursor:
+        rows = cursor.execute("""SELECT DISTINCT substr(filter_date, 1, 7) AS month FROM ITEMS
+                                 WHERE filter_date < ? ORDER BY month""", [f'{before}-01'])
+        return [row['month'] for row in rows]
+
+
+def archive_month(month: str) -> int:
+    """The function moves the ITEMS of the month (by filter_date) to the archive database of the month.
+    The ITEMS keep their rowid, a row of the archive is replaced by the row of the same guid.
+    The moved guids are remembered, so the polls do not save them to the cache again.
+    Returns the number of the moved ITEMS"""
+
+    archive = archive_path(month)
+    first, last = _month_range(month)
+    with _lock:
+        connection = get_connection()
+        # A database can not be attached inside a transaction
+        connection.execute('ATTACH DATABASE ? AS archive', [archive])
+        try:
+            with SQLite() as cursor:
+                _copy_schema(cursor, 'archive')
+                guids = [row['guid'] for row in cursor.execute(
+                    'SELECT guid FROM main.ITEMS WHERE filter_date >= ? AND filter_date < ?', [first, last])]
+                if not guids:
+                    return 0
+                columns = ', '.join(row['name'] for row in cursor.execute('PRAGMA main.table_info(ITEMS)'))
+                selected = 'FROM main.ITEMS WHERE filter_date >= ? AND filter_date < ?'
+                for table in ARCHIVED_TABLES:
+                    cursor.execute(f'DELETE FROM archive.{table} WHERE guid IN (SELECT guid {selected})', [first, last])
+                cursor.execute(f"""INSERT INTO archive.ITEMS(rowid, {columns}) SELECT rowid, {columns} {selected}
+                                   AND rowid NOT IN (SELECT rowid FROM archive.ITEMS)""", [first, last])
+                # The rowid is taken by another archived ITEM (the rowid was reused in the cache)
+                cursor.execute(f"""INSERT INTO archive.ITEMS({columns}) SELECT {columns} {selected}
+                                   AND guid NOT IN (SELECT guid FROM archive.ITEMS)""", [first, last])
+                for table in ARCHIVED_TABLES[1:]:
+                    cursor.execute(f'INSERT INTO archive.{table} SELECT * FROM main.{table} '
+                                   f'WHERE guid IN (SELECT guid {selected})', [first, last])
+                _remember_removed(cursor, guids, month)
+                count = _delete_guids(cursor, guids)
+                items = cursor.execute('SELECT count(*) FROM archive.ITEMS').fetchone()[0]
+                cursor.execute("""INSERT INTO ARCHIVES(month, path, items, archived) VALUES(?, ?, ?, ?)
+                                  ON CONFLICT(month) DO UPDATE SET path = excluded.path, items = excluded.items,
+                                  archived = excluded.archived""", [month, archive, items, time.time()])
+        finally:
+            connection.execute('DETACH DATABASE archive')
+    return count
+
+
+def database_size(connection=None) -> dict:
+    """The function returns the size of the cache database: pages, free pages and bytes"""
+
+    connection = connection or get_connection()
+    page_size = connection.execute('PRAGMA page_size').fetchone()[0]
+    pages = connection.execute('PRAGMA page_count').fetchone()[0]
+    free = connection.execute('PRAGMA freelist_count').fetchone()[0]
+    return {'pages': pages, 'free_pages': free, 'bytes': pages * page_size}
+
+
+def compact() -> dict:
+    """The function returns the free pages of the cache database to the file system and refreshes
+    the statistics of the query planner. The first run converts an old database to incremental
+    auto-vacuum with a full VACUUM. Returns the size of the database before and after"""
+
+    with _lock:
+        connection = get_connection()
+        before = database_size(connection)
+        with SQLite() as cursor:
+            if _has_fts(cursor):
+                cursor.execute("INSERT INTO ITEMS_FTS(ITEMS_FTS) VALUES('optimize')")
+        if connection.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            connection.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            connection.execute('VACUUM')
+        else:
+            connection.execute('PRAGMA incremental_vacuum').fetchall()
+        connection.execute('PRAGMA optimize')
+        connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        return {'before': before, 'after': database_size(connection)}
+
+
+def select_top_categories(parameters: dict, top=5) -> list:
+    """The function returns the most frequent categories of every source and day:
+    a list of sqlite3.Row with source, filter_date, category, items and place columns.
+    The join goes through the source_filter_date index and the primary key of ITEM_CATEGORIES"""
+
+    request_conditions, values = _conditions(parameters, 'ITEMS')
+    where = 'WHERE ' + request_conditions[:len(request_conditions) - 4] if request_conditions else ''
+    q_text = f"""SELECT * FROM (
+                     SELECT ITEMS.source AS source, ITEMS.filter_date AS filter_date,
+                            ITEM_CATEGORIES.name AS category, count(*) AS items,
+                            row_number() OVER (PARTITION BY ITEMS.source, ITEMS.filter_date
+                                               ORDER BY count(*) DESC, ITEM_CATEGORIES.name) AS place
+                     FROM ITEMS JOIN ITEM_CATEGORIES ON ITEM_CATEGORIES.guid = ITEMS.guid
+                     {where}
+                     GROUP BY ITEMS.source, ITEMS.filter_date, ITEM_CATEGORIES.name)
+                 WHERE place <= ? ORDER BY source, filter_date, place"""
+
+    with SQLite(write=False) as cursor:
+        return cursor.execute(q_text, values + [int(top)]).fetchall()
+
+
+def select_stats(parameters: dict, top=10) -> dict:
+    """The function returns the aggregates of the ITEMS of the parameters computed in SQL, no ITEM is read:
+    'volume' - the number of the ITEMS of every source and day (read from the source_filter_date index),
+    'hours' - the number of the ITEMS by the UTC hour of the publication,
+    'categories' - the `top` most frequent categories (case-insensitive) with their numbers of the ITEMS.
+    Every aggregate is a list of sqlite3.Row"""
+
+    request_conditions, values = _conditions(parameters, 'ITEMS')
+    where = 'WHERE ' + request_conditions[:len(request_conditions) - 4] if request_conditions else ''
+    # the ITEMS are joined only if they are filtered, the categories alone are counted by the categories_name index
+    categories_from = f'ITEMS JOIN ITEM_CATEGORIES ON ITEM_CATEGORIES.guid = ITEMS.guid {where}' \
+        if request_conditions else 'ITEM_CATEGORIES'
+
+    with SQLite(write=False) as cursor:
+        volume = cursor.execute(f"""SELECT ITEMS.source AS source, ITEMS.filter_date AS filter_date, count(*) AS items
+                                    FROM ITEMS {where}
+                                    GROUP BY ITEMS.source, ITEMS.filter_date
+                                    ORDER BY ITEMS.source, ITEMS.filter_date""", values).fetchall()
+        hours = cursor.execute(f"""SELECT (ITEMS.published % 86400 + 86400) % 86400 / 3600 AS hour, count(*) AS items
+                                   FROM ITEMS WHERE {request_conditions} ITEMS.published IS NOT NULL
+                                   GROUP BY hour ORDER BY hour""", values).fetchall()
+        categories = cursor.execute(f"""SELECT ITEM_CATEGORIES.name AS category, count(*) AS items
+                                        FROM {categories_from}
+                                        GROUP BY ITEM_CATEGORIES.name COLLATE NOCASE
+                                        ORDER BY items DESC, category LIMIT ?""", values + [int(top)]).fetchall()
+    return {'volume': volume, 'hours': hours, 'categories': categories}
@@ -0,0 +1,83 @@
+""" Module of the fingerprints of the news for the duplicate detection.
+
+The title and the description are normalized (case, punctuation, spaces) and get two fingerprints:
+the exact hash of the normalized text and the 64-bit SimHash of its word shingles. Near-duplicates
+(the same story with a few changed words, punctuation or a new guid) have SimHashes which differ in a few bits.
+The SimHash is split into BLOCKS = MAX_DISTANCE + 2 blocks: MAX_DISTANCE different bits change at most
+MAX_DISTANCE blocks, so two fingerprints within MAX_DISTANCE bits have at least two equal blocks (pigeonhole).
+Every pair of the blocks is a key of the index (a band, 14-15 bits), so the candidates are found by the index
+lookups of the BANDS keys and a bucket holds about 1 / 2 ** 14 of the cache instead of a scan of the cache. """
+
+import re
+import unicodedata
+from itertools import combinations
+from hashlib import blake2b, sha256
+
+# Bits of the SimHash, the largest distance of the near-duplicates, the blocks of the SimHash
+# and the keys of the index (the pairs of the blocks)
+BITS = 64
+MAX_DISTANCE = 7
+BLOCKS = MAX_DISTANCE + 2
+_WIDTHS = [BITS // BLOCKS + (1 if block < BITS % BLOCKS else 0) for block in range(BLOCKS)]
+_OFFSETS = [sum(_WIDTHS[:block]) for block in range(BLOCKS)]
+_PAIRS = list(combinations(range(BLOCKS), 2))
+BANDS = len(_PAIRS)
+
+# Words in a shingle (the news are short, longer shingles spread one changed word over too many bits)
+# and the smallest number of shingles for a reliable SimHash
+SHINGLE = 1
+MIN_SHINGLES = 4
+
+_words = re.compile(r'\w+')
+
+
+def normalize(text: str) -> list:
+    """The function returns the words of the text in lower case without punctuation and accents"""
+
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _words.findall(text.lower())
+
+
+def exact_hash(words: list) -> str:
+    return sha256(' '.join(words).encode('utf-8')).hexdigest()
+
+
+def simhash(words: list):
+    """The function returns the SimHash of the word shingles (signed 64-bit integer for SQLite)
+    or None if the text is too short for it"""
+
+    shingles = {' '.join(words[start:start + SHINGLE]) for start in range(len(words) - SHINGLE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    # The bits of the hashes as rows of b'0' / b'1', the columns are counted by zip in C
+    rows = [format(int.from_bytes(blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big'),
+                   f'0{BITS}b').encode('ascii') for shingle in shingles]
+    half = len(rows) / 2
+    ones = [sum(column) - ord('0') * len(rows) for column in zip(*rows)]
+    result = int(''.join('1' if count > half else '0' for count in ones), 2)
+    return result - (1 << BITS) if result >= 1 << (BITS - 1) else result
+
+
+def bands(value: int) -> list:
+    """The function returns the keys of the SimHash in the index: [(band, bits of the pair of the blocks), ...]"""
+
+    value &= (1 << BITS) - 1
+    blocks = [value >> offset & ((1 << width) - 1) for offset, width in zip(_OFFSETS, _WIDTHS)]
+    return [(band, blocks[first] << _WIDTHS[second] | blocks[second])
+            for band, (first, second) in enumerate(_PAIRS)]
+
+
+def distance(first: int, second: int) -> int:
+    """The function returns the number of the different bits of two SimHashes"""
+
+    return bin((first ^ second) & ((1 << BITS) - 1)).count('1')
+
+
+def fingerprint(title: str, description: str) -> tuple:
+    """The function returns (exact hash, SimHash or None) of the news, (None, None) for an empty one"""
+
+    words = normalize(title) + normalize(description)
+    if not words:
+        return None, None
+    return exact_hash(words), simhash(words)
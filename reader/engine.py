@@ -0,0 +1,125 @@
+""" Module of the concurrent feed fetching engine """
+
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+from reader.exceptions import FeedTimeoutError
+
+
+class FeedResponse:
+    """The answer of the source: the body of the feed (bytes or binary file) and the HTTP validators.
+    If `not_modified` is set the feed was not changed since the last poll and `content` is empty."""
+
+    def __init__(self, source, content=b'', etag=None, last_modified=None, body_hash=None, not_modified=False,
+                 encoding=None):
+        self.source = source
+        self.content = content
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.not_modified = not_modified
+
+    def validators(self) -> dict:
+        return {'etag': self.etag, 'last_modified': self.last_modified, 'body_hash': self.body_hash}
+
+    def __repr__(self):
+        return f'FeedResponse {self.source}: {"not modified" if self.not_modified else "modified"}'
+
+
+class FeedResult:
+    """The result of fetching one source. Holds either the fetched content or the error."""
+
+    def __init__(self, source, content=None, error=None, elapsed=0.0):
+        self.source = source
+        self.content = content
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f'FeedResult {self.source}: {"ok" if self.ok else self.error}'
+
+
+class FetchEngine:
+    """Fetches many sources concurrently on a thread pool.
+
+    The engine keeps at most `max_workers` requests in flight, at most `per_host`
+    requests to the same host, and gives up on everything that is not finished
+    when `deadline` seconds have passed since the start of the run."""
+
+    def __init__(self, fetch, max_workers=8, per_host=2, deadline=60.0):
+        self.fetch = fetch
+        self.max_workers = max(1, int(max_workers))
+        self.per_host = max(1, int(per_host))
+        self.deadline = deadline
+
+    @staticmethod
+    def get_host(source):
+        return urlsplit(source).netloc.lower()
+
+    def _timed_fetch(self, source):
+        start = time.monotonic()
+        content = self.fetch(source)
+        return content, time.monotonic() - start
+
+    def run(self, sources):
+        """The function fetches the received sources and yields FeedResult objects
+        as soon as each of them completes, fails or runs out of time."""
+
+        queues = OrderedDict()
+        for source in OrderedDict.fromkeys(sources):
+            queues.setdefault(self.get_host(source), deque()).append(source)
+
+        in_flight = {}
+        per_host = {host: 0 for host in queues}
+        stop_at = time.monotonic() + self.deadline if self.deadline else None
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while queues or in_flight:
+                # Round-robin over hosts so a single slow host can not occupy the whole pool
+                submitted = True
+                while submitted:
+                    submitted = False
+                    for host in list(queues):
+                        if len(in_flight) >= self.max_workers:
+                            break
+                        if per_host[host] >= self.per_host:
+                            continue
+                        source = queues[host].popleft()
+                        if not queues[host]:
+                            del queues[host]
+                        per_host[host] += 1
+                        in_flight[executor.submit(self._timed_fetch, source)] = (source, host)
+                        submitted = True
+
+                timeout = None
+                if stop_at is not None:
+                    timeout = stop_at - time.monotonic()
+                    if timeout <= 0:
+                        break
+
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    source, host = in_flight.pop(future)
+                    per_host[host] -= 1
+                    try:
+                        content, elapsed = future.result()
+                        yield FeedResult(source, content=content, elapsed=elapsed)
+                    except Exception as exp:
+                        yield FeedResult(source, error=exp)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        error = FeedTimeoutError(f'Deadline of {self.deadline} s exceeded')
+        for source, _ in in_flight.values():
+            yield FeedResult(source, error=error)
+        for host_queue in queues.values():
+            for source in host_queue:
+                yield FeedResult(source, error=error)
@@ -20,3 +20,7 @@ class ComLineArgError(Error):
 
 class FilePathError(Error):
     pass
+
+
+class FeedTimeoutError(Error):
+    pass
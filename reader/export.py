@@ -0,0 +1,112 @@
+""" Module of the HTML export.
+
+The document is written piece by piece to a buffered file: the header, one table per item and the footer.
+The templates are compiled once, so the time of the export is linear in the number of the items
+and the memory does not depend on it: the items can come from any iterator, including the cache reads. """
+
+from html import escape
+from itertools import chain
+from string import Template
+
+# Bytes written to the file at once
+BUFFER_SIZE = 256 * 1024
+
+HEADER = Template("""
+            <!DOCTYPE html>
+            <html lang="$language">
+            <head>
+            <meta charset="UTF-8">
+            <title>News feed</title>
+            <h1 style="color: #4485b8;">
+                NEWS
+                <span style="background-color: #4485b8; color: #ffffff; padding: 0 5px;">
+                    FEED
+                </span>
+            </h1>
+            </head>
+                <body>
+                    """)
+
+ITEM = Template("""
+        <table class="ItemTable" style="vertical-align: top; height: 87px;">
+            <thead>
+                <tr style="height: 23px;">
+                    <td style="height: 23px;" colspan="3">
+                        <strong>
+                            $title
+                        </strong>
+                    </td>
+                </tr>
+                <tr>
+                <td style="width: 93px;" colspan="3">
+                    <p><a href="$link">Link to item</a></p>
+                </td>
+                </tr>
+            </thead>
+            <tbody>
+                <tr style="height: 10px;">
+                    <td style="width: 690px; height: 10px;" colspan="3"><strong><br /></strong>
+                        <h4>$html_description</h4>
+                        $images
+                    </td>
+                </tr>
+            </tbody>
+        </table>
+        <hr/>""")
+
+IMAGE = Template('Image: <img src="$link" width="255" height="189" alt=""><br>')
+
+FOOTER = """
+                </body>
+            </html>"""
+
+
+def render_item(item) -> str:
+    """The function returns the html table of the item.
+    The images which are not shown in the html description are added after it"""
+
+    images = ''.join(IMAGE.substitute(link=link) for link in item.image_links if link not in item.html_description)
+    return ITEM.substitute(title=item.title, link=item.link, html_description=item.html_description, images=images)
+
+
+def write_html(items, path, buffer_size=BUFFER_SIZE) -> int:
+    """The function writes the html document with the items to the file.
+    The language of the document is the language of the first item.
+    Returns the number of the written items, the file is not created if there are no items"""
+
+    items = iter(items)
+    first = next(items, None)
+    if first is None:
+        return 0
+
+    count = 0
+    with open(path, 'w', encoding='UTF-8', buffering=buffer_size) as f:
+        f.write(HEADER.substitute(language=first.language))
+        for item in chain((first,), items):
+            f.write(render_item(item))
+            count += 1
+        f.write(FOOTER)
+    return count
+
+
+INDEX_FILE = Template("""
+        <h2><a href="$name">$name</a></h2>
+        <ol start="$start">$titles
+        </ol>""")
+
+
+def write_pdf_index(files, path) -> int:
+    """The function writes the html index of the pdf files of the sharded export:
+    `files` are the pairs (file name, items of the file). Returns the number of the files"""
+
+    count = 0
+    start = 1
+    with open(path, 'w', encoding='UTF-8', buffering=BUFFER_SIZE) as f:
+        f.write(HEADER.substitute(language=''))
+        for name, items in files:
+            titles = ''.join(f'\n            <li>{escape(item.title)}</li>' for item in items)
+            f.write(INDEX_FILE.substitute(name=escape(name), start=start, titles=titles))
+            start += len(items)
+            count += 1
+        f.write(FOOTER)
+    return count
@@ -0,0 +1,45 @@
+""" Module of the description extractor.
+
+Gets the plain text, the <a href> links and the <img src> sources of the html description
+in one pass of html.parser, without building a tree. """
+
+from html.parser import HTMLParser
+
+
+class DescriptionExtractor(HTMLParser):
+    """Collects the text, links and image sources of the html fragment.
+    The result is the same as `.text`, `findAll("a")` and `findAll("img")` of BeautifulSoup with html.parser"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.text = []
+        self.links = []
+        self.image_links = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a' or tag == 'img':
+            name = 'href' if tag == 'a' else 'src'
+            value = None
+            for key, attr_value in attrs:
+                if key == name:
+                    value = attr_value
+            if value:
+                (self.links if tag == 'a' else self.image_links).append(value)
+
+    def handle_data(self, data):
+        self.text.append(data)
+
+    def unknown_decl(self, data):
+        if data.startswith('CDATA['):
+            self.text.append(data[6:])
+
+
+def extract_description(html_description: str, link: str = '') -> tuple:
+    """The function returns the plain text, the unique links (except the link of the item itself)
+    and the unique image sources of the html description"""
+
+    extractor = DescriptionExtractor()
+    extractor.feed(html_description)
+    extractor.close()
+    links = list(set(href for href in extractor.links if href != link))
+    return ''.join(extractor.text), links, list(set(extractor.image_links))
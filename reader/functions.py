@@ -1,14 +1,24 @@
 """ Module of creation Parser, functions and action functions."""
 
-import requests
-from bs4 import BeautifulSoup
 import logging
-from reader.db.DBConnector import init_cash_db, select_items_from_cash
+from hashlib import blake2b, sha256
+from reader.db.DBConnector import (SQLite, init_cash_db, ingest, iter_rows_from_cash, iter_search_from_cash,
+                                   select_source, save_source, select_top_categories, encode_cursor,
+                                   select_known_guids, select_rows_by_guids, select_stats, MAX_VARIABLES)
+from reader.engine import FeedResponse
+from reader.export import write_html, write_pdf_index
+from reader.extract import extract_description
 from reader.models import Item
-from fpdf import FPDF
+from reader.xmlstream import FeedStream, FeedFormatError, FeedVersionError, charset_from_headers
+from reader import __version__, instrument
 
 import os
-from tempfile import gettempdir
+from contextlib import ExitStack
+from tempfile import SpooledTemporaryFile
+
+# Bytes of the feed kept in memory while downloading, the rest is spooled to a temporary file
+SPOOL_SIZE = 1024 * 1024
+CHUNK_SIZE = 64 * 1024
 
 
 def _create_logger(verbose):
@@ -18,12 +28,20 @@ def _create_logger(verbose):
     logger = logging.getLogger("rss_reader_logger")
     logger.setLevel(logging.DEBUG)
 
+    # The handlers are added once per process, the next parsers only change the --verbose level
+    for handler in logger.handlers:
+        if not isinstance(handler, logging.FileHandler):
+            handler.setLevel(logging.DEBUG if verbose else logging.ERROR)
+    if logger.handlers:
+        return logger
+
     # Create handlers
     c_handler = logging.StreamHandler()
 
     file_log = os.path.abspath(os.path.dirname(__file__))
     file_log = os.path.join(file_log, "RSS_file_log.log")
-    f_handler = logging.FileHandler(file_log)
+    # The log file is opened on the first record
+    f_handler = logging.FileHandler(file_log, delay=True)
 
     # Check --verbose argument
     if verbose:
@@ -48,128 +66,424 @@ class Parser:
     """Creates a Parser object."""
     """Makes a request by url and parse it into a List with Items"""
 
-    def __init__(self, source=None, filter_date=None, limit=0, verbose=False):
-        self.version = '1.5'
-        self.source = source
+    def __init__(self, source=None, filter_date=None, limit=0, verbose=False, after=None):
+        self.version = __version__
+        if isinstance(source, (list, tuple)):
+            self.sources = list(dict.fromkeys(source))
+            self.source = self.sources[0] if len(self.sources) == 1 else None
+        else:
+            self.sources = [source] if source else []
+            self.source = source
         self.filter_date = filter_date
         self.limit = limit
+        self.after = after
+        self.next_cursor = None
+        self.search = None
+        self.snippets = False
+        self.category = None
+        # Range of the publication time in UTC epoch seconds: date_from is inclusive, date_to is exclusive
+        self.date_from = None
+        self.date_to = None
+        # Yield only the first ITEM of every cluster of duplicates
+        self.collapse = False
+        self.chunk_size = 500
         self.verbose = verbose
         self.logger = _create_logger(self.verbose)
 
         self.news_feed = []
+        self.failed_sources = dict()
+        self.ingest_counts = dict()
+        self.feed_heads = dict()
+        self.ingest_chunk = 500
+        # The unchanged cached items of the feed are not parsed again, the parsing of the feed stops
+        # after stop_after_known known items in a row (0 - the whole feed is read).
+        # resolve_known - the skipped items are read from the cache for the returned list,
+        # it is off when only the saving of the feed is needed (watch)
+        self.skip_known = True
+        self.resolve_known = True
+        self.stop_after_known = 0
+        self.stopped_early = set()
+
+        # Settings of the concurrent fetching engine (multi-source mode)
+        self.timeout = 5
+        self.max_workers = 8
+        self.per_host = 2
+        self.deadline = 60.0
 
         self.directory = os.path.abspath(os.path.dirname(__file__))
         self.pdf_directory = os.path.join(self.directory, "pdf")  # will save font files
-        self.img_directory = gettempdir()  # or temp dir
+        self.image_cache = None  # ImageCache, created on the first PDF export
+        self.image_workers = 8
+        # Processes and items per file of the sharded PDF export, pdf_merge joins the files with pypdf
+        self.pdf_workers = 1
+        self.pdf_shard_size = 500
+        self.pdf_merge = False
         self.pdf_font = 'DejaVuSansCondensed.ttf'
+        self.font_cache = default_font_cache()  # FPDF saves the metrics of the font here, not next to it
 
     def __repr__(self):
         return f'Class Parser'
 
     @staticmethod
-    def get_soup(xml, parser: str = "xml") -> BeautifulSoup:
+    def get_soup(xml, parser: str = "xml"):
+        from bs4 import BeautifulSoup
         return BeautifulSoup(xml, parser)
 
-    def update_cash_db(self) -> list:
-        """The function receives XML by URL, parse it into ITEMS,
-        saves it to the Caching Database and return list of ITEMS"""
+    def fetch_feed(self, source=None, conditional=True, cached=None) -> FeedResponse:
+        """The function receives XML by URL.
+        The body is read incrementally into a spooled temporary file while its hash is calculated.
+        Sends the saved HTTP validators of the source and marks the answer as not modified
+        on 304 or when the body is the same as on the last poll"""
+
+        source = source or self.source
+        headers = dict()
+        if not conditional:
+            cached = dict()
+        elif cached is None:
+            cached = select_source(source.lower())
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        with instrument.stage('fetch'):
+            return self._read_response(source, headers, cached)
+
+    def _read_response(self, source, headers, cached) -> FeedResponse:
+        """The function makes the request with the validators and reads the answer of the source"""
+
+        import requests
 
-        news_feed = []
         try:
-            self.logger.info(f"Make request to {self.source}")
-            response = requests.get(self.source, timeout=5)
+            self.logger.info(f"Make request to {source}")
+            response = requests.get(source, headers=headers, timeout=self.timeout, stream=True)
         except requests.exceptions.ConnectionError:
             self.logger.error("Please, check your internet connection.")
             raise ConnectionError("Please, check your internet connection.")
 
-        if response.status_code != 200:
-            self.logger.error(f'Wrong answer {response.status_code}')
-            raise requests.exceptions.InvalidURL(f'Wrong answer {response.status_code}')
-
-        soup = self.get_soup(response.content)
-        if soup.find('rss') is None:
-            self.logger.error('Please ensure that the URL entered is correct')
-            raise requests.exceptions.InvalidURL('Please ensure that the URL entered is correct')
-
-        version = soup.find('rss')['version']
-        if version != '2.0':
-            self.logger.error('Wrong version of RSS-FEED')
-            raise TypeError('Wrong version of RSS-FEED')
-
-        head = {
-            "title": soup.title.text,
-            "version": soup.rss.get("version"),
-            "language": getattr(soup.language, "text", ""),
-            "description": getattr(soup.description, "text", ""),
-        }
-
-        tags = soup.find_all('item')
-        for tag in tags:
-            item_attrs = {
-                "language": head['language'],
-                "source": self.source,
-                "link": tag.link.text,
-                "guid": getattr(tag.guid, "text", tag.link.text),
-                "title": tag.title.text,
-                "pubdate": getattr(tag.pubDate, "text", ""),
-                "category": getattr(tag.category, "text", ""),
-                "html_description": getattr(tag.description, "text", ""),
-                "description": '',
-                "links": list(),
-                "image_links": list(),
-            }
-
-            if item_attrs['html_description']:
-                description_soup = self.get_soup(item_attrs['html_description'], "html.parser")
-                item_attrs["description"] = description_soup.text
-                for a_link in description_soup.findAll("a"):
-                    if a_link.get("href") and a_link.get("href") != item_attrs['link']:
-                        item_attrs['links'].append(a_link.get("href"))
-                item_attrs['links'] = list(set(item_attrs['links']))
-
-                for image in description_soup.findAll("img"):
-                    if image.get("src"):
-                        item_attrs['image_links'].append(image.get("src"))
-                item_attrs['image_links'] = list(set(item_attrs['image_links']))
-
-            item = Item(**item_attrs)
-            item.save()
-            news_feed.append(item)
+        with response:
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.status_code == 304 and cached:
+                # the answer may omit the validators, the ones of the last poll stay valid
+                etag = etag or cached.get('etag')
+                last_modified = last_modified or cached.get('last_modified')
+                self.logger.info(f"Source {source} was not modified")
+                return FeedResponse(source, etag=etag, last_modified=last_modified,
+                                    body_hash=cached.get('body_hash'), not_modified=True)
+
+            if response.status_code != 200:
+                self.logger.error(f'Wrong answer {response.status_code}')
+                raise requests.exceptions.InvalidURL(f'Wrong answer {response.status_code}')
+
+            body = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+            digest = sha256()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                digest.update(chunk)
+                body.write(chunk)
+            instrument.count('bytes_fetched', body.tell())
+            body.seek(0)
+
+        body_hash = digest.hexdigest()
+        if body_hash == cached.get('body_hash'):
+            body.close()
+            self.logger.info(f"Source {source} has the same body as on the last poll")
+            return FeedResponse(source, etag=etag, last_modified=last_modified, body_hash=body_hash,
+                                not_modified=True)
+
+        return FeedResponse(source, body, etag, last_modified, body_hash,
+                            encoding=charset_from_headers(response.headers))
+
+    def process_feed(self, response: FeedResponse) -> list:
+        """The function turns the answer of the source into the list of ITEMS.
+        A not modified feed is served from the Caching Database without parsing in the order
+        of its last poll, otherwise the feed is parsed and the validators of the source are saved"""
+
+        source = response.source
+        if response.not_modified:
+            cached = select_source(source.lower())
+            news_feed = _read_feed((cached.get('guids') or '').split('\n'), self.limit)
+            if news_feed:
+                if any(cached.get(key) != value for key, value in response.validators().items()):
+                    save_source(source.lower(), **response.validators())
+                return news_feed
+            self.logger.info(f"No cached items of {source}, make unconditional request")
+            response = self.fetch_feed(source, conditional=False)
 
+        try:
+            with instrument.stage('parse'):
+                news_feed = self.parse_feed(response.content, source, response.encoding)
+        finally:
+            if hasattr(response.content, 'close'):
+                response.content.close()
+        save_source(source.lower(), **response.validators())
         return news_feed
 
+    def update_cash_db(self) -> list:
+        """The function receives XML by URL, parse it into ITEMS,
+        saves it to the Caching Database and return list of ITEMS"""
+
+        return self.process_feed(self.fetch_feed())
+
+    def update_cash_db_many(self) -> list:
+        """The function receives XML from all the sources concurrently, parse them into ITEMS,
+        saves them to the Caching Database and return list of ITEMS in the order of the sources.
+        Sources which failed or timed out are collected in self.failed_sources"""
+
+        from reader.engine import FetchEngine
+
+        feeds = dict()
+        self.failed_sources = dict()
+        # The validators are read here, so the fetching threads do not wait for the database
+        validators = {source: select_source(source.lower()) for source in self.sources}
+        engine = FetchEngine(lambda source: self.fetch_feed(source, cached=validators[source]),
+                             self.max_workers, self.per_host, self.deadline)
+        self.logger.info(f"Fetch {len(self.sources)} source(s) with {engine.max_workers} worker(s)")
+
+        for result in engine.run(self.sources):
+            if result.ok:
+                try:
+                    feeds[result.source] = self.process_feed(result.content)
+                    self.logger.info(f"Source {result.source} took {result.elapsed:.2f} s")
+                    continue
+                except Exception as exp:
+                    result.error = exp
+            self.logger.error(f'Source {result.source} failed: {result.error}')
+            self.failed_sources[result.source] = result.error
+
+        return [item for source in self.sources for item in feeds.get(source, [])]
+
+    def parse_feed(self, content, source=None, encoding=None) -> list:
+        """The function parse the received XML (bytes or binary file) into ITEMS while it is read,
+        saves them and the guids of the feed to the Caching Database in one transaction and return list of ITEMS.
+        The transaction is begun by the first write, so a feed of the known ITEMS does not take the write lock.
+        If the parsing stopped after the known ITEMS, the rest of the list is read from the cache.
+        If the limit is set, only the first ITEMS are kept in the list.
+        If self.resolve_known is off, the known unchanged ITEMS are not in the list"""
+
+        source = source or self.source
+        news_feed = []
+        guids = []
+        batch = []
+        self.ingest_counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        self.stopped_early.discard(source)
+        feed = FeedStream(content, encoding)
+        known = select_known_guids(source.lower()) if self.skip_known else dict()
+        last_guids = select_source(source.lower()).get('guids') or ''
+        known_in_row = 0
+        skipped = 0
+        transaction = ExitStack()
+        writing = False
+
+        def begin_write():
+            # the write lock is taken by the first write and held to the end of the feed
+            nonlocal writing
+            if not writing:
+                transaction.enter_context(SQLite())
+                writing = True
+
+        try:
+            with transaction:
+                for item_attrs in instrument.timed_iter('parse.xml', feed.items()):
+                    item_hash = raw_hash(item_attrs)
+                    guids.append(item_attrs['guid'])
+                    if known.get(item_attrs['guid']) == item_hash:
+                        # The cached item is not changed, it is read from the cache if it is returned
+                        self.ingest_counts['unchanged'] += 1
+                        skipped += 1
+                        if self.resolve_known and (not self.limit or len(news_feed) < self.limit):
+                            news_feed.append(item_attrs['guid'])
+                        known_in_row += 1
+                        if self.stop_after_known and known_in_row >= self.stop_after_known:
+                            self.logger.info(f"Stop parsing {source} after {known_in_row} known item(s) in a row")
+                            self.stopped_early.add(source)
+                            break
+                        continue
+                    known_in_row = 0
+
+                    item_attrs.update({"source": source, "description": '', "links": list(), "image_links": list(),
+                                       "raw_hash": item_hash})
+
+                    if item_attrs['html_description']:
+                        with instrument.stage('parse.extract'):
+                            description, links, image_links = extract_description(item_attrs['html_description'],
+                                                                                  item_attrs['link'])
+                        item_attrs.update({"description": description, "links": links, "image_links": image_links})
+
+                    item = Item(**item_attrs)
+                    batch.append(item)
+                    if not self.limit or len(news_feed) < self.limit:
+                        news_feed.append(item)
+                    if len(batch) >= self.ingest_chunk:
+                        begin_write()
+                        self._ingest_batch(batch)
+                        batch = []
+                if source in self.stopped_early:
+                    # the rest of the feed is the rest of the last poll, it is read from the cache
+                    seen = set(guids)
+                    rest = [guid for guid in last_guids.split('\n') if guid and guid not in seen]
+                    guids.extend(rest)
+                    if self.resolve_known:
+                        news_feed.extend(rest[:max(0, self.limit - len(news_feed))] if self.limit else rest)
+                feed_guids = '\n'.join(guid for guid in dict.fromkeys(guids) if guid)
+                if batch or feed_guids != last_guids:
+                    begin_write()
+                    self._ingest_batch(batch)
+                    if feed_guids != last_guids:
+                        save_source(source.lower(), guids=feed_guids)
+        except FeedFormatError as exp:
+            from requests.exceptions import InvalidURL
+            self.logger.error(exp)
+            raise InvalidURL(str(exp))
+        except FeedVersionError as exp:
+            self.logger.error(exp)
+            raise TypeError(str(exp))
+
+        self.feed_heads[source] = feed.head
+        instrument.count('items_parsed', sum(self.ingest_counts.values()))
+        instrument.count('items_skipped', skipped)
+        self.logger.info(f"Saved {source}: {self.ingest_counts['inserted']} inserted, "
+                         f"{self.ingest_counts['updated']} updated, {self.ingest_counts['unchanged']} unchanged")
+        return _resolve_known(news_feed)
+
+    def _ingest_batch(self, batch):
+        for key, value in ingest(batch).items():
+            self.ingest_counts[key] += value
+
     def get_items(self):
 
         """The main function of the object.
         Initializes the Caching Database, updates the cache,
         and returns the ITEMS list according to the received parameters"""
 
-        self.news_feed = []
+        self.news_feed = list(self.iter_items())
+        self.logger.info(f"Return RSS feed with {len(self.news_feed)} item(s)")
+        return self.news_feed
+
+    def iter_items(self):
+
+        """The function initializes the Caching Database, updates the cache
+        and yields the ITEMS according to the received parameters.
+        The ITEMS of the cache are read from the cursor chunk by chunk, so the first ITEM
+        is yielded as soon as it is read. If the limit is reached, self.next_cursor
+        is set to the cursor of the next page (--after).
+        If self.search is set, the ITEMS found by the full-text search are yielded, best first.
+        If self.collapse is set, the duplicates of the ITEMS yielded by this call are skipped
+        and the limit counts the clusters"""
+
         parameters = dict()
+        self.next_cursor = None
 
         try:
             self.logger.info("init RSS cash db")
-            init_cash_db(Item())
+            with instrument.stage('db.init'):
+                init_cash_db(Item())
         except Exception as exp:
             self.logger.error(f'Can`t init RSS cash db {exp}')
             raise Exception('Can`t init RSS cash db')
 
-        if self.source:
-            parameters['source'] = self.source
-            self.news_feed = self.update_cash_db()
+        news_feed = []
+        if len(self.sources) > 1:
+            parameters['source'] = [source.lower() for source in self.sources]
+            news_feed = self.update_cash_db_many()
+        elif self.source:
+            parameters['source'] = self.source.lower()
+            news_feed = self.update_cash_db()
 
         if self.filter_date:
             parameters['filter_date'] = self.filter_date
+        if self.category:
+            parameters['category'] = self.category
+        if self.date_from is not None:
+            parameters['published_from'] = self.date_from
+        if self.date_to is not None:
+            parameters['published_to'] = self.date_to
+        # The date range is read newest first
+        order = 'newest' if self.date_from is not None or self.date_to is not None else 'source'
+
+        # The parsed feeds are served as they are, the filters are applied to the cache
+        if self.sources and (self.filter_date is None) and not self.after and not self.search and not self.category \
+                and order == 'source' and not self.collapse:
+            yield from news_feed[:self.limit] if self.limit else news_feed
+            return
+
+        # The collapsed clusters are counted here, so the query is not limited
+        query_limit = 0 if self.collapse else self.limit
+        clusters = set()
+
+        if self.search:
+            self.logger.info(f"Search {self.search} in RSS cash db")
+            count = 0
+            rows = iter_search_from_cash(self.search, parameters, query_limit, self.snippets, self.chunk_size)
+            for row in instrument.timed_iter('db.search', rows):
+                if self.collapse:
+                    if row['cluster'] in clusters:
+                        continue
+                    clusters.add(row['cluster'])
+                item = Item.from_row(row)
+                if self.snippets:
+                    item.snippet = row['snippet']
+                yield item
+                count += 1
+                if self.limit and count == self.limit:
+                    break
+            return
+
+        self.logger.info("Get items from RSS cash db")
+        count = 0
+        row = None
+        rows = iter_rows_from_cash(parameters, query_limit, self.after, self.chunk_size, order)
+        for row in instrument.timed_iter('db.read', rows):
+            if self.collapse:
+                if row['cluster'] in clusters:
+                    continue
+                clusters.add(row['cluster'])
+            count += 1
+            yield Item.from_row(row)
+            if self.limit and count == self.limit:
+                break
+        if self.limit and count == self.limit:
+            self.next_cursor = encode_cursor(row, order)
+
+    def get_top_categories(self, top=5) -> list:
+
+        """The function returns the most frequent categories of every source and day of the cache
+        (restricted by the source and the date if they are set): a list of dictionaries
+        with source, filter_date, category, items and place keys"""
+
+        init_cash_db(Item())
+        parameters = dict()
+        if self.sources:
+            parameters['source'] = [source.lower() for source in self.sources]
+        if self.filter_date:
+            parameters['filter_date'] = self.filter_date
+        return [dict(row) for row in select_top_categories(parameters, top)]
 
-        if self.source and (self.filter_date is None):
-            if self.limit:
-                self.news_feed = self.news_feed[:self.limit]
-        else:
-            self.logger.info("Get items from RSS cash db")
-            self.news_feed = [Item(**body) for body in select_items_from_cash(parameters, self.limit)]
+    def get_stats(self, top=10) -> dict:
 
-        self.logger.info(f"Return RSS feed with {len(self.news_feed)} item(s)")
-        return self.news_feed
+        """The function returns the statistics of the cache (restricted by the source, the date, the date range
+        and the category if they are set) computed by SQL without creating the ITEMS:
+        the news of every source and day, the news of every UTC hour of the publication
+        and the `top` most frequent categories. The values are lists of dictionaries"""
+
+        init_cash_db(Item())
+        parameters = dict()
+        if self.sources:
+            parameters['source'] = [source.lower() for source in self.sources]
+        if self.filter_date:
+            parameters['filter_date'] = self.filter_date
+        if self.category:
+            parameters['category'] = self.category
+        if self.date_from is not None:
+            parameters['published_from'] = self.date_from
+        if self.date_to is not None:
+            parameters['published_to'] = self.date_to
+
+        stats = select_stats(parameters, top)
+        hours = {row['hour']: row['items'] for row in stats['hours']}
+        return {'volume': [dict(row) for row in stats['volume']],
+                'hours': [{'hour': hour, 'items': hours.get(hour, 0)} for hour in range(24)],
+                'categories': [dict(row) for row in stats['categories']]}
 
     def check_path_to_directory(self, user_path):
 
@@ -195,6 +509,7 @@ class Parser:
 
         font_path = os.path.join(self.pdf_directory, self.pdf_font)
         if not os.path.exists(font_path):
+            import requests
             picture_request = requests.get('https://github.com/iBotMan/fonts/raw/master/DejaVuSansCondensed.ttf',
                                            timeout=5)
 
@@ -215,19 +530,17 @@ class Parser:
             return None
 
         self.logger.info("Creating pdf file with news.")
-        pdf = FPDF(orientation='P', unit='mm', format='A4')
-        pdf.add_font('DejaVu', '', os.path.join(self.pdf_directory, 'DejaVuSansCondensed.ttf'), uni=True)
-        pdf.set_margins(5, 13.5, 5)
-
-        for news in items:
-            pdf.add_page()
-            pdf.set_font("DejaVu", size=16)
-            pdf.set_text_color(255, 0, 0)
-            _add_news_to_pdf_file(news, pdf, self.img_directory)
+        font_path = os.path.join(self.pdf_directory, self.pdf_font)
+        with instrument.stage('images.prefetch'):
+            images = self.prefetch_images(items)
+        if self.pdf_workers > 1 and len(items) > self.pdf_shard_size:
+            with instrument.stage('render.pdf'):
+                return self.create_sharded_pdf_files(user_path_to_pdf, list(items), images)
 
         path_to_pdf_file = os.path.join(user_path_to_pdf, "RSS_ITEMS.pdf")
         try:
-            pdf.output(path_to_pdf_file, "F")
+            with instrument.stage('render.pdf'):
+                _render_pdf_file(path_to_pdf_file, font_path, items, images, self.font_cache)
             self.logger.info(f"PDF file was created: {path_to_pdf_file}")
         except PermissionError as e:
             self.logger.error(e)
@@ -235,50 +548,159 @@ class Parser:
         self.logger.info(f"PDF file was saved: {path_to_pdf_file}")
         return path_to_pdf_file
 
-    def create_and_fill_html_file(self, user_path_to_html, items_list: list = None) -> os.path:
+    def create_sharded_pdf_files(self, user_path_to_pdf, items: list, images: dict) -> os.path:
+
+        """The function splits the ITEMS into shards of self.pdf_shard_size and renders them
+        in self.pdf_workers processes to the numbered files RSS_ITEMS_001.pdf, RSS_ITEMS_002.pdf, ...
+        If self.pdf_merge is set and pypdf is installed, the files are merged into RSS_ITEMS.pdf
+        and its path is returned, otherwise the path of the index RSS_ITEMS_index.html of the files"""
+
+        font_path = os.path.join(self.pdf_directory, self.pdf_font)
+        shards = [items[start:start + self.pdf_shard_size] for start in range(0, len(items), self.pdf_shard_size)]
+        paths = [os.path.join(user_path_to_pdf, f"RSS_ITEMS_{num:03d}.pdf") for num in range(1, len(shards) + 1)]
+        shard_images = [{link: images[link] for item in shard for link in item.image_links if link in images}
+                        for shard in shards]
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # The metrics of the font are saved once here, the workers only read them
+        _prepare_font(font_path, self.font_cache)
+        workers = min(self.pdf_workers, len(shards))
+        self.logger.info(f"Rendering {len(items)} item(s) to {len(shards)} pdf file(s) with {workers} worker(s)")
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(_render_pdf_file, paths, [font_path] * len(shards), shards, shard_images,
+                                  [self.font_cache] * len(shards)))
+        except PermissionError as e:
+            self.logger.error(e)
+            raise e
 
-        """The function creates a HTML file from the resulting ITEMS list"""
+        if self.pdf_merge:
+            path_to_pdf_file = os.path.join(user_path_to_pdf, "RSS_ITEMS.pdf")
+            if _merge_pdf_files(paths, path_to_pdf_file):
+                for path in paths:
+                    os.remove(path)
+                self.logger.info(f"PDF file was saved: {path_to_pdf_file}")
+                return path_to_pdf_file
+            self.logger.error('pypdf is not installed, the pdf files are not merged')
+
+        path_to_index = os.path.join(user_path_to_pdf, "RSS_ITEMS_index.html")
+        write_pdf_index(zip([os.path.basename(path) for path in paths], shards), path_to_index)
+        self.logger.info(f"PDF files were saved: {path_to_index}")
+        return path_to_index
+
+    def prefetch_images(self, items) -> dict:
+
+        """The function downloads the images of the ITEMS which are not in the image cache yet.
+        Returns {image link: (path, type)} of the images available for the PDF file"""
+
+        if self.image_cache is None:
+            from reader.images import ImageCache
+            self.image_cache = ImageCache()
+        links = [link for item in items for link in item.image_links]
+        self.logger.info(f"Prefetch {len(set(links))} image(s) with {self.image_workers} worker(s)")
+        images = self.image_cache.prefetch(links, self.image_workers, self.per_host, self.timeout, self.deadline)
+        for link, error in self.image_cache.failed.items():
+            self.logger.error(f'Image {link} failed: {error}')
+        self.image_cache.failed.clear()
+        return images
+
+    def create_and_fill_html_file(self, user_path_to_html, items_list=None) -> os.path:
+
+        """The function creates a HTML file from the resulting ITEMS (a list or any iterator).
+        The items are written one by one, so they are not kept in memory"""
 
         items = items_list if items_list is not None else self.news_feed
-        if len(items) == 0:
+        if isinstance(items, (list, tuple)) and len(items) == 0:
             return ''
-        """ Function for creating and filling in the html file with news.  """
         if not self.check_path_to_directory(user_path_to_html):
             return None
-        body_template = f"""
-            <!DOCTYPE html>
-            <html lang="{self.news_feed[0].language}">
-            <head>
-            <meta charset="UTF-8">
-            <title>News feed</title>
-            <h1 style="color: #4485b8;">
-                NEWS 
-                <span style="background-color: #4485b8; color: #ffffff; padding: 0 5px;"> 
-                    FEED
-                </span>
-            </h1>
-            </head>        
-                <body>
-                    [BODY]
-                </body>      
-            </html>"""
-
-        for news in self.news_feed:
-            body_template = body_template.replace('[BODY]', news.get_html_template() + '[BODY]')
-
-        body_template = body_template.replace('[BODY]', '')
+
         path_to_html_file = os.path.join(user_path_to_html, "RSS_ITEMS.html")
         try:
-            with open(path_to_html_file, 'wb+') as f:
-                f.write(body_template.encode('UTF-8'))
-            self.logger.info(f"HTML file was created: {path_to_html_file}")
+            with instrument.stage('render.html'):
+                count = write_html(items, path_to_html_file)
         except PermissionError as e:
             self.logger.error(e)
             raise e
-        self.logger.info(f"HTML file was saved: {path_to_html_file}")
+        if count == 0:
+            return ''
+        self.logger.info(f"HTML file was saved with {count} item(s): {path_to_html_file}")
         return path_to_html_file
 
 
+def raw_hash(item_attrs: dict) -> str:
+    """The function returns the hash of the raw fields of the <item> parsed by FeedStream"""
+
+    values = [item_attrs['guid'], item_attrs['link'], item_attrs['title'], item_attrs['pubdate'],
+              item_attrs['language'], '\x1e'.join(item_attrs['category']), item_attrs['html_description']]
+    return blake2b('\x1f'.join(values).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _resolve_known(news_feed: list) -> list:
+    """The function replaces the guids of the skipped known items in the list by the ITEMS read from the cache"""
+
+    guids = [item for item in news_feed if isinstance(item, str)]
+    if not guids:
+        return news_feed
+    rows = select_rows_by_guids(guids)
+    return [Item.from_row(rows[item]) if isinstance(item, str) else item
+            for item in news_feed if not isinstance(item, str) or item in rows]
+
+
+def default_font_cache() -> str:
+    """The function returns the folder of the font metrics in the user cache directory"""
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'rss_reader', 'fonts')
+
+
+def _use_font_cache(font_cache):
+    """The function makes FPDF keep the metrics of the fonts in the font_cache folder instead of the folder
+    of the font, which may be read-only. If the folder cannot be created, the metrics are not saved at all"""
+
+    from fpdf import set_global
+
+    try:
+        os.makedirs(font_cache, exist_ok=True)
+    except OSError:
+        set_global('FPDF_CACHE_MODE', 1)
+        return
+    set_global('FPDF_CACHE_MODE', 2)
+    set_global('FPDF_CACHE_DIR', font_cache)
+
+
+def _prepare_font(font_path, font_cache):
+    """The function saves the metrics of the font to the font_cache folder before the sharded export,
+    so the worker processes do not write the same files at once"""
+
+    from fpdf import FPDF
+
+    _use_font_cache(font_cache)
+    pdf = FPDF()
+    pdf.add_font('DejaVu', '', font_path, uni=True)
+    # the widths of the characters are saved on the first output of a non-ASCII text
+    pdf.add_page()
+    pdf.set_font('DejaVu', size=12)
+    pdf.write(10, 'RSS Новости')
+    pdf.output(dest='S')
+
+
+def _read_feed(guids: list, limit=0) -> list:
+    """The function reads the ITEMS of the guids from the cache in the order of the guids,
+    the guids which are not in the cache are skipped. If the limit is set, only the first ITEMS are read"""
+
+    news_feed = []
+    step = limit or MAX_VARIABLES
+    for start in range(0, len(guids), step):
+        chunk = [guid for guid in guids[start:start + step] if guid]
+        rows = select_rows_by_guids(chunk)
+        news_feed.extend(Item.from_row(rows[guid]) for guid in chunk if guid in rows)
+        if limit and len(news_feed) >= limit:
+            return news_feed[:limit]
+    return news_feed
+
+
 def _cell_to_pdf(pdf, text: str, multi=False, r=0, g=0, b=0):
     """The function adds a cell/line to the created PDF file"""
 
@@ -289,7 +711,43 @@ def _cell_to_pdf(pdf, text: str, multi=False, r=0, g=0, b=0):
         pdf.write(10, f"{text}")
 
 
-def _add_news_to_pdf_file(item, pdf, img_directory):
+def _render_pdf_file(path_to_pdf_file, font_path, items, images: dict, font_cache=None):
+    """ Function renders the items to the pdf file. It runs in the worker processes of the sharded export. """
+
+    from fpdf import FPDF
+
+    _use_font_cache(font_cache or default_font_cache())
+    pdf = FPDF(orientation='P', unit='mm', format='A4')
+    pdf.add_font('DejaVu', '', font_path, uni=True)
+    pdf.set_margins(5, 13.5, 5)
+
+    for news in items:
+        pdf.add_page()
+        pdf.set_font("DejaVu", size=16)
+        pdf.set_text_color(255, 0, 0)
+        _add_news_to_pdf_file(news, pdf, images)
+
+    pdf.output(path_to_pdf_file, "F")
+    return path_to_pdf_file
+
+
+def _merge_pdf_files(paths, path_to_pdf_file) -> bool:
+    """ Function merges the pdf files into one with the optional pypdf package. Returns False without it. """
+
+    try:
+        from pypdf import PdfWriter
+    except ImportError:
+        return False
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(path_to_pdf_file, 'wb') as f:
+        writer.write(f)
+    return True
+
+
+def _add_news_to_pdf_file(item, pdf, images):
     """ Function that add item to pdf file. """
 
     pdf.set_font("DejaVu", size=12)
@@ -311,32 +769,15 @@ def _add_news_to_pdf_file(item, pdf, img_directory):
         _cell_to_pdf(pdf, "[ Images:] ")
         for num, image_link in enumerate(set(item.image_links)):
             if image_link:
-                _add_image(image_link, pdf, img_directory)
-
+                _add_image(image_link, pdf, images)
 
-def _add_image(image_link, pdf, img_directory):
-    """ Function for getting image from image url and adding it to pdf file. """
 
-    file_name = os.path.basename(image_link)
-    file_path = os.path.join(img_directory, file_name)
+def _add_image(image_link, pdf, images):
+    """ Function for adding the prefetched image of the image url to pdf file. """
 
-    pos = file_name.rfind('.')
-    img_type = '' if pos != -1 else 'jpeg'
-    if img_type == '':
-        img_type = file_name[pos + 1:].lower()
-    if img_type not in 'jpeg jpg png gif':
+    image = images.get(image_link)
+    if image is None:
         return
-
-    try:
-        picture_request = requests.get(image_link, timeout=5, verify=True)
-    except Exception as e:
-        raise e
-
-    if picture_request.status_code == 200:
-        with open(file_path, 'wb+') as f:
-            f.write(picture_request.content)
-
-    if os.path.isfile(file_path):
-        pdf.image(file_path, x=30, y=pdf.get_y(), h=60, type=img_type, link=image_link)
-        pdf.ln(10)
-        os.remove(file_path)
+    file_path, img_type = image
+    pdf.image(file_path, x=30, y=pdf.get_y(), h=60, type=img_type, link=image_link)
+    pdf.ln(10)
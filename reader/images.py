@@ -0,0 +1,186 @@
+""" Module of the image cache of the PDF export.
+
+The images are downloaded concurrently before the PDF is rendered and kept on disk by the hash of their content
+(<directory>/<2 first hex digits>/<sha256>.<type>), so the same picture of several news or URLs is stored once
+and the next export does not download it again. The index (url -> blob, size, last use) is a small SQLite
+database in the same directory; the least recently used blobs are removed when the cache outgrows its size. """
+
+import os
+import time
+from hashlib import sha256
+from os import path
+
+from reader import instrument
+from reader.db.DBConnector import connect
+from reader.engine import FetchEngine
+
+# Bytes of the blobs kept in the cache and the largest image downloaded
+MAX_CACHE_SIZE = 200 * 1024 * 1024
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+# Signatures of the image formats supported by FPDF
+_signatures = ((b'\xff\xd8\xff', 'jpeg'), (b'\x89PNG\r\n\x1a\n', 'png'), (b'GIF87a', 'gif'), (b'GIF89a', 'gif'))
+
+
+def default_image_directory() -> str:
+    """The function returns the images folder in the user cache directory"""
+
+    cache_home = os.environ.get('XDG_CACHE_HOME') or path.join(path.expanduser('~'), '.cache')
+    return path.join(cache_home, 'rss_reader', 'images')
+
+
+def image_type(content: bytes):
+    """The function returns the type of the image by its signature ('jpeg', 'png', 'gif') or None"""
+
+    for signature, name in _signatures:
+        if content.startswith(signature):
+            return name
+    return None
+
+
+def download_image(url, timeout=5) -> bytes:
+    """The function downloads the image, the body larger than MAX_IMAGE_SIZE is refused"""
+
+    import requests
+
+    with requests.get(url, timeout=timeout, stream=True) as response:
+        if response.status_code != 200:
+            raise requests.exceptions.HTTPError(f'Status {response.status_code}')
+        content = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            content += chunk
+            if len(content) > MAX_IMAGE_SIZE:
+                raise ValueError(f'Image is larger than {MAX_IMAGE_SIZE} bytes')
+    return bytes(content)
+
+
+class ImageCache:
+    """Content-addressed on-disk cache of the images with the size-based LRU eviction"""
+
+    def __init__(self, directory=None, max_size=MAX_CACHE_SIZE):
+        self.directory = directory or default_image_directory()
+        self.max_size = max_size
+        self.failed = dict()
+        self._connection = None
+        # Bytes of the blobs counted by put(), it is read from the index once and corrected by evict()
+        self._size = None
+
+    def _index(self):
+        if self._connection is None:
+            self._connection = connect(path.join(self.directory, 'index.db'))
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS IMAGES(url TEXT NOT NULL PRIMARY KEY,
+                                        digest TEXT NOT NULL, type TEXT NOT NULL, size INTEGER NOT NULL,
+                                        last_used REAL NOT NULL)""")
+            self._connection.execute('CREATE INDEX IF NOT EXISTS images_digest on IMAGES (digest, last_used)')
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def blob_path(self, digest, img_type) -> str:
+        return path.join(self.directory, digest[:2], f'{digest}.{img_type}')
+
+    def get(self, url):
+        """The function returns (path, type) of the cached image of the url or None"""
+
+        index = self._index()
+        row = index.execute('SELECT digest, type FROM IMAGES WHERE url = ?', [url]).fetchone()
+        if row is None:
+            return None
+        file_path = self.blob_path(row['digest'], row['type'])
+        if not path.isfile(file_path):
+            index.execute('DELETE FROM IMAGES WHERE url = ?', [url])
+            return None
+        index.execute('UPDATE IMAGES SET last_used = ? WHERE url = ?', [time.time(), url])
+        return file_path, row['type']
+
+    def put(self, url, content: bytes, evict=True):
+        """The function saves the image of the url and returns (path, type) or None if it is not an image.
+        If evict is False, the cache is not shrunk: the caller evicts after the batch of the images"""
+
+        img_type = image_type(content)
+        if img_type is None:
+            return None
+        digest = sha256(content).hexdigest()
+        file_path = self.blob_path(digest, img_type)
+        if not path.isfile(file_path):
+            os.makedirs(path.dirname(file_path), exist_ok=True)
+            temp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+
+        index = self._index()
+        size = self.size()
+        if index.execute('SELECT 1 FROM IMAGES WHERE digest = ? LIMIT 1', [digest]).fetchone() is None:
+            self._size = size + len(content)
+        index.execute("""INSERT INTO IMAGES(url, digest, type, size, last_used) VALUES(?, ?, ?, ?, ?)
+                         ON CONFLICT(url) DO UPDATE SET digest = excluded.digest, type = excluded.type,
+                         size = excluded.size, last_used = excluded.last_used""",
+                      [url, digest, img_type, len(content), time.time()])
+        if evict:
+            self.evict(keep={digest})
+        return file_path, img_type
+
+    def size(self, exact=False) -> int:
+        """The function returns the bytes of the blobs in the cache: the running total of this object
+        or the sum over the index if it is not known yet or `exact` is set"""
+
+        if self._size is None or exact:
+            row = self._index().execute('SELECT sum(size) FROM (SELECT max(size) AS size FROM IMAGES GROUP BY digest)')
+            self._size = row.fetchone()[0] or 0
+        return self._size
+
+    def evict(self, keep=()):
+        """The function removes the least recently used blobs (except the digests of `keep`)
+        while the cache is too large"""
+
+        if self.size() <= self.max_size:
+            return
+        index = self._index()
+        total = self.size(exact=True)
+        rows = index.execute("""SELECT digest, type, max(size) AS size, max(last_used) AS used FROM IMAGES
+                                GROUP BY digest ORDER BY used""").fetchall()
+        for row in rows:
+            if total <= self.max_size:
+                break
+            if row['digest'] in keep:
+                continue
+            try:
+                os.remove(self.blob_path(row['digest'], row['type']))
+            except FileNotFoundError:
+                pass
+            index.execute('DELETE FROM IMAGES WHERE digest = ?', [row['digest']])
+            total -= row['size']
+        self._size = total
+
+    def prefetch(self, urls, max_workers=8, per_host=2, timeout=5, deadline=60.0) -> dict:
+        """The function makes sure the images of the urls are in the cache: the missing ones are downloaded
+        concurrently (at most `max_workers` at once, `per_host` per host, `timeout` per request).
+        Returns {url: (path, type)} of the available images, the failed urls are collected in self.failed.
+        The cache is shrunk once after the downloads and the returned images are not evicted"""
+
+        result = dict()
+        missing = []
+        for url in dict.fromkeys(url for url in urls if url):
+            cached = self.get(url)
+            if cached is None:
+                missing.append(url)
+            else:
+                result[url] = cached
+
+        engine = FetchEngine(lambda url: download_image(url, timeout), max_workers, per_host, deadline)
+        for fetched in engine.run(missing):
+            if fetched.ok:
+                image = self.put(fetched.source, fetched.content, evict=False)
+                if image is not None:
+                    result[fetched.source] = image
+                    instrument.count('images_downloaded')
+                    instrument.count('image_bytes', len(fetched.content))
+                    continue
+                fetched.error = ValueError('Not a JPEG, PNG or GIF image')
+            self.failed[fetched.source] = fetched.error
+        self.evict(keep={path.basename(file_path).split('.')[0] for file_path, _ in result.values()})
+        return result
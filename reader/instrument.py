@@ -0,0 +1,139 @@
+""" Module of the instrumentation of the run: `rss_reader --profile`.
+
+The stages of the run (fetch, XML parsing, description extraction, SQLite reads and writes, rendering,
+image downloads) are timed and the counters (bytes fetched, items parsed, rows written, ...) are summed.
+The instrumentation is off by default: stage() returns a shared empty context manager and count() returns
+at once, so the instrumented code costs nearly nothing. The time of a stage includes the nested stages,
+the time of the stages which run in the threads is summed over the threads. """
+
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_enabled = False
+_lock = threading.Lock()
+_timers = dict()  # stage: [calls, seconds]
+_counters = dict()
+_started = None
+_memory = False
+_profiler = None
+_null = nullcontext()
+
+
+def enable(memory=True, profiler=False):
+    """The function starts the instrumentation: the timers, the counters,
+    the peak memory of the Python objects (tracemalloc) and the cProfile profiler if they are requested"""
+
+    global _enabled, _started, _memory, _profiler
+    reset()
+    _enabled = True
+    _started = time.perf_counter()
+    _memory = memory
+    if memory:
+        import tracemalloc
+        tracemalloc.start()
+    if profiler:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+
+def disable():
+    """The function stops the instrumentation, the collected data is kept for report()"""
+
+    global _enabled, _memory, _profiler
+    if _profiler is not None:
+        _profiler.disable()
+    if _memory:
+        import tracemalloc
+        _counters['peak_memory'] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        _memory = False
+    if _enabled:
+        _counters['total_seconds'] = time.perf_counter() - _started
+    _enabled = False
+
+
+def reset():
+    global _profiler
+    _timers.clear()
+    _counters.clear()
+    _profiler = None
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def count(name, value=1):
+    """The function adds the value to the counter"""
+
+    if _enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + value
+
+
+def add_time(name, seconds, calls=1):
+    with _lock:
+        timer = _timers.setdefault(name, [0, 0.0])
+        timer[0] += calls
+        timer[1] += seconds
+
+
+@contextmanager
+def _timed(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def stage(name):
+    """The function returns the context manager which times the stage"""
+
+    return _timed(name) if _enabled else _null
+
+
+def timed_iter(name, iterable):
+    """The function times the producing of the values of the iterator (the calls are the number of the values).
+    The iterable is returned as it is if the instrumentation is off"""
+
+    if not _enabled:
+        return iterable
+    return _timed_iter(name, iterable)
+
+
+def _timed_iter(name, iterable):
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            value = next(iterator)
+        except StopIteration:
+            add_time(name, time.perf_counter() - start, 0)
+            return
+        add_time(name, time.perf_counter() - start)
+        yield value
+
+
+def report() -> dict:
+    """The function returns the report of the run: the stages with their calls and seconds and the counters.
+    peak_memory is the peak size of the Python objects in bytes"""
+
+    with _lock:
+        stages = {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                  for name, (calls, seconds) in sorted(_timers.items())}
+        counters = dict(sorted(_counters.items()))
+    if _enabled:
+        counters['total_seconds'] = time.perf_counter() - _started
+    return {'stages': stages, 'counters': counters}
+
+
+def dump_profile(path) -> bool:
+    """The function saves the statistics of cProfile to the file (pstats format)"""
+
+    if _profiler is None:
+        return False
+    _profiler.dump_stats(path)
+    return True
@@ -0,0 +1,83 @@
+""" Module of the cache maintenance: `rss_reader maintenance`.
+
+The months older than --archive-after are moved from the cache database to the archive databases
+(rss_cash.YYYY-MM.db next to it), which are still read by --date, --from and --to. Then the retention
+policy removes the old news (--max-age) and the surplus news of every source (--max-items),
+the long descriptions saved uncompressed are compressed, the free pages are returned to the file system
+and the statistics of the query planner are refreshed. """
+
+import argparse
+import json
+import sys
+from datetime import date
+
+from reader.db.DBConnector import archive_month, compact, compress_items, forget_removed, init_cash_db, prune, \
+    select_months, set_db_path
+
+
+def months_before(today: date, months: int) -> str:
+    """The function returns the month (YYYY-MM) which is `months` months before the month of the day"""
+
+    index = today.year * 12 + today.month - 1 - months
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def run(max_age=None, max_items=None, archive_after=None, today=None) -> dict:
+    """The function archives the old months, prunes the cache by the retention policy,
+    compresses the uncompressed descriptions and compacts the database. Returns the report of the maintenance"""
+
+    from reader.models import Item
+    init_cash_db(Item())
+    today = today or date.today()
+
+    archived = dict()
+    if archive_after is not None:
+        for month in select_months(months_before(today, archive_after)):
+            archived[month] = archive_month(month)
+    removed = prune(max_age, max_items, today) if max_age is not None or max_items is not None else 0
+    forget_removed()
+    compressed = compress_items()
+    return {'archived': archived, 'removed': removed, 'compressed': compressed, 'size': compact()}
+
+
+def print_report(report: dict, as_json=False):
+    """ Function to print the report of the maintenance as text or JSON. """
+
+    if as_json:
+        print(json.dumps(report, indent=4))
+        return
+    for month, count in report['archived'].items():
+        print(f'Archived {month}: {count} item(s)')
+    print(f"Removed by the retention policy: {report['removed']} item(s)")
+    if report.get('compressed'):
+        print(f"Compressed: {report['compressed']} description(s)")
+    before, after = report['size']['before'], report['size']['after']
+    print(f"Database size: {before['bytes'] / 2 ** 20:.1f} MB -> {after['bytes'] / 2 ** 20:.1f} MB "
+          f"({after['free_pages']} free page(s))")
+
+
+def init_arguments(argv):
+    """ Function to get command line arguments of `rss_reader maintenance`. """
+
+    ap = argparse.ArgumentParser(prog='rss_reader maintenance',
+                                 description="Archive, prune and compact the cache database.")
+    ap.add_argument("--db", type=str, help="Gets file path. Path to the cache database.")
+    ap.add_argument("--max-age", type=int, metavar="DAYS", help="Remove the news older than DAYS days.")
+    ap.add_argument("--max-items", type=int, metavar="N", help="Keep only N newest news of every source.")
+    ap.add_argument("--archive-after", type=int, metavar="MONTHS",
+                    help="Move the news of the months older than MONTHS months to the archive databases.")
+    ap.add_argument("--json", action="store_true", help="Print the report as JSON in stdout")
+    arguments = ap.parse_args(argv)
+    for name in ('max_age', 'max_items', 'archive_after'):
+        if getattr(arguments, name) is not None and getattr(arguments, name) < 0:
+            ap.error(f"--{name.replace('_', '-')} can not be negative")
+    return arguments
+
+
+def main(argv=None):
+    """Runs the `rss_reader maintenance` command."""
+
+    arguments = init_arguments(sys.argv[2:] if argv is None else argv)
+    if arguments.db:
+        set_db_path(arguments.db)
+    print_report(run(arguments.max_age, arguments.max_items, arguments.archive_after), arguments.json)
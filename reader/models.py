@@ -1,25 +1,68 @@
 """ Module of creation Item """
 
 import json
+import sys
 from datetime import datetime
-from colorama import Back, Fore, Style
+from hashlib import sha256
+from reader.compression import decompress_text
+from reader.dates import parse_pubdate
 from reader.db.DBConnector import insert, delete
+from reader.export import render_item
 
-_months = {
-    'jan': '01', 'feb': '02', 'mar': '03', 'apr': '04', 'may': '05', 'jun': '06',
-    'jul': '07', 'aug': '08', 'sep': '09', 'oct': '10', 'nov': '11', 'dec': '12',
-}
+
+# Fields of the ITEM in the order of the columns of the cache database.
+# published is the publication time in UTC epoch seconds (None if pubdate can not be parsed)
+FIELDS = ('link', 'guid', 'pubdate', 'filter_date', 'published', 'language', 'title', 'description',
+          'html_description', 'source', 'category', 'image_links', 'links')
+LIST_FIELDS = ('category', 'image_links', 'links')
+_TEXT_FIELDS = tuple(field for field in FIELDS if field not in LIST_FIELDS and field != 'published')
+# Fields which may be read compressed from the cache, they are decompressed on the first access
+LAZY_FIELDS = ('description', 'html_description')
+
+
+def _lazy_text(field):
+    """The function returns the property of the field which keeps the value in the `_field` slot
+    and decompresses it on the first read"""
+
+    slot = f'_{field}'
+
+    def getter(self):
+        value = getattr(self, slot)
+        if isinstance(value, bytes):
+            value = decompress_text(value)
+            setattr(self, slot, value)
+        return value
+
+    def setter(self, value):
+        setattr(self, slot, value)
+
+    return property(getter, setter)
+
+
+def _line(*values, end="\n"):
+    """The function returns the text which print(*values, end=end) writes"""
+    return ' '.join(str(value) for value in values) + end
 
 
 class Item:
     """The ITEM class. It is created from the received data from the <item> xml file"""
 
+    # snippet is the found fragment of the description in the search results, it is not saved to the cache.
+    # cluster is the guid of the first cached ITEM with the same or nearly the same title and description,
+    # raw_hash is the hash of the raw fields of the parsed <item> (None if the ITEM is not parsed from a feed)
+    __slots__ = tuple(field for field in FIELDS if field not in LAZY_FIELDS) + \
+        tuple(f'_{field}' for field in LAZY_FIELDS) + ('snippet', 'cluster', 'raw_hash')
+
+    description = _lazy_text('description')
+    html_description = _lazy_text('html_description')
+
     def __init__(self, **kwargs):
 
         self.link = kwargs.get('link', '')
         self.guid = kwargs.get('guid', self.link)
         self.pubdate = str(kwargs.get('pubdate', datetime.now()))
-        self.filter_date = self.formatted_date()
+        self.published, self.filter_date = parse_pubdate(self.pubdate)
+        self.filter_date = self.filter_date or str(datetime.now()).split()[0]
         self.language = kwargs.get('language', '')
         self.title = kwargs.get('title', '')
         self.description = kwargs.get('description', self.title)
@@ -28,8 +71,55 @@ class Item:
         self.category = kwargs.get('category', list())
         self.image_links = kwargs.get('image_links', list())
         self.links = kwargs.get('links', list())
+        self.snippet = kwargs.get('snippet', '')
+        self.cluster = kwargs.get('cluster', self.guid)
+        self.raw_hash = kwargs.get('raw_hash')
         self.commit_data()
 
+    @classmethod
+    def from_row(cls, row):
+        """The function creates the object from the row of the cache database (sqlite3.Row or dict).
+        The data in the cache is already normalized, so it is only unpacked:
+        the iterated fields are split and the repeated strings are interned.
+        The compressed descriptions are kept as they are until they are read"""
+
+        item = cls.__new__(cls)
+        for field in _TEXT_FIELDS:
+            try:
+                value = row[field]
+            except (IndexError, KeyError):
+                value = None
+            setattr(item, field, value or '')
+        for field in LIST_FIELDS:
+            try:
+                value = row[field]
+            except (IndexError, KeyError):
+                value = None
+            setattr(item, field, value.split(';') if value else [])
+        try:
+            item.published = row['published']
+        except (IndexError, KeyError):
+            item.published = None
+        try:
+            item.cluster = row['cluster'] or item.guid
+        except (IndexError, KeyError):
+            item.cluster = item.guid
+        try:
+            item.raw_hash = row['raw_hash']
+        except (IndexError, KeyError):
+            item.raw_hash = None
+        item.snippet = ''
+
+        item.source = sys.intern(item.source)
+        item.language = sys.intern(item.language)
+        item.filter_date = sys.intern(item.filter_date)
+        # the compressed descriptions are not empty, so they are not decompressed here
+        if not item._description:
+            item._description = item.title
+        if not item._html_description:
+            item._html_description = item._description
+        return item
+
     def commit_data(self):
 
         """The function checks and converts the object data."""
@@ -52,16 +142,11 @@ class Item:
 
     def formatted_date(self):
 
-        """ The function converts the pubdate of the object to the format: 'YYYY-MM-DD'"""
+        """ The function converts the pubdate of the object to the format: 'YYYY-MM-DD'
+        (the date in the time zone of the source, today if the pubdate can not be parsed)"""
 
-        date_list = str(self.pubdate).split()
-        if len(date_list) == 6:
-            result = date_list[3] + '-' + _months[date_list[2].lower()] + '-' + date_list[1]
-        elif len(date_list) == 2:
-            result = date_list[0]
-        else:
-            result = str(datetime.now()).split()[0]
-        return result
+        _, result = parse_pubdate(self.pubdate)
+        return result or str(datetime.now()).split()[0]
 
     def save(self):
 
@@ -76,114 +161,114 @@ class Item:
     def get_fields(self):
 
         """The function returns a list of object attributes for the cache database"""
-        return [field for field in self.__dict__]
+        return list(FIELDS)
 
     def serialize(self):
         """the function converts copies the object,
         converts the iterated fields to a string, and returns a copy."""
-        copy_dict = self.__dict__.copy()
-        for key in copy_dict:
-            if isinstance(copy_dict[key], (list, set, tuple)):
-                copy_dict[key] = ';'.join(copy_dict[key])
+        copy_dict = dict()
+        for key in FIELDS:
+            value = getattr(self, key)
+            if isinstance(value, (list, set, tuple)):
+                copy_dict[key] = ';'.join(value)
+            elif value is None:
+                copy_dict[key] = ''
             else:
-                copy_dict[key] = str(copy_dict[key])
+                copy_dict[key] = str(value)
+        if self.snippet:
+            copy_dict['snippet'] = self.snippet
         return copy_dict
 
+    def content_hash(self):
+        """The function returns the hash of the object content to detect changed ITEMS in the cache database.
+        filter_date and published are derived from pubdate and the iterated fields are sorted to keep the hash stable"""
+        values = []
+        for field in self.get_fields():
+            if field in ('filter_date', 'published'):
+                continue
+            value = getattr(self, field)
+            if isinstance(value, (list, set, tuple)):
+                value = ';'.join(sorted(value))
+            values.append(f'{field}={value}')
+        return sha256('\x1f'.join(values).encode('utf-8')).hexdigest()
+
     def get_html_template(self):
         """the function returns the completed html template of the object"""
-        template = f"""
-        <table class="ItemTable" style="vertical-align: top; height: 87px;">
-            <thead>
-                <tr style="height: 23px;"> 
-                    <td style="height: 23px;" colspan="3">
-                        <strong> 
-                            {self.title}
-                        </strong>
-                    </td> 
-                </tr>
-                <tr>
-                <td style="width: 93px;" colspan="3">
-                    <p><a href="{self.link}">Link to item</a></p>
-                </td> 
-                </tr>
-            </thead>
-            <tbody>
-                <tr style="height: 10px;">
-                    <td style="width: 690px; height: 10px;" colspan="3"><strong><br /></strong>
-                        <h4>[html_description]</h4>               
-                        [images]
-                    </td>
-                </tr>
-            </tbody>
-        </table>
-        <hr/>"""
-        images = ''
-        for _, link in enumerate(self.image_links):
-            if link not in self.html_description:
-                images = images + f'Image: <img src="{link}" width="255" height="189" alt=""><br>'
-
-        template = template.replace('[html_description]', self.html_description)
-        template = template.replace('[images]', images)
-        return template
+        return render_item(self)
 
     def colorized(self, as_json=False):
         """The function print object in colorized mode"""
-        if not as_json:
-            print()
-            print(Style.NORMAL, Back.WHITE, Fore.BLACK, end="\b\b")
-            print(
-                f"Item ({self.language or ''}): {self.source}",
-                Style.RESET_ALL,
-            )
-            print(Style.NORMAL, Back.WHITE, Fore.BLACK, end="\b\b")
-            print(f"Title: {self.title}", Style.RESET_ALL)
-
-            if self.pubdate:
-                print(Style.BRIGHT, Fore.WHITE, end="\b")
-                print(f"Publication date: {self.pubdate}", Style.RESET_ALL)
-            if self.category:
-                print(Style.BRIGHT, Fore.WHITE, end="\b")
-                print(f"Category: {self.category}", Style.RESET_ALL)
-            if self.link:
-                print(Style.BRIGHT, Fore.WHITE, end="\b")
-                print(f"Link: {self.link}", Style.RESET_ALL)
-
-            print(Style.BRIGHT, Fore.YELLOW)
-            print(f"{self.description}\n", Style.RESET_ALL)
-
-            if self.image_links:
-                print(Style.BRIGHT, Fore.WHITE, end="\b")
-                print("Description images:")
-                for num, image in enumerate(self.image_links, 1):
-                    print(f"[{num}]: {image}")
-            if self.links:
-                print("Description links:")
-                for num, link in enumerate(self.links, 1):
-                    print(f"[{num}]: {link}")
-            print(2 * "\n")
-            print(Style.RESET_ALL, end="")
-        else:
-            self.print_news(as_json)
+        print(self.format_colorized(as_json), end="")
 
     def print_news(self, as_json=False):
         """The function print object"""
-        if not as_json:
-            print(f"Source: {self.source}", end="\n")
-            print(f"Language: {self.language}", end="\n")
-            if self.category:
-                print(f"Category: {'; '.join(self.category)}", end="\n")
-            print(f"Title: {self.title}", end="\n")
-            print(f"Description: {self.description}", end="\n")
-            print(f"Date: {self.pubdate}", end="\n")
-            print(f"Item Link: {self.link}", end="\n")
-            if self.links:
-                print(f"Links: {'; '.join(self.links)}", end="\n")
-            if self.image_links:
-                print(f"Images: {'; '.join(self.image_links)}", end="\n")
-            print("****************************")
-        else:
-            print(json.dumps(self.serialize(), indent=4, ensure_ascii=False, default=lambda obj: obj.__dict__))
-            print("****************************")
+        print(self.format_news(as_json), end="")
+
+    def format_colorized(self, as_json=False):
+        """The function returns the text of the object in colorized mode"""
+        if as_json:
+            return self.format_news(as_json)
+
+        from colorama import Back, Fore, Style
+        lines = ['\n']
+        lines.append(_line(Style.NORMAL, Back.WHITE, Fore.BLACK, end="\b\b"))
+        lines.append(_line(f"Item ({self.language or ''}): {self.source}", Style.RESET_ALL))
+        lines.append(_line(Style.NORMAL, Back.WHITE, Fore.BLACK, end="\b\b"))
+        lines.append(_line(f"Title: {self.title}", Style.RESET_ALL))
+
+        if self.pubdate:
+            lines.append(_line(Style.BRIGHT, Fore.WHITE, end="\b"))
+            lines.append(_line(f"Publication date: {self.pubdate}", Style.RESET_ALL))
+        if self.category:
+            lines.append(_line(Style.BRIGHT, Fore.WHITE, end="\b"))
+            lines.append(_line(f"Category: {self.category}", Style.RESET_ALL))
+        if self.link:
+            lines.append(_line(Style.BRIGHT, Fore.WHITE, end="\b"))
+            lines.append(_line(f"Link: {self.link}", Style.RESET_ALL))
+        if self.snippet:
+            lines.append(_line(Style.BRIGHT, Fore.GREEN, end="\b"))
+            lines.append(_line(f"Found: {self.snippet}", Style.RESET_ALL))
+
+        lines.append(_line(Style.BRIGHT, Fore.YELLOW))
+        lines.append(_line(f"{self.description}\n", Style.RESET_ALL))
+
+        if self.image_links:
+            lines.append(_line(Style.BRIGHT, Fore.WHITE, end="\b"))
+            lines.append("Description images:\n")
+            for num, image in enumerate(self.image_links, 1):
+                lines.append(f"[{num}]: {image}\n")
+        if self.links:
+            lines.append("Description links:\n")
+            for num, link in enumerate(self.links, 1):
+                lines.append(f"[{num}]: {link}\n")
+        lines.append(2 * "\n" + "\n")
+        lines.append(Style.RESET_ALL)
+        return ''.join(lines)
+
+    def format_news(self, as_json=False):
+        """The function returns the text of the object"""
+        if as_json:
+            return json.dumps(self.serialize(), indent=4, ensure_ascii=False) + "\n****************************\n"
+
+        lines = [f"Source: {self.source}\n", f"Language: {self.language}\n"]
+        if self.category:
+            lines.append(f"Category: {'; '.join(self.category)}\n")
+        lines.append(f"Title: {self.title}\n")
+        if self.snippet:
+            lines.append(f"Found: {self.snippet}\n")
+        lines.append(f"Description: {self.description}\n")
+        lines.append(f"Date: {self.pubdate}\n")
+        lines.append(f"Item Link: {self.link}\n")
+        if self.links:
+            lines.append(f"Links: {'; '.join(self.links)}\n")
+        if self.image_links:
+            lines.append(f"Images: {'; '.join(self.image_links)}\n")
+        lines.append("****************************\n")
+        return ''.join(lines)
+
+    def format_json_line(self):
+        """The function returns the object as one line of compact JSON (JSON Lines format)"""
+        return json.dumps(self.serialize(), ensure_ascii=False, separators=(',', ':')) + "\n"
 
     def __str__(self):
         return f'Item {self.title}: {self.formatted_date()}'
@@ -0,0 +1,71 @@
+""" Module of the buffered output of the news.
+
+The rendered items are collected in memory and written to the stream in batches,
+so printing many items costs a few large writes instead of a print() call for every line.
+The first item is written at once and a batch is not held longer than FLUSH_SECONDS,
+so the news of a slow source appear while they are read. """
+
+import sys
+from time import monotonic
+from reader import instrument
+
+# Characters collected before they are written to the stream
+BATCH_SIZE = 64 * 1024
+# Seconds the collected items may wait for the rest of the batch
+FLUSH_SECONDS = 0.5
+
+
+class ItemWriter:
+    """Renders the ITEMS in the selected mode (plain text, colorized, JSON or JSON Lines)
+    and writes them to the stream in batches. The first item is written at once, a batch is written
+    when it has batch_size characters or is older than flush_seconds and the rest when the writer is closed"""
+
+    def __init__(self, stream=None, as_json=False, colorize=False, json_lines=False, batch_size=BATCH_SIZE,
+                 flush_seconds=FLUSH_SECONDS):
+        self.stream = stream or sys.stdout
+        self.as_json = as_json
+        self.colorize = colorize
+        self.json_lines = json_lines
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.count = 0
+        self._flushed = 0
+        self._parts = []
+        self._size = 0
+        self._flushed_at = monotonic()
+
+    def render(self, item) -> str:
+        if self.json_lines:
+            return item.format_json_line()
+        if self.colorize:
+            return item.format_colorized(self.as_json)
+        return item.format_news(self.as_json)
+
+    def write(self, text: str):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.batch_size:
+            self.flush()
+
+    def write_item(self, item):
+        with instrument.stage('render.output'):
+            self.write(self.render(item))
+        self.count += 1
+        if self._parts and (self.count == 1 or monotonic() - self._flushed_at >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        instrument.count('items_rendered', self.count - self._flushed)
+        self._flushed = self.count
+        if self._parts:
+            self.stream.write(''.join(self._parts))
+            self._parts = []
+            self._size = 0
+        self.stream.flush()
+        self._flushed_at = monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.flush()
@@ -0,0 +1,213 @@
+""" Module of the local HTTP API of the cache: `rss_reader serve`.
+
+The cached news are served read-only as JSON by a threading HTTP server of the standard library:
+
+GET /items?source=URL&date=YYYYMMDD&from=DATE&to=DATE&category=NAME&limit=N&after=CURSOR
+    One page of the news, the items are serialized as by --json. `next` is the cursor of the next page
+    (the `after` parameter) or null on the last page. Without from / to the news are ordered by source
+    and date, with them the newest come first.
+GET /sources
+    The sources of the cache with the number of the news and the first and last dates.
+
+Every request reads the cache in its own transaction with a connection of a pool, so many clients
+are served at once while `rss_reader` or `rss_reader watch` write to the cache. The responses have an ETag
+of the page content, a request with the same If-None-Match gets 304 Not Modified without the body. """
+
+import argparse
+import json
+import logging
+import sys
+from datetime import datetime
+from hashlib import sha256
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from reader.dates import parse_bound
+from reader.db.DBConnector import ConnectionPool, init_cash_db, select_page, select_sources_summary, set_db_path
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+logger = logging.getLogger('rss_reader_logger')
+
+
+class RequestError(ValueError):
+    """Wrong parameters of the request, it is answered with 400 Bad Request"""
+
+
+def _single(query: dict, name):
+    values = query.get(name)
+    if not values:
+        return None
+    if len(values) > 1:
+        raise RequestError(f'Parameter {name} is repeated')
+    return values[0]
+
+
+def items_query(query: dict) -> tuple:
+    """The function converts the query string parameters of /items ({name: [values]})
+    into the parameters of the cache query, the limit, the cursor and the order"""
+
+    parameters = dict()
+    sources = [source.lower() for source in query.get('source', [])]
+    if sources:
+        parameters['source'] = sources if len(sources) > 1 else sources[0]
+    categories = query.get('category', [])
+    if categories:
+        parameters['category'] = categories
+    try:
+        date = _single(query, 'date')
+        if date is not None:
+            parameters['filter_date'] = str(datetime.strptime(date, '%Y%m%d').date())
+        if _single(query, 'from') is not None:
+            parameters['published_from'] = parse_bound(_single(query, 'from'))
+        if _single(query, 'to') is not None:
+            parameters['published_to'] = parse_bound(_single(query, 'to'), end=True)
+    except ValueError as exp:
+        raise RequestError(f'Wrong date: {exp}')
+
+    limit = _single(query, 'limit')
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_LIMIT
+    except ValueError:
+        raise RequestError(f'Wrong limit {limit}')
+    if not 0 < limit <= MAX_LIMIT:
+        raise RequestError(f'The limit must be from 1 to {MAX_LIMIT}')
+
+    order = 'newest' if 'published_from' in parameters or 'published_to' in parameters else 'source'
+    return parameters, limit, _single(query, 'after'), order
+
+
+def page_etag(rows, next_cursor) -> str:
+    """The function returns the ETag of the page: the hash of the guids, content hashes
+    and clusters of its rows, so the page is not serialized to answer 304"""
+
+    digest = sha256()
+    for row in rows:
+        digest.update(f"{row['guid']}\x1f{row['content_hash']}\x1f{row['cluster']}\x1e".encode('utf-8'))
+    digest.update(str(next_cursor).encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+class APIHandler(BaseHTTPRequestHandler):
+    """Answers the GET requests of the API. The pool of the connections is the attribute of the server"""
+
+    server_version = 'rss_reader'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=False)
+        try:
+            if url.path == '/items':
+                self.send_items(url.path, query)
+            elif url.path == '/sources':
+                self.send_sources()
+            else:
+                self.send_json({'error': f'Unknown path {url.path}'}, status=404)
+        except RequestError as exp:
+            self.send_json({'error': str(exp)}, status=400)
+        except Exception as exp:
+            logger.error(f'serve: {self.path}: {exp}')
+            self.send_json({'error': 'Internal error'}, status=500)
+
+    def send_items(self, url_path, query):
+        parameters, limit, after, order = items_query(query)
+        try:
+            rows, next_cursor = self.server.pool.read(select_page, parameters, limit, after, order)
+        except ValueError as exp:
+            raise RequestError(str(exp))
+        etag = page_etag(rows, next_cursor)
+        if self.not_modified(etag):
+            return
+
+        from reader.models import Item
+        body = {'items': [Item.from_row(row).serialize() for row in rows], 'count': len(rows),
+                'next': next_cursor, 'next_url': None}
+        if next_cursor:
+            next_query = {name: values for name, values in query.items() if name != 'after'}
+            next_query['after'] = [next_cursor]
+            body['next_url'] = f'{url_path}?{urlencode(next_query, doseq=True)}'
+        self.send_json(body, etag)
+
+    def send_sources(self):
+        rows = self.server.pool.read(select_sources_summary)
+        digest = sha256(json.dumps([tuple(row) for row in rows]).encode('utf-8'))
+        etag = f'"{digest.hexdigest()[:32]}"'
+        if not self.not_modified(etag):
+            self.send_json({'sources': [dict(row) for row in rows]}, etag)
+
+    def not_modified(self, etag) -> bool:
+        """The function answers 304 Not Modified if the client has the page with the ETag"""
+
+        if etag not in [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+        return True
+
+    def send_json(self, body: dict, etag=None, status=200):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            logger.info(f'serve: {self.address_string()} {format % args}')
+
+
+class APIServer(ThreadingHTTPServer):
+    """Threading HTTP server of the API with the pool of the connections to the cache"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, pool_size=8, db_path=None, verbose=False):
+        super().__init__(address, APIHandler)
+        self.pool = ConnectionPool(pool_size, db_path)
+        self.verbose = verbose
+
+    def server_close(self):
+        super().server_close()
+        self.pool.close()
+
+
+def init_arguments(argv):
+    """ Function to get command line arguments of `rss_reader serve`. """
+
+    ap = argparse.ArgumentParser(prog='rss_reader serve', description="Serve the cache as a read-only JSON API.")
+    ap.add_argument("--host", type=str, default='127.0.0.1', help="Address to listen on (127.0.0.1 by default).")
+    ap.add_argument("--port", type=int, default=8080, help="Port to listen on (8080 by default).")
+    ap.add_argument("--pool", type=int, default=8, metavar="N",
+                    help="Number of the connections to the cache database for the concurrent requests.")
+    ap.add_argument("--db", type=str, help="Gets file path. Path to the cache database.")
+    ap.add_argument("--verbose", action="store_true", help="Outputs the requests")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    """ Function to run `rss_reader serve`. """
+
+    args = init_arguments(sys.argv[2:] if argv is None else argv)
+    if args.db:
+        set_db_path(args.db)
+    from reader.functions import _create_logger
+    from reader.models import Item
+    _create_logger(args.verbose)
+    init_cash_db(Item())
+
+    server = APIServer((args.host, args.port), args.pool, verbose=args.verbose)
+    print(f'Serving the cache on http://{args.host}:{server.server_port}/items', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,239 @@
+""" Module of the watch daemon: `rss_reader watch`.
+
+The feeds of the registry (the SOURCES table of the cache database) are polled from one long-running process.
+Every feed has its own schedule: the interval is halved when the feed brings new items and grows when it
+does not, it is never shorter than the <ttl> of the feed, the <skipHours> of the feed are skipped,
+and a failing feed is retried with exponential backoff. """
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+
+from reader.db.DBConnector import init_cash_db, save_source, select_source, select_watched_sources, set_db_path
+
+# Seconds between the polls of a feed
+MIN_INTERVAL = 60
+DEFAULT_INTERVAL = 15 * 60
+MAX_INTERVAL = 6 * 60 * 60
+MAX_BACKOFF = 24 * 60 * 60
+
+
+def adapt_interval(interval, new_items: int, ttl=None) -> float:
+    """The function returns the next interval of the feed: shorter if the last poll brought new items,
+    longer if it did not. The <ttl> of the feed (minutes) is the lower bound"""
+
+    interval = interval or DEFAULT_INTERVAL
+    interval = interval / 2 if new_items else interval * 1.5
+    if ttl:
+        interval = max(interval, ttl * 60)
+    return min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+
+
+def backoff_interval(interval, failures: int) -> float:
+    """The function returns the delay before the next poll of the feed which failed `failures` times in a row"""
+
+    return min((interval or DEFAULT_INTERVAL) * 2 ** failures, MAX_BACKOFF)
+
+
+def skip_hours_until(moment: float, skip_hours) -> float:
+    """The function moves the moment (epoch) to the start of the first hour (UTC) which is not in skip_hours"""
+
+    skip_hours = set(skip_hours or ())
+    if len(skip_hours) >= 24:
+        return moment
+    while datetime.fromtimestamp(moment, timezone.utc).hour in skip_hours:
+        moment = (moment // 3600 + 1) * 3600
+    return moment
+
+
+def _int(value):
+    try:
+        return int(str(value).strip())
+    except ValueError:
+        return None
+
+
+class Watcher:
+    """Polls the feeds of the registry when they are due and keeps their schedule and statistics.
+    `clock` and `sleep` can be replaced to run the watcher in the tests"""
+
+    def __init__(self, parser=None, clock=time.time, sleep=time.sleep):
+        if parser is None:
+            from reader.functions import Parser
+            parser = Parser()
+        self.parser = parser
+        # only the new items are counted, the known ones are not read back from the cache
+        self.parser.resolve_known = False
+        self.clock = clock
+        self.sleep = sleep
+        from reader.models import Item
+        init_cash_db(Item())
+
+    def add(self, sources):
+        """The function adds the sources to the registry, they are polled on the next round"""
+
+        for source in sources:
+            save_source(source.lower(), url=source, watched=1, next_poll=None, failures=0)
+
+    def remove(self, sources):
+        """The function removes the sources from the registry, their news stay in the cache"""
+
+        for source in sources:
+            save_source(source.lower(), watched=0)
+
+    def feeds(self) -> list:
+        """The function returns the registry: the state and the statistics of every watched feed"""
+
+        return select_watched_sources()
+
+    def due(self) -> list:
+        now = self.clock()
+        return [feed for feed in self.feeds() if feed['next_poll'] is None or feed['next_poll'] <= now]
+
+    def poll(self, feeds: list) -> dict:
+        """The function polls the feeds concurrently, saves their news, schedule and statistics.
+        Returns {source: number of the new items or the error}"""
+
+        from reader.engine import FetchEngine
+
+        by_url = {feed['url'] or feed['source']: feed for feed in feeds}
+        engine = FetchEngine(lambda url: self.parser.fetch_feed(url, cached=by_url[url]),
+                             self.parser.max_workers, self.parser.per_host, self.parser.deadline)
+        result = dict()
+        for fetched in engine.run(list(by_url)):
+            feed = by_url[fetched.source]
+            now = self.clock()
+            fields = {'last_fetch': now, 'polls': feed['polls'] + 1}
+            try:
+                if not fetched.ok:
+                    raise fetched.error
+                new_items = self._process(fetched.content)
+            except Exception as exp:
+                failures = feed['failures'] + 1
+                self.parser.logger.error(f'Watched source {fetched.source} failed ({failures} in a row): {exp}')
+                fields.update(failures=failures, last_error=str(exp),
+                              next_poll=now + backoff_interval(feed['poll_interval'], failures))
+                result[fetched.source] = exp
+            else:
+                head = self.parser.feed_heads.get(fetched.source) or dict()
+                # The channel data of the last parsed body, the saved values if the feed was not modified
+                ttl = _int(head['ttl']) if head.get('ttl') else feed['ttl']
+                hours = head['skip_hours'] if 'skip_hours' in head else (feed['skip_hours'] or '').split(',')
+                skip_hours = [hour for hour in map(_int, hours) if hour is not None]
+                interval = adapt_interval(feed['poll_interval'], new_items, ttl)
+                fields.update(failures=0, last_error=None, last_latency=fetched.elapsed, last_new=new_items,
+                              new_items=feed['new_items'] + new_items, poll_interval=interval, ttl=ttl,
+                              skip_hours=','.join(str(hour) for hour in skip_hours),
+                              last_change=now if new_items else feed['last_change'],
+                              next_poll=skip_hours_until(now + interval, skip_hours))
+                self.parser.logger.info(f'Watched source {fetched.source}: {new_items} new item(s), '
+                                        f'next poll in {fields["next_poll"] - now:.0f} s')
+                result[fetched.source] = new_items
+            save_source(feed['source'], **fields)
+        return result
+
+    def _process(self, response) -> int:
+        """The function saves the news of the answer and returns the number of the new items"""
+
+        if response.not_modified:
+            cached = select_source(response.source.lower())
+            if any(cached.get(key) != value for key, value in response.validators().items()):
+                save_source(response.source.lower(), **response.validators())
+            return 0
+        self.parser.ingest_counts = dict()
+        self.parser.process_feed(response)
+        return self.parser.ingest_counts.get('inserted', 0)
+
+    def run(self, once=False, max_sleep=60.0):
+        """The function polls the due feeds until it is interrupted (or one round if `once` is set)"""
+
+        while True:
+            due = self.due()
+            if due:
+                self.poll(due)
+            if once:
+                return
+            polls = [feed['next_poll'] for feed in self.feeds() if feed['next_poll'] is not None]
+            delay = min(polls) - self.clock() if polls else max_sleep
+            self.sleep(min(max(delay, 1.0), max_sleep))
+
+
+def _moment(epoch) -> str:
+    if epoch is None:
+        return '-'
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def print_feeds(feeds: list, as_json=False):
+    """ Function to print the registry with the statistics of the feeds as a table or JSON. """
+
+    if as_json:
+        print(json.dumps(feeds, indent=4, ensure_ascii=False))
+        return
+    if not feeds:
+        print('The watch list is empty')
+        return
+    print(f"{'Source':<40} {'Polls':>5} {'Last fetch (UTC)':<19} {'Latency':>8} {'New':>4} {'Total':>6} "
+          f"{'Interval':>8} {'Next poll (UTC)':<19} {'Fails':>5}  Last error")
+    for feed in feeds:
+        latency = f"{feed['last_latency']:.2f}s" if feed['last_latency'] is not None else '-'
+        interval = f"{feed['poll_interval']:.0f}s" if feed['poll_interval'] is not None else '-'
+        print(f"{feed['url'] or feed['source']:<40} {feed['polls']:>5} {_moment(feed['last_fetch']):<19} "
+              f"{latency:>8} {feed['last_new'] if feed['last_new'] is not None else '-':>4} {feed['new_items']:>6} "
+              f"{interval:>8} {_moment(feed['next_poll']):<19} {feed['failures']:>5}  {feed['last_error'] or ''}")
+
+
+def init_arguments(argv):
+    """ Function to get command line arguments of `rss_reader watch`. """
+
+    ap = argparse.ArgumentParser(prog='rss_reader watch', description="Poll the registered feeds from one process.")
+    ap.add_argument("--db", type=str, help="Gets file path. Path to the cache database.")
+    ap.add_argument("--verbose", action="store_true", help="Outputs verbose status messages")
+    commands = ap.add_subparsers(dest="command", required=True)
+    add = commands.add_parser("add", help="Add RSS URL(s) to the watch list.")
+    add.add_argument("source", nargs="+", help="RSS URL(s)")
+    remove = commands.add_parser("remove", help="Remove RSS URL(s) from the watch list.")
+    remove.add_argument("source", nargs="+", help="RSS URL(s)")
+    for name, text in (("list", "Print the watch list with the statistics of the feeds."),
+                       ("stats", "Same as list.")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("--json", action="store_true", help="Print result as JSON in stdout")
+    run = commands.add_parser("run", help="Poll the feeds when they are due until interrupted.")
+    run.add_argument("--once", action="store_true", help="Poll the due feeds once and exit.")
+    run.add_argument("--workers", type=int, default=8, help="Maximum number of feeds fetched at the same time.")
+    run.add_argument("--per-host", type=int, default=2,
+                     help="Maximum number of feeds fetched at the same time from one host.")
+    run.add_argument("--max-sleep", type=float, default=60.0,
+                     help="Maximum number of seconds between the checks of the schedule.")
+    run.add_argument("--stop-after-known", type=int, default=0, metavar="N",
+                     help="Stop reading a feed after N cached news in a row.")
+    return ap.parse_args(argv)
+
+
+def main(argv=None):
+    """Runs the `rss_reader watch` command."""
+
+    arguments = init_arguments(sys.argv[2:] if argv is None else argv)
+    if arguments.db:
+        set_db_path(arguments.db)
+
+    from reader.functions import Parser
+    parser = Parser(verbose=arguments.verbose)
+    watcher = Watcher(parser)
+
+    if arguments.command == 'add':
+        watcher.add(arguments.source)
+    elif arguments.command == 'remove':
+        watcher.remove(arguments.source)
+    elif arguments.command in ('list', 'stats'):
+        print_feeds(watcher.feeds(), arguments.json)
+    else:
+        parser.max_workers = arguments.workers
+        parser.per_host = arguments.per_host
+        parser.stop_after_known = max(0, arguments.stop_after_known)
+        try:
+            watcher.run(arguments.once, arguments.max_sleep)
+        except KeyboardInterrupt:
+            pass
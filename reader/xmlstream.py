@@ -0,0 +1,160 @@
+""" Module of the streaming RSS parser.
+
+The feed is read incrementally with lxml iterparse, every <item> is turned into a dictionary
+as soon as its closing tag is read and the element is freed right away,
+so the memory used does not depend on the size of the feed. """
+
+import re
+from io import BytesIO
+
+_declaration = re.compile(rb'^\s*<\?xml[^>]*encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+_charset = re.compile(r'charset\s*=\s*["\']?([A-Za-z0-9._-]+)', re.IGNORECASE)
+_boms = (b'\xef\xbb\xbf', b'\xff\xfe', b'\xfe\xff')
+
+
+class FeedFormatError(ValueError):
+    """The document is not an RSS feed"""
+    pass
+
+
+class FeedVersionError(TypeError):
+    """The document is not an RSS 2.0 feed"""
+    pass
+
+
+def charset_from_headers(headers) -> str:
+    """The function returns the charset of the Content-Type header or None"""
+
+    match = _charset.search(headers.get('Content-Type', '') or '')
+    return match.group(1) if match else None
+
+
+def detect_encoding(head: bytes, http_encoding=None):
+    """The function returns the encoding lxml should use for the document.
+    The XML declaration and the BOM have priority, the HTTP charset is used when both are absent"""
+
+    if head.startswith(_boms) or _declaration.match(head):
+        return None
+    return http_encoding
+
+
+def _local_name(element):
+    tag = element.tag
+    if not isinstance(tag, str):
+        return None, None
+    if tag[0] == '{':
+        namespace, _, name = tag[1:].partition('}')
+        return namespace, name
+    return None, tag
+
+
+def _children(element) -> dict:
+    """The function returns {local name: first child} of the element.
+    Children without a namespace win over the namespaced ones with the same local name"""
+
+    result = dict()
+    namespaced = set()
+    for child in element:
+        namespace, name = _local_name(child)
+        if name is None:
+            continue
+        if name not in result or (name in namespaced and namespace is None):
+            result[name] = child
+            if namespace is None:
+                namespaced.discard(name)
+            else:
+                namespaced.add(name)
+    return result
+
+
+def _text(element) -> str:
+    return ''.join(element.itertext()) if element is not None else ''
+
+
+def _free(element):
+    """The function frees the element and the already processed siblings before it"""
+
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class FeedStream:
+    """Streaming reader of the RSS feed.
+
+    `head` is filled with the channel data (title, version, language, description, ttl, skip_hours)
+    while the feed is read, `items()` yields a dictionary with the raw fields of every <item>."""
+
+    def __init__(self, content, encoding=None):
+        self.stream = BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
+        self.http_encoding = encoding
+        self.head = {'title': '', 'version': '', 'language': '', 'description': '', 'ttl': '', 'skip_hours': []}
+
+    def _encoding(self):
+        if not hasattr(self.stream, 'seek'):
+            return self.http_encoding
+        head = self.stream.read(1024)
+        self.stream.seek(0)
+        return detect_encoding(head, self.http_encoding)
+
+    def items(self):
+        """The function yields the dictionaries with the fields of the <item> elements"""
+
+        from lxml import etree
+
+        events = etree.iterparse(self.stream, events=('start', 'end'), encoding=self._encoding(),
+                                 recover=True, huge_tree=True, resolve_entities=False, no_network=True,
+                                 remove_comments=True, remove_pis=True)
+        depth = 0
+        root = None
+        try:
+            for event, element in events:
+                namespace, name = _local_name(element)
+                if event == 'start':
+                    depth += 1
+                    if root is None:
+                        root = name
+                        if name != 'rss':
+                            raise FeedFormatError('Please ensure that the URL entered is correct')
+                        self.head['version'] = element.get('version', '')
+                        if self.head['version'] != '2.0':
+                            raise FeedVersionError('Wrong version of RSS-FEED')
+                    continue
+
+                depth -= 1
+                if depth == 2 and namespace is None:
+                    if name == 'item':
+                        yield self._item(element)
+                    elif name in ('title', 'language', 'description', 'ttl'):
+                        self.head[name] = _text(element)
+                    elif name == 'skipHours':
+                        self.head['skip_hours'] = [_text(hour).strip() for hour in element]
+                    else:
+                        continue
+                    _free(element)
+        except etree.XMLSyntaxError:
+            if root is None:
+                raise FeedFormatError('Please ensure that the URL entered is correct')
+            raise
+
+        if root is None:
+            raise FeedFormatError('Please ensure that the URL entered is correct')
+
+    def _item(self, element) -> dict:
+        children = _children(element)
+        link = _text(children.get('link'))
+        guid = children.get('guid')
+        pubdate = children.get('pubDate')
+        categories = [_text(child) for child in element if _local_name(child) == (None, 'category')]
+        description = children.get('description')
+        return {
+            "language": self.head['language'],
+            "link": link,
+            "guid": _text(guid) if guid is not None else link,
+            "title": _text(children.get('title')),
+            "pubdate": _text(pubdate) if pubdate is not None else '',
+            "category": [category.strip() for category in categories if category.strip()],
+            "html_description": _text(description) if description is not None else '',
+        }
@@ -12,6 +12,9 @@ package_data = {'': ['*']}
 
 install_requires = ['requests', 'lxml', 'beautifulsoup4==4.8.1', 'fpdf', 'colorama', ],
 
+# pypdf merges the files of the sharded PDF export (--pdf-merge)
+extras_require = {'merge': ['pypdf']}
+
 entry_points = {'console_scripts': ['rss_reader = reader.__main__:main', 'rss_reader.py = reader.__main__:main']}
 
 setup_kwargs = {
@@ -27,6 +30,7 @@ setup_kwargs = {
     'packages': packages,
     'package_data': package_data,
     'install_requires': install_requires,
+    'extras_require': extras_require,
     'entry_points': entry_points,
     'python_requires': '>=3.9',
 }
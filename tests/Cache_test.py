@@ -0,0 +1,84 @@
+import unittest
+import uuid
+from unittest.mock import patch
+from reader.dates import parse_bound
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+
+
+class CacheReadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        DBConnector.init_cash_db(Item())
+        cls.source = f'http://cache-test/{uuid.uuid4()}'
+        cls.items = [Item(guid=f'{cls.source}/{num}', title=f'News {num}', source=cls.source,
+                          pubdate=f'Fri, {10 + num % 3} Oct 2031 12:02:57 +0300') for num in range(7)]
+        DBConnector.ingest(cls.items)
+
+    @classmethod
+    def tearDownClass(cls):
+        for item in cls.items:
+            DBConnector.delete(item)
+
+    def test_iter_rows_from_cash(self):
+        rows = DBConnector.iter_rows_from_cash({'source': self.source}, chunk_size=2)
+        self.assertNotIsInstance(rows, list)
+        self.assertEqual(sorted(row['guid'] for row in rows), sorted(item.guid for item in self.items))
+
+    def test_keyset_pagination(self):
+        pages = []
+        after = None
+        while True:
+            parameters = {'source': self.source}
+            rows = list(DBConnector.iter_rows_from_cash(parameters, 3, after))
+            pages.append([row['guid'] for row in rows])
+            if len(rows) < 3:
+                break
+            after = DBConnector.encode_cursor(rows[-1])
+
+        guids = [guid for page in pages for guid in page]
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sorted(guids), sorted(item.guid for item in self.items))
+        dates = [Item.from_row(row).filter_date for row in DBConnector.iter_rows_from_cash(parameters)]
+        self.assertEqual(dates, sorted(dates))
+
+    def test_parser_next_cursor(self):
+        parser = Parser(None, '2031-10-10', 2)
+        first = list(parser.iter_items())
+        self.assertEqual(len(first), 2)
+        self.assertIsNotNone(parser.next_cursor)
+
+        parser.after = parser.next_cursor
+        second = list(parser.iter_items())
+        self.assertEqual(len(second), 1)
+        self.assertIsNone(parser.next_cursor)
+        self.assertFalse(set(first) & set(second))
+
+    def test_date_range(self):
+        parameters = {'source': self.source, 'published_from': parse_bound('2031-10-11'),
+                      'published_to': parse_bound('2031-10-12', end=True)}
+        rows = list(DBConnector.iter_rows_from_cash(parameters, order='newest'))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual([row['published'] for row in rows], sorted((row['published'] for row in rows), reverse=True))
+
+        after = DBConnector.encode_cursor(rows[1], 'newest')
+        rest = list(DBConnector.iter_rows_from_cash(parameters, after=after, order='newest'))
+        self.assertEqual([row['guid'] for row in rest], [row['guid'] for row in rows[2:]])
+
+    def test_parser_date_range(self):
+        parser = Parser(self.source)
+        parser.date_from = parse_bound('20311012')
+        with patch.object(Parser, 'update_cash_db', return_value=[]):
+            items = list(parser.iter_items())
+        self.assertEqual({item.filter_date for item in items}, {'2031-10-12'})
+        self.assertEqual(len(items), 2)
+
+    def test_wrong_cursor(self):
+        with self.assertRaises(ValueError):
+            list(DBConnector.iter_rows_from_cash({}, after='wrong'))
+
+
+if __name__ == '__main__':
+    unittest.main()
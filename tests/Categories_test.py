@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+from reader.__main__ import init_arguments
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+
+LEGACY_COLUMNS = ('link', 'guid', 'pubdate', 'filter_date', 'language', 'title', 'description', 'html_description',
+                  'source', 'category', 'image_links', 'links')
+
+
+class CategoriesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.default_path = DBConnector.get_db_path()
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.directory.name, 'rss_cash.db')
+        DBConnector.set_db_path(self.db_path)
+
+    def tearDown(self):
+        DBConnector.set_db_path(self.default_path)
+        self.directory.cleanup()
+
+    def make_items(self):
+        return [
+            Item(guid='c1', source='http://a/', title='One', pubdate='Wed, 01 Dec 2021 10:00:00 +0000',
+                 category=['Sport', 'News'], links=['http://a/l1'], image_links=['http://a/i1.png']),
+            Item(guid='c2', source='http://a/', title='Two', pubdate='Wed, 01 Dec 2021 11:00:00 +0000',
+                 category=['Sport']),
+            Item(guid='c3', source='http://b/', title='Three', pubdate='Thu, 02 Dec 2021 10:00:00 +0000',
+                 category=['Politics']),
+        ]
+
+    def test_child_tables(self):
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest(self.make_items())
+        item = Item.from_row(DBConnector.select_rows_from_cash({'guid': 'c1'})[0])
+        self.assertEqual(sorted(item.category), ['News', 'Sport'])
+        self.assertEqual(item.links, ['http://a/l1'])
+        self.assertEqual(item.image_links, ['http://a/i1.png'])
+
+        columns = {row['name'] for row in DBConnector.get_connection().execute('PRAGMA table_info(ITEMS)')}
+        self.assertFalse(columns & {'category', 'links', 'image_links'})
+
+    def test_category_filter(self):
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest(self.make_items())
+        rows = DBConnector.select_rows_from_cash({'category': 'sport'})
+        self.assertEqual([row['guid'] for row in rows], ['c1', 'c2'])
+
+        parser = Parser(filter_date='2021-12-01')
+        parser.category = 'News'
+        self.assertEqual([item.guid for item in parser.get_items()], ['c1'])
+
+        plan = ' '.join(row[-1] for row in DBConnector.get_connection().execute(
+            'EXPLAIN QUERY PLAN ' + DBConnector._select_query(DBConnector.get_connection().cursor(),
+                                                              {'category': 'sport'})[0], ['sport']))
+        self.assertIn('categories_name', plan)
+
+    def test_top_categories(self):
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest(self.make_items())
+        rows = [tuple(row) for row in DBConnector.select_top_categories({}, 1)]
+        self.assertEqual(rows, [('http://a/', '2021-12-01', 'Sport', 2, 1),
+                                ('http://b/', '2021-12-02', 'Politics', 1, 1)])
+        rows = Parser('http://A/').get_top_categories(5)
+        self.assertEqual([row['category'] for row in rows], ['Sport', 'News'])
+
+    def test_stats(self):
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest(self.make_items())
+        stats = Parser().get_stats(2)
+        self.assertEqual([tuple(row.values()) for row in stats['volume']],
+                         [('http://a/', '2021-12-01', 2), ('http://b/', '2021-12-02', 1)])
+        self.assertEqual({row['hour']: row['items'] for row in stats['hours'] if row['items']}, {10: 2, 11: 1})
+        self.assertEqual(len(stats['hours']), 24)
+        self.assertEqual(stats['categories'], [{'category': 'Sport', 'items': 2}, {'category': 'News', 'items': 1}])
+
+        parser = Parser('http://B/')
+        parser.category = 'politics'
+        stats = parser.get_stats()
+        self.assertEqual(stats['volume'], [{'source': 'http://b/', 'filter_date': '2021-12-02', 'items': 1}])
+        self.assertEqual(stats['categories'], [{'category': 'Politics', 'items': 1}])
+
+    def test_stats_arguments(self):
+        with patch('sys.argv', ['rss_reader', '--stats', 'http://a/']):
+            arguments = init_arguments()
+        self.assertEqual((arguments.stats, arguments.stats_top, arguments.source), (True, 10, ['http://a/']))
+        with patch('sys.argv', ['rss_reader', '--stats', '--stats-top', '3']):
+            self.assertEqual(init_arguments().stats_top, 3)
+
+    def test_migration(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.execute(f"CREATE TABLE ITEMS({', '.join(column + ' TEXT' for column in LEGACY_COLUMNS)})")
+        connection.execute(f"INSERT INTO ITEMS({', '.join(LEGACY_COLUMNS)}) VALUES({', '.join('?' * 12)})",
+                           ['http://old/1', 'old-1', '', '2021-10-26', 'ru', 'Old', 'Old', 'Old', 'http://old/',
+                            'Интерьер;Дом', 'http://old/img.jpeg', 'http://old/link'])
+        connection.commit()
+        connection.close()
+
+        DBConnector.init_cash_db(Item())
+        item = Item.from_row(DBConnector.select_rows_from_cash({'guid': 'old-1'})[0])
+        self.assertEqual(sorted(item.category), ['Дом', 'Интерьер'])
+        self.assertEqual(item.image_links, ['http://old/img.jpeg'])
+        self.assertEqual(item.links, ['http://old/link'])
+        legacy = DBConnector.get_connection().execute('select category from ITEMS').fetchone()[0]
+        self.assertIsNone(legacy)
+        self.assertEqual(len(list(DBConnector.iter_search_from_cash('Интерьер', {}))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from reader.compression import COMPRESSION_ENV, compress_text, decompress_text
+from reader.db import DBConnector
+from reader.models import Item
+
+LONG = ' '.join(f'compressed news number {num}' for num in range(100))
+
+
+def make_item(num, text=LONG):
+    return Item(guid=f'compression/{num}', title=f'Compression {num}', source='compression', description=text,
+                html_description=f'<p>{text}</p>', pubdate='2021-10-26T12:00:00+00:00')
+
+
+class CompressionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'rss_cash.db'))
+        DBConnector.init_cash_db(Item())
+
+    def tearDown(self):
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def stored(self, column='description'):
+        return DBConnector.get_connection().execute(f'SELECT {column} FROM ITEMS ORDER BY rowid').fetchall()
+
+    def test_compress_text(self):
+        value = compress_text(LONG, 'zlib')
+        self.assertIsInstance(value, bytes)
+        self.assertLess(len(value), len(LONG))
+        self.assertEqual(decompress_text(value), LONG)
+        self.assertEqual(compress_text('short text', 'zlib'), 'short text')
+        self.assertEqual(compress_text(LONG, 'none'), LONG)
+        self.assertIsNone(decompress_text(None))
+        self.assertRaises(ValueError, decompress_text, b'\x7fdata')
+
+    def test_lazy_item(self):
+        DBConnector.ingest([make_item(1), make_item(2, 'short text')])
+        self.assertIsInstance(self.stored()[0][0], bytes)
+        self.assertIsInstance(self.stored('html_description')[0][0], bytes)
+        self.assertEqual(self.stored()[1][0], 'short text')
+
+        item = Item.from_row(DBConnector.select_rows_from_cash({'source': 'compression'})[0])
+        self.assertIsInstance(item._description, bytes)
+        self.assertEqual(item.description, LONG)
+        self.assertEqual(item._description, LONG)
+        self.assertEqual(item.html_description, f'<p>{LONG}</p>')
+        self.assertEqual(DBConnector.select_items_from_cash({'guid': 'compression/1'})[0]['description'], LONG)
+
+        # the unchanged item is not written again, the full-text index has the plain text
+        self.assertEqual(DBConnector.ingest([item])['unchanged'], 1)
+        found = list(DBConnector.iter_search_from_cash('number', {}, 0, snippets=True))
+        self.assertEqual([row['guid'] for row in found], ['compression/1'])
+        self.assertIn('[number]', found[0]['snippet'])
+
+    def test_compression_off_and_migration(self):
+        with patch.dict(os.environ, {COMPRESSION_ENV: 'none'}):
+            DBConnector.ingest([make_item(1)])
+        self.assertEqual(self.stored()[0][0], LONG)
+
+        # the cache of the version 3 is compressed by the migration
+        DBConnector.get_connection().execute('PRAGMA user_version = 3')
+        DBConnector.init_cash_db(Item())
+        self.assertIsInstance(self.stored()[0][0], bytes)
+        self.assertEqual(Item.from_row(DBConnector.select_rows_from_cash({})[0]).description, LONG)
+        self.assertEqual(DBConnector.compress_items(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
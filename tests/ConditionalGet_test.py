@@ -0,0 +1,78 @@
+import unittest
+from unittest import mock
+from reader.functions import Parser
+from tests.feed_server import FeedServer, make_feed
+
+
+def feed(link):
+    return make_feed('Conditional', [
+        {'title': 'Cached news', 'link': link,
+         'pubdate': 'Tue, 26 Oct 2021 12:02:57 +0300'},
+    ])
+
+
+class ConditionalGetTest(unittest.TestCase):
+
+    def test_not_modified_by_etag(self):
+        def route(handler):
+            if handler.headers.get('If-None-Match') == '"v1"':
+                return {'status': 304}
+            return {'body': feed(server.url('/etag/1')), 'headers': {'ETag': '"v1"'}}
+
+        with FeedServer({'/etag': route}) as server:
+            Parser(server.url('/etag')).get_items()
+            parser = Parser(server.url('/etag'))
+            with mock.patch.object(Parser, 'parse_feed') as parse_feed:
+                items = parser.get_items()
+
+        parse_feed.assert_not_called()
+        self.assertEqual(server.requests[-1][1].get('If-None-Match'), '"v1"')
+        self.assertEqual([item.title for item in items], ['Cached news'])
+
+    def test_not_modified_by_body_hash(self):
+        with FeedServer() as server:
+            server.routes['/hash'] = {'body': feed(server.url('/hash/1'))}
+            Parser(server.url('/hash')).get_items()
+            with mock.patch.object(Parser, 'parse_feed') as parse_feed:
+                items = Parser(server.url('/hash')).get_items()
+
+        parse_feed.assert_not_called()
+        self.assertEqual([item.title for item in items], ['Cached news'])
+
+    def test_modified_body_is_parsed(self):
+        with FeedServer() as server:
+            server.routes['/changed'] = {'body': feed(server.url('/changed/1')),
+                                         'headers': {'Last-Modified': 'Tue, 26 Oct 2021 12:00:00 GMT'}}
+            Parser(server.url('/changed')).get_items()
+            server.routes['/changed'] = {'body': make_feed('Conditional', [
+                {'title': 'Fresh news', 'link': server.url('/changed/2')},
+            ])}
+            items = Parser(server.url('/changed')).get_items()
+
+        self.assertEqual(server.requests[-1][1].get('If-Modified-Since'), 'Tue, 26 Oct 2021 12:00:00 GMT')
+        self.assertEqual([item.title for item in items], ['Fresh news'])
+
+
+    def test_not_modified_order(self):
+        news = [{'title': f'T{num}', 'link': f'http://conditional/order/{num}'} for num in range(5, 0, -1)]
+        with FeedServer() as server:
+            server.routes['/order'] = {'body': make_feed('Conditional', news), 'headers': {'ETag': '"v1"'}}
+            modified = Parser(server.url('/order'), limit=2).get_items()
+            server.routes['/order'] = lambda handler: {'status': 304}
+            not_modified = Parser(server.url('/order'), limit=2).get_items()
+            self.assertEqual([item.title for item in modified], ['T5', 'T4'])
+            self.assertEqual([item.title for item in not_modified], ['T5', 'T4'])
+
+            # the feed shrank, the same body on the next poll shows only the items it carries
+            server.routes['/order'] = {'body': make_feed('Conditional', news[:3])}
+            self.assertEqual(len(Parser(server.url('/order')).get_items()), 3)
+            with mock.patch.object(Parser, 'parse_feed') as parse_feed:
+                items = Parser(server.url('/order')).get_items()
+            parse_feed.assert_not_called()
+            self.assertEqual([item.title for item in items], ['T5', 'T4', 'T3'])
+            # the server does not send the ETag any more, the old one is not sent again
+            self.assertNotIn('If-None-Match', server.requests[-1][1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from calendar import timegm
+from reader.dates import parse_pubdate, parse_bound
+
+EPOCH = timegm((2021, 10, 26, 9, 2, 57))
+
+
+class ParsePubdateTest(unittest.TestCase):
+
+    def test_formats(self):
+        for text in ('Tue, 26 Oct 2021 12:02:57 +0300', 'Tue, 26 Oct 2021 09:02:57 GMT', '26 Oct 2021 12:02:57 +03:00',
+                     'Tue, 26 Oct 21 05:02:57 EDT', 'Tuesday, 26 October 2021 12:02:57 +0300',
+                     '2021-10-26T12:02:57+03:00', '2021-10-26T09:02:57Z', '2021-10-26T09:02:57.123Z',
+                     '2021-10-26 09:02:57'):
+            self.assertEqual(parse_pubdate(text), (EPOCH, '2021-10-26'), text)
+
+    def test_date_of_source(self):
+        self.assertEqual(parse_pubdate('Tue, 26 Oct 2021 01:30:00 +0300'),
+                         (timegm((2021, 10, 25, 22, 30, 0)), '2021-10-26'))
+        self.assertEqual(parse_pubdate('Tue, 5 Oct 2021 12:02 +0300')[1], '2021-10-05')
+
+    def test_wrong(self):
+        for text in ('', None, 'abracadabra', 'Tue, 32 Oct 2021 12:02:57 +0300', '2021-02-30'):
+            self.assertEqual(parse_pubdate(text), (None, None), text)
+
+    def test_bounds(self):
+        start = timegm((2021, 10, 26, 0, 0, 0))
+        self.assertEqual(parse_bound('20211026'), start)
+        self.assertEqual(parse_bound('2021-10-26', end=True), start + 24 * 3600)
+        self.assertEqual(parse_bound('2021-10-26T12:00:00+03:00', end=True), start + 9 * 3600)
+        with self.assertRaises(ValueError):
+            parse_bound('yesterday')
+
+
+if __name__ == '__main__':
+    unittest.main()
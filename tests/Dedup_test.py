@@ -0,0 +1,130 @@
+import os
+import random
+import tempfile
+import unittest
+from reader import dedup
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+
+TITLE = 'Minsk metro closes two stations for repairs'
+DESCRIPTION = 'The city metro will close two stations in the center of Minsk for repairs from Monday, ' \
+              'the transport department said.'
+
+
+class FingerprintTest(unittest.TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(dedup.normalize('Café, "Metro"!  NEWS'), ['cafe', 'metro', 'news'])
+        self.assertEqual(dedup.fingerprint('Metro news!', ''), dedup.fingerprint('metro  NEWS', None))
+        self.assertEqual(dedup.fingerprint('', ''), (None, None))
+
+    def test_near_duplicates(self):
+        _, first = dedup.fingerprint(TITLE, DESCRIPTION)
+        _, near = dedup.fingerprint(TITLE + '!', DESCRIPTION.replace('center', 'centre').rstrip('.'))
+        _, other = dedup.fingerprint('Weather: rain in Brest',
+                                     'Heavy rain is expected in Brest region on the weekend with strong wind.')
+        self.assertLessEqual(dedup.distance(first, near), dedup.MAX_DISTANCE)
+        self.assertGreater(dedup.distance(first, other), dedup.MAX_DISTANCE)
+        # the near-duplicates share a band of the index
+        self.assertTrue(set(dedup.bands(first)) & set(dedup.bands(near)))
+
+    def test_bands(self):
+        rnd = random.Random(1)
+        for _ in range(200):
+            value = rnd.getrandbits(dedup.BITS)
+            changed = value
+            for bit in rnd.sample(range(dedup.BITS), rnd.randint(0, dedup.MAX_DISTANCE)):
+                changed ^= 1 << bit
+            self.assertTrue(set(dedup.bands(value)) & set(dedup.bands(changed)))
+        # the keys are wide enough to keep the buckets small
+        self.assertEqual(len(dedup.bands(0)), dedup.BANDS)
+        self.assertGreaterEqual(max(value for _, value in dedup.bands(-1)), 2 ** 14 - 1)
+
+
+class ClusterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'dedup.db'))
+        DBConnector.init_cash_db(Item())
+        self.items = [
+            Item(guid='first/1', title=TITLE, description=DESCRIPTION, source='first',
+                 pubdate='Fri, 10 Oct 2031 12:00:00 +0000'),
+            Item(guid='second/1', title=TITLE.upper(), description=DESCRIPTION, source='second',
+                 pubdate='Fri, 10 Oct 2031 12:10:00 +0000'),
+            Item(guid='first/2', title=TITLE + '!', description=DESCRIPTION.replace('center', 'centre'),
+                 source='first', pubdate='Fri, 10 Oct 2031 13:00:00 +0000'),
+            Item(guid='first/3', title='Weather: rain in Brest', source='first',
+                 description='Heavy rain is expected in Brest region on the weekend with strong wind.',
+                 pubdate='Fri, 10 Oct 2031 14:00:00 +0000'),
+        ]
+        DBConnector.ingest(self.items)
+
+    def tearDown(self):
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def test_clusters(self):
+        self.assertEqual([item.cluster for item in self.items], ['first/1', 'first/1', 'first/1', 'first/3'])
+        rows = DBConnector.iter_rows_from_cash({'source': ['first', 'second']})
+        self.assertEqual({row['guid']: row['cluster'] for row in rows},
+                         {'first/1': 'first/1', 'second/1': 'first/1', 'first/2': 'first/1', 'first/3': 'first/3'})
+
+        # republished with a new guid
+        copy = Item(guid='third/1', title=TITLE, description=DESCRIPTION, source='third')
+        DBConnector.ingest([copy])
+        self.assertEqual(copy.cluster, 'first/1')
+
+    def test_collapse(self):
+        parser = Parser(None, '2031-10-10')
+        self.assertEqual(len(list(parser.iter_items())), 4)
+        parser.collapse = True
+        self.assertEqual([item.guid for item in parser.iter_items()], ['first/1', 'first/3'])
+
+        # the limit counts the clusters
+        parser.limit = 2
+        self.assertEqual([item.guid for item in parser.iter_items()], ['first/1', 'first/3'])
+        self.assertIsNotNone(parser.next_cursor)
+
+    def test_index_scaling(self):
+        rnd = random.Random(2)
+        words = [f'word{num}' for num in range(3000)]
+        DBConnector.ingest([Item(guid=f'scale/{num}', title=' '.join(rnd.choices(words, k=8)),
+                                 description=' '.join(rnd.choices(words, k=30)), source='scale')
+                            for num in range(2000)])
+        connection = DBConnector.get_connection()
+        biggest = connection.execute('SELECT max(items) FROM (SELECT count(*) AS items FROM ITEM_BANDS '
+                                     'GROUP BY band, value)').fetchone()[0]
+        self.assertLess(biggest, 20)
+        plan = ' '.join(row[-1] for row in connection.execute(
+            'EXPLAIN QUERY PLAN DELETE FROM ITEM_BANDS WHERE band = ? AND value = ? AND guid = ?', [0, 0, 'g']))
+        self.assertNotIn('SCAN', plan)
+
+    def test_rebuild_bands(self):
+        connection = DBConnector.get_connection()
+        connection.execute('UPDATE ITEM_BANDS SET value = value + 1')
+        connection.execute('PRAGMA user_version = 4')
+        DBConnector.init_cash_db(Item())
+        # a near-duplicate of the first ITEMS, found only by the rebuilt index
+        DBConnector.delete(self.items[2])
+        copy = Item(guid='third/1', title=TITLE, description=DESCRIPTION.replace('center', 'centre'), source='third')
+        DBConnector.ingest([copy])
+        self.assertEqual(copy.cluster, 'first/1')
+
+    def test_delete(self):
+        DBConnector.delete(self.items[0])
+        copy = Item(guid='third/1', title=TITLE, description=DESCRIPTION, source='third')
+        DBConnector.ingest([copy])
+        self.assertEqual(copy.cluster, 'first/1')
+        DBConnector.delete(self.items[1])
+        DBConnector.delete(self.items[2])
+        DBConnector.delete(copy)
+        other = Item(guid='fourth/1', title=TITLE, description=DESCRIPTION, source='fourth')
+        DBConnector.ingest([other])
+        self.assertEqual(other.cluster, 'fourth/1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import threading
+import time
+import unittest
+from reader.engine import FetchEngine
+from reader.exceptions import FeedTimeoutError
+from reader.functions import Parser
+from tests.feed_server import FeedServer, make_feed
+
+
+class FetchEngineTest(unittest.TestCase):
+
+    def test_run_reports_results_and_errors(self):
+        def fetch(source):
+            if source.endswith('bad'):
+                raise ValueError('bad source')
+            return source.upper()
+
+        engine = FetchEngine(fetch, max_workers=2, per_host=1, deadline=5)
+        results = {result.source: result for result in engine.run(['http://a/ok', 'http://b/ok', 'http://c/bad'])}
+        self.assertEqual(results['http://a/ok'].content, 'HTTP://A/OK')
+        self.assertTrue(results['http://b/ok'].ok)
+        self.assertIsInstance(results['http://c/bad'].error, ValueError)
+
+    def test_limits(self):
+        lock = threading.Lock()
+        active = {'all': 0, 'all_max': 0, 'a': 0, 'a_max': 0}
+
+        def fetch(source):
+            host = FetchEngine.get_host(source)
+            with lock:
+                active['all'] += 1
+                active['all_max'] = max(active['all_max'], active['all'])
+                if host == 'a':
+                    active['a'] += 1
+                    active['a_max'] = max(active['a_max'], active['a'])
+            time.sleep(0.05)
+            with lock:
+                active['all'] -= 1
+                if host == 'a':
+                    active['a'] -= 1
+            return source
+
+        sources = [f'http://a/{num}' for num in range(6)] + [f'http://{num}/' for num in range(6)]
+        engine = FetchEngine(fetch, max_workers=3, per_host=1, deadline=10)
+        self.assertEqual(len(list(engine.run(sources))), len(sources))
+        self.assertLessEqual(active['all_max'], 3)
+        self.assertEqual(active['a_max'], 1)
+
+    def test_deadline(self):
+        def fetch(source):
+            time.sleep(1 if source.endswith('slow') else 0)
+            return source
+
+        engine = FetchEngine(fetch, max_workers=1, per_host=1, deadline=0.3)
+        results = {result.source: result for result in engine.run(['http://a/fast', 'http://a/slow', 'http://a/next'])}
+        self.assertTrue(results['http://a/fast'].ok)
+        self.assertIsInstance(results['http://a/slow'].error, FeedTimeoutError)
+        self.assertIsInstance(results['http://a/next'].error, FeedTimeoutError)
+
+
+class MultiSourceParserTest(unittest.TestCase):
+
+    def test_get_items_many_sources(self):
+        with FeedServer() as server:
+            server.routes['/one'] = {'body': make_feed('One', [{'title': 'First', 'link': server.url('/one/1')}])}
+            server.routes['/two'] = {'body': make_feed('Two', [{'title': 'Second', 'link': server.url('/two/1')}])}
+            server.routes['/slow'] = {'body': make_feed('Slow'), 'delay': 2}
+            sources = [server.url('/one'), server.url('/missing'), server.url('/two'), server.url('/slow')]
+            parser = Parser(sources)
+            parser.deadline = 1
+            items = parser.get_items()
+
+        self.assertEqual([item.title for item in items], ['First', 'Second'])
+        self.assertEqual(set(parser.failed_sources), {server.url('/missing'), server.url('/slow')})
+        self.assertIsInstance(parser.failed_sources[server.url('/slow')], FeedTimeoutError)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+from reader.export import write_html, render_item
+from reader.functions import Parser
+from reader.images import ImageCache
+from reader.models import Item
+
+
+def _items(count):
+    for num in range(count):
+        yield Item(guid=f'export-{num}', title=f'News {num}', language='ru', link=f'http://example.com/{num}',
+                   html_description=f'<p>Text {num} $title</p>', image_links=[f'http://example.com/{num}.jpg'])
+
+
+class HtmlExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'RSS_ITEMS.html')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_html(self):
+        self.assertEqual(write_html(_items(3), self.path), 3)
+        with open(self.path, encoding='UTF-8') as f:
+            document = f.read()
+        self.assertIn('<html lang="ru">', document)
+        positions = [document.index(f'News {num}') for num in range(3)]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('<p>Text 2 $title</p>', document)
+        self.assertTrue(document.rstrip().endswith('</html>'))
+
+    def test_empty(self):
+        self.assertEqual(write_html(iter([]), self.path), 0)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_render_item(self):
+        item = next(_items(1))
+        self.assertIn('<img src="http://example.com/0.jpg"', render_item(item))
+        item.html_description = '<img src="http://example.com/0.jpg">'
+        self.assertNotIn('Image:', render_item(item))
+
+
+class ShardedPdfTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.parser = Parser()
+        self.parser.image_cache = ImageCache(os.path.join(self.directory.name, 'images'))
+        self.parser.pdf_workers = 2
+        self.parser.pdf_shard_size = 2
+        self.items = [Item(guid=f'shard-{num}', title=f'News {num}', description=f'Text {num}') for num in range(5)]
+
+    def tearDown(self):
+        self.parser.image_cache.close()
+        self.directory.cleanup()
+
+    def test_shards(self):
+        index = self.parser.create_and_fill_pdf_file(self.directory.name, self.items)
+        self.assertEqual(os.path.basename(index), 'RSS_ITEMS_index.html')
+        names = sorted(name for name in os.listdir(self.directory.name) if name.endswith('.pdf'))
+        self.assertEqual(names, ['RSS_ITEMS_001.pdf', 'RSS_ITEMS_002.pdf', 'RSS_ITEMS_003.pdf'])
+        with open(index, encoding='UTF-8') as f:
+            document = f.read()
+        self.assertIn('<a href="RSS_ITEMS_003.pdf">', document)
+        self.assertIn('<ol start="5">', document)
+
+    def test_single_file(self):
+        self.parser.pdf_shard_size = 10
+        pdf_file = self.parser.create_and_fill_pdf_file(self.directory.name, self.items)
+        self.assertEqual(os.path.basename(pdf_file), 'RSS_ITEMS.pdf')
+
+    def test_merge(self):
+        self.parser.pdf_merge = True
+        pdf_file = self.parser.create_and_fill_pdf_file(self.directory.name, self.items)
+        try:
+            import pypdf
+        except ImportError:
+            self.assertEqual(os.path.basename(pdf_file), 'RSS_ITEMS_index.html')
+            return
+        self.assertEqual(os.path.basename(pdf_file), 'RSS_ITEMS.pdf')
+        self.assertEqual(len(pypdf.PdfReader(pdf_file).pages), 5)
+
+    def test_font_cache(self):
+        self.parser.font_cache = os.path.join(self.directory.name, 'fonts')
+        self.parser.create_and_fill_pdf_file(self.directory.name, self.items)
+        # the metrics of the font are kept in the cache folder, not in the package
+        self.assertEqual(len(os.listdir(self.parser.font_cache)), 2)
+        self.assertFalse([name for name in os.listdir(self.parser.pdf_directory) if name.endswith('.pkl')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from bs4 import BeautifulSoup
+from reader.extract import extract_description
+
+FRAGMENTS = [
+    '<p><a href="https://realt.onliner.by/2021/10/26/kak-obstavit-spalnyu">'
+    '<img src="https://content.onliner.by/news/thumbnail/1b233fe4fd9c41c0e3c52149adea9c9e.jpeg" alt="" /></a></p><p>'
+    'Как думаете, существует ли идеальный интерьер спальни, в котором приятно просыпаться каждое утро '
+    'и чувствовать себя героем какого-нибудь голливудского фильма?</p><p><a href="https://realt.onliner.by/2021/10/26/'
+    'kak-obstavit-spalnyu">Читать далее…</a></p>',
+    'Plain text &amp; entities &#8212; &laquo;quotes&raquo;',
+    '<div>Text<!-- comment --> after <a href="http://a/?x=1&amp;y=2">one</a><a>empty</a><a href="">blank</a>'
+    '<img src="http://a/1.png"><img src="http://a/1.png"/><img alt="no src"></div>',
+    '<p>Unclosed <b>bold <i>italic</p> tail<br>line',
+    '<script>var x = "<b>";</script><style>p {}</style>text',
+]
+
+
+def soup_extract(html_description, link=''):
+    description_soup = BeautifulSoup(html_description, "html.parser")
+    links = [a.get("href") for a in description_soup.findAll("a") if a.get("href") and a.get("href") != link]
+    images = [image.get("src") for image in description_soup.findAll("img") if image.get("src")]
+    return description_soup.text, sorted(set(links)), sorted(set(images))
+
+
+class ExtractDescriptionTest(unittest.TestCase):
+
+    def test_same_as_beautiful_soup(self):
+        for fragment in FRAGMENTS:
+            text, links, image_links = extract_description(fragment)
+            self.assertEqual((text, sorted(links), sorted(image_links)), soup_extract(fragment), fragment)
+
+    def test_item_link_is_excluded(self):
+        link = 'https://realt.onliner.by/2021/10/26/kak-obstavit-spalnyu'
+        _, links, image_links = extract_description(FRAGMENTS[0], link)
+        self.assertEqual(links, [])
+        self.assertEqual(image_links,
+                         ['https://content.onliner.by/news/thumbnail/1b233fe4fd9c41c0e3c52149adea9c9e.jpeg'])
+
+
+if __name__ == '__main__':
+    unittest.main()
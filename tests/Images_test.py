@@ -0,0 +1,87 @@
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from reader.functions import Parser
+from reader.images import ImageCache, image_type
+from reader.models import Item
+from tests.feed_server import FeedServer
+
+
+def _png(red=255):
+    """1x1 RGB PNG image"""
+
+    def chunk(name, data):
+        return struct.pack('>I', len(data)) + name + data + struct.pack('>I', zlib.crc32(name + data))
+
+    header = struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + \
+        chunk(b'IDAT', zlib.compress(bytes([0, red, 0, 0]))) + chunk(b'IEND', b'')
+
+
+class ImageCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ImageCache(self.directory.name)
+
+    def tearDown(self):
+        self.cache.close()
+        self.directory.cleanup()
+
+    def test_prefetch(self):
+        routes = {'/a.png': {'body': _png()}, '/b': {'body': _png()}, '/c.png': {'body': _png(0)},
+                  '/page.png': {'body': b'<html></html>'}, '/missing.png': {'status': 404}}
+        with FeedServer(routes) as server:
+            urls = [server.url(route) for route in routes]
+            images = self.cache.prefetch(urls + urls[:1])
+            self.assertEqual(set(images), set(urls[:3]))
+            self.assertEqual(set(self.cache.failed), set(urls[3:]))
+            # the same content of two urls is stored once
+            self.assertEqual(images[urls[0]], images[urls[1]])
+            self.assertEqual(len(server.requests), 5)
+
+            second = ImageCache(self.directory.name)
+            self.assertEqual(second.prefetch(urls[:3]), images)
+            second.close()
+            self.assertEqual(len(server.requests), 5)
+
+    def test_eviction(self):
+        self.cache.max_size = len(_png()) * 2
+        paths = [self.cache.put(f'http://example.com/{num}', _png(num))[0] for num in range(3)]
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertTrue(all(os.path.exists(file_path) for file_path in paths[1:]))
+        self.assertIsNone(self.cache.get('http://example.com/0'))
+        self.assertLessEqual(self.cache.size(), self.cache.max_size)
+
+    def test_prefetch_eviction(self):
+        self.cache.max_size = len(_png()) * 2
+        old = self.cache.put('http://example.com/old', _png(200))[0]
+        routes = {f'/{num}.png': {'body': _png(num)} for num in range(3)}
+        with FeedServer(routes) as server:
+            images = self.cache.prefetch([server.url(route) for route in routes])
+        # the images of one export are kept until it is rendered even if they outgrow the cache
+        self.assertEqual(len(images), 3)
+        self.assertTrue(all(os.path.exists(file_path) for file_path, _ in images.values()))
+        self.assertFalse(os.path.exists(old))
+        self.assertEqual(self.cache.size(), self.cache.size(exact=True))
+
+    def test_image_type(self):
+        self.assertEqual(image_type(_png()), 'png')
+        self.assertEqual(image_type(b'\xff\xd8\xff\xe0'), 'jpeg')
+        self.assertIsNone(image_type(b'<svg/>'))
+
+    def test_pdf(self):
+        with FeedServer({'/a.png': {'body': _png()}}) as server:
+            parser = Parser()
+            parser.image_cache = self.cache
+            items = [Item(guid=f'image-{num}', title=f'News {num}', image_links=[server.url('/a.png')])
+                     for num in range(2)]
+            pdf_file = parser.create_and_fill_pdf_file(self.directory.name, items)
+            self.assertTrue(os.path.getsize(pdf_file) > 0)
+            self.assertEqual(len(server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import io
+import os
+import tempfile
+import unittest
+import uuid
+from unittest.mock import patch
+from reader import instrument
+from reader.__main__ import init_arguments
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.images import ImageCache
+from reader.models import Item
+from reader.output import ItemWriter
+from tests.feed_server import make_feed
+
+
+class InstrumentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'rss_cash.db'))
+        DBConnector.init_cash_db(Item())
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def test_disabled(self):
+        items = [1, 2]
+        self.assertIs(instrument.timed_iter('stage', items), items)
+        with instrument.stage('stage'):
+            instrument.count('counter')
+        self.assertEqual(instrument.report(), {'stages': {}, 'counters': {}})
+
+    def test_report(self):
+        instrument.enable(memory=True)
+        with instrument.stage('outer'):
+            with instrument.stage('inner'):
+                instrument.count('counter', 2)
+            self.assertEqual(list(instrument.timed_iter('rows', range(3))), [0, 1, 2])
+        instrument.disable()
+
+        report = instrument.report()
+        self.assertEqual({name: stage['calls'] for name, stage in report['stages'].items()},
+                         {'outer': 1, 'inner': 1, 'rows': 3})
+        self.assertGreaterEqual(report['stages']['outer']['seconds'], report['stages']['inner']['seconds'])
+        self.assertEqual(report['counters']['counter'], 2)
+        self.assertGreater(report['counters']['peak_memory'], 0)
+        self.assertIn('total_seconds', report['counters'])
+
+    def test_parser_stages(self):
+        source = f'http://instrument-test/{uuid.uuid4()}'
+        items = [{'title': f'Instrumented {num}', 'link': f'{source}/{num}',
+                  'description': f'<p>Text {num} <a href="{source}/more">more</a></p>'} for num in range(3)]
+        instrument.enable(memory=False)
+        news = Parser(source).parse_feed(make_feed('Instrumented', items), source)
+        with ItemWriter(io.StringIO()) as writer:
+            for item in news:
+                writer.write_item(item)
+        for item in news:
+            item.delete()
+
+        report = instrument.report()
+        self.assertEqual(report['stages']['parse.xml']['calls'], 3)
+        self.assertEqual(report['stages']['parse.extract']['calls'], 3)
+        self.assertEqual(report['stages']['render.output']['calls'], 3)
+        self.assertIn('db.ingest', report['stages'])
+        self.assertEqual(report['counters']['items_parsed'], 3)
+        self.assertEqual(report['counters']['rows_written'], 3)
+        self.assertEqual(report['counters']['items_rendered'], 3)
+
+    def test_rendered_once(self):
+        items = [Item(guid=f'rendered-{num}', title=f'Rendered {num}') for num in range(3)]
+        instrument.enable(memory=False)
+        parser = Parser()
+        parser.image_cache = ImageCache(os.path.join(self.directory.name, 'images'))
+        # --to-pdf exports the items and prints them as well
+        parser.create_and_fill_pdf_file(self.directory.name, items)
+        parser.image_cache.close()
+        with ItemWriter(io.StringIO()) as writer:
+            for item in items:
+                writer.write_item(item)
+        self.assertEqual(instrument.report()['counters']['items_rendered'], 3)
+
+    def test_profile_arguments(self):
+        with patch('sys.argv', ['rss_reader', '--profile', 'http://instrument-test/feed']):
+            arguments = init_arguments()
+        self.assertTrue(arguments.profile)
+        self.assertEqual(arguments.source, ['http://instrument-test/feed'])
+        with patch('sys.argv', ['rss_reader', '--profile-output', 'report.json', 'http://instrument-test/feed']):
+            arguments = init_arguments()
+        self.assertEqual((arguments.profile_output, arguments.source), ('report.json', ['http://instrument-test/feed']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+import uuid
+from unittest.mock import patch
+from reader import functions
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+from tests.feed_server import make_feed
+
+
+def feed(source, numbers, changed=()):
+    items = [{'title': f'Known {num}' + (' (changed)' if num in changed else ''), 'link': f'{source}/{num}',
+              'categories': ['Known'], 'description': f'<p>News {num} <a href="{source}/more">more</a></p>'}
+             for num in numbers]
+    return make_feed('Known', items)
+
+
+class KnownItemsTest(unittest.TestCase):
+
+    def setUp(self):
+        DBConnector.init_cash_db(Item())
+        self.source = f'http://known-test/{uuid.uuid4()}'
+        self.parser = Parser(self.source)
+
+    def tearDown(self):
+        for row in DBConnector.select_rows_from_cash({'source': self.source}):
+            Item.from_row(row).delete()
+
+    def test_known_items_are_not_parsed(self):
+        first = self.parser.parse_feed(feed(self.source, range(5)), self.source)
+        self.assertEqual(self.parser.ingest_counts['inserted'], 5)
+
+        with patch.object(functions, 'extract_description', wraps=functions.extract_description) as extract:
+            news = self.parser.parse_feed(feed(self.source, range(7), changed=[3]), self.source)
+        # only the new and the changed items are extracted
+        self.assertEqual(extract.call_count, 3)
+        self.assertEqual(self.parser.ingest_counts, {'inserted': 2, 'updated': 1, 'unchanged': 4})
+        self.assertEqual([item.guid for item in news], [f'{self.source}/{num}' for num in range(7)])
+        self.assertEqual(news[0].description, first[0].description)
+        self.assertEqual(news[0].category, ['Known'])
+        self.assertEqual(news[3].title, 'Known 3 (changed)')
+
+    def test_not_resolved(self):
+        self.parser.parse_feed(feed(self.source, range(5)), self.source)
+        self.parser.resolve_known = False
+        with patch.object(functions, 'select_rows_by_guids', wraps=functions.select_rows_by_guids) as select:
+            news = self.parser.parse_feed(feed(self.source, range(7)), self.source)
+        select.assert_not_called()
+        self.assertEqual([item.guid for item in news], [f'{self.source}/{num}' for num in (5, 6)])
+        self.assertEqual(self.parser.ingest_counts, {'inserted': 2, 'updated': 0, 'unchanged': 5})
+
+    def test_stop_after_known(self):
+        self.parser.parse_feed(feed(self.source, range(5)), self.source)
+        self.parser.stop_after_known = 2
+        news = self.parser.parse_feed(feed(self.source, [10, 11] + list(range(5))), self.source)
+        self.assertEqual(self.parser.ingest_counts, {'inserted': 2, 'updated': 0, 'unchanged': 2})
+        self.assertIn(self.source, self.parser.stopped_early)
+        # the rest of the feed is read from the cache in the order of the last poll
+        self.assertEqual([item.guid for item in news], [f'{self.source}/{num}' for num in [10, 11] + list(range(5))])
+
+        self.parser.limit = 3
+        news = self.parser.parse_feed(feed(self.source, [12, 10, 11] + list(range(5))), self.source)
+        self.assertEqual([item.guid for item in news], [f'{self.source}/{num}' for num in (12, 10, 11)])
+
+    def test_source_case(self):
+        parser = Parser(self.source.replace('known-test', 'Known-Test'))
+        news = parser.parse_feed(feed(self.source, range(3)))
+        parser.category = 'known'
+        with patch.object(Parser, 'update_cash_db', lambda parser: news):
+            self.assertEqual(len(list(parser.iter_items())), 3)
+
+    def test_old_cache_learns_raw_hash(self):
+        # the items cached before the raw hashes: the same content, but no raw_hash
+        items = [Item(guid=f'{self.source}/{num}', link=f'{self.source}/{num}', title=f'Known {num}', pubdate='',
+                      description=f'News {num} more', html_description=f'<p>News {num} <a href="{self.source}/more">'
+                      f'more</a></p>', links=[f'{self.source}/more'], category=['Known'], language='en',
+                      source=self.source) for num in range(2)]
+        DBConnector.ingest(items)
+        self.assertEqual(DBConnector.select_known_guids(self.source), {})
+        self.parser.parse_feed(feed(self.source, range(2)), self.source)
+        self.assertEqual(self.parser.ingest_counts['unchanged'], 2)
+        self.assertEqual(len(DBConnector.select_known_guids(self.source)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
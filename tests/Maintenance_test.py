@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from datetime import date
+from reader.dates import parse_bound
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.maintenance import months_before, run
+from reader.models import Item
+from tests.feed_server import make_feed
+
+TODAY = date(2031, 12, 15)
+FEED = make_feed('Archived', [{'title': f'Feed news {num}', 'link': f'http://feed/{num}', 'guid': f'g{num}',
+                               'pubdate': f'2031-09-10T1{num}:00:00+00:00'} for num in range(3)])
+
+
+class MaintenanceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'rss_cash.db'))
+        DBConnector.init_cash_db(Item())
+        items = []
+        for source in ('first', 'second'):
+            for month in (9, 10, 12):
+                for day in (10, 11):
+                    items.append(Item(guid=f'{source}/{month}/{day}', title=f'{source} news {month} {day}',
+                                      source=source, category=['Maintenance'],
+                                      pubdate=f'2031-{month:02d}-{day:02d}T12:00:00+00:00'))
+        DBConnector.ingest(items)
+
+    def tearDown(self):
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def guids(self, **parameters):
+        return sorted(row['guid'] for row in DBConnector.iter_rows_from_cash(parameters))
+
+    def test_months_before(self):
+        self.assertEqual(months_before(TODAY, 1), '2031-11')
+        self.assertEqual(months_before(date(2031, 1, 5), 1), '2030-12')
+
+    def test_archive(self):
+        report = run(archive_after=1, today=TODAY)
+        self.assertEqual(report['archived'], {'2031-09': 4, '2031-10': 4})
+        self.assertEqual(DBConnector.select_archives()['2031-10'],
+                         os.path.join(self.directory.name, 'rss_cash.2031-10.db'))
+        self.assertEqual(len(self.guids()), 4)
+
+        # the archived day is still read, with its categories
+        self.assertEqual(self.guids(filter_date='2031-10-10'), ['first/10/10', 'second/10/10'])
+        rows = list(DBConnector.iter_rows_from_cash({'filter_date': '2031-10-10'}))
+        self.assertEqual(Item.from_row(rows[0]).category, ['Maintenance'])
+
+        # the date range is merged from the archives and the cache, the pages go across the databases
+        parser = Parser(limit=3)
+        parser.date_from, parser.date_to = parse_bound('2031-10-11'), parse_bound('2031-12-31', end=True)
+        first = [item.guid for item in parser.iter_items()]
+        parser.after = parser.next_cursor
+        second = [item.guid for item in parser.iter_items()]
+        self.assertEqual(first, ['second/12/11', 'first/12/11', 'second/12/10'])
+        self.assertEqual(second, ['first/12/10', 'second/10/11', 'first/10/11'])
+
+    def test_archive_path_quoting(self):
+        directory = os.path.join(self.directory.name, 'cache #1 ?a=%41')
+        os.mkdir(directory)
+        DBConnector.set_db_path(os.path.join(directory, 'rss_cash.db'))
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest([Item(guid='quoted', title='Quoted', source='first', pubdate='2031-09-10T12:00:00+00:00')])
+        run(archive_after=1, today=TODAY)
+        self.assertEqual(self.guids(filter_date='2031-09-10'), ['quoted'])
+
+    def test_archive_and_poll(self):
+        parser = Parser('http://feed')
+        parser.parse_feed(FEED)
+        run(archive_after=1, today=TODAY)
+        # the archived items are still in the feed, the next poll returns them but does not save them again
+        self.assertEqual([item.guid for item in parser.parse_feed(FEED)], ['g0', 'g1', 'g2'])
+        self.assertEqual(parser.ingest_counts['inserted'], 0)
+        self.assertEqual(self.guids(source='http://feed'), [])
+        parser.skip_known = False
+        parser.parse_feed(FEED)
+        self.assertEqual(parser.ingest_counts['inserted'], 0)
+
+        parser = Parser(None, '2031-09-10')
+        self.assertEqual(sorted(item.guid for item in parser.iter_items() if item.source == 'http://feed'),
+                         ['g0', 'g1', 'g2'])
+
+        # an item saved to the cache and to the archive is read once
+        DBConnector.get_connection().execute("DELETE FROM REMOVED_ITEMS WHERE guid = 'g1'")
+        Parser('http://feed').parse_feed(FEED)
+        self.assertEqual(self.guids(filter_date='2031-09-10').count('g1'), 1)
+        parser.limit = 4
+        self.assertEqual(len({item.guid for item in parser.iter_items()}), 4)
+
+    def test_retention(self):
+        report = run(max_age=80, today=TODAY)
+        self.assertEqual(report['removed'], 4)
+        self.assertEqual(self.guids(filter_date='2031-09-10'), [])
+
+        run(max_items=1, today=TODAY)
+        self.assertEqual(self.guids(), ['first/12/11', 'second/12/11'])
+
+        # the pruned items do not come back with the next poll
+        DBConnector.ingest([Item(guid='first/12/10', title='first news 12 10', source='first',
+                                 pubdate='2031-12-10T12:00:00+00:00')])
+        self.assertEqual(self.guids(), ['first/12/11', 'second/12/11'])
+        self.assertLessEqual(report['size']['after']['free_pages'], report['size']['before']['free_pages'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import json
+import unittest
+from reader.models import Item
+from reader.output import ItemWriter
+
+
+class CountingStream(io.StringIO):
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def _items(count):
+    return [Item(guid=f'output-{num}', title=f'News "{num}"', description='Новости', category=['One'],
+                 pubdate='Tue, 26 Oct 2021 12:02:57 +0300') for num in range(count)]
+
+
+class ItemWriterTest(unittest.TestCase):
+
+    def test_json_lines(self):
+        stream = io.StringIO()
+        with ItemWriter(stream, json_lines=True) as writer:
+            for item in _items(3):
+                writer.write_item(item)
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['News "0"', 'News "1"', 'News "2"'])
+        self.assertEqual(json.loads(lines[0])['description'], 'Новости')
+        self.assertEqual(writer.count, 3)
+
+    def test_batches(self):
+        stream = CountingStream()
+        items = _items(100)
+        with ItemWriter(stream, batch_size=len(items[0].format_news()) * 10) as writer:
+            for item in items:
+                writer.write_item(item)
+        self.assertLessEqual(stream.writes, 11)
+        self.assertEqual(stream.getvalue(), ''.join(item.format_news() for item in items))
+
+    def test_first_item(self):
+        stream = CountingStream()
+        items = _items(3)
+        with ItemWriter(stream, flush_seconds=60) as writer:
+            writer.write_item(items[0])
+            # the first item is not held until the batch is full
+            self.assertEqual(stream.getvalue(), items[0].format_news())
+            writer.write_item(items[1])
+            self.assertEqual(stream.writes, 1)
+        self.assertEqual(stream.getvalue(), items[0].format_news() + items[1].format_news())
+
+        stream = CountingStream()
+        with ItemWriter(stream, flush_seconds=0) as writer:
+            for item in items:
+                writer.write_item(item)
+                self.assertEqual(stream.writes, writer.count)
+
+    def test_print_news(self):
+        item = _items(1)[0]
+        for as_json in (False, True):
+            for method, render in ((item.print_news, item.format_news), (item.colorized, item.format_colorized)):
+                stdout = io.StringIO()
+                with contextlib.redirect_stdout(stdout):
+                    method(as_json)
+                self.assertEqual(stdout.getvalue(), render(as_json))
+
+
+if __name__ == '__main__':
+    unittest.main()
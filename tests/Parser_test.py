@@ -2,6 +2,7 @@ import logging
 import unittest
 import requests
 import os
+import uuid
 from stat import S_IREAD, S_IWUSR
 from reader.models import Item
 from reader.functions import Parser
@@ -111,6 +112,19 @@ class ItemTest(unittest.TestCase):
     def test_get_html_template(self):
         self.assertIsInstance(self.item.get_html_template(), str)
 
+    def test_slots(self):
+        self.assertFalse(hasattr(self.item, '__dict__'))
+        self.assertEqual(self.item.get_fields()[:3], ['link', 'guid', 'pubdate'])
+
+    def test_from_row(self):
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest([self.item])
+        rows = DBConnector.select_rows_from_cash({'guid': self.item.guid})
+        item = Item.from_row(rows[0])
+        self.assertEqual(item.serialize(), self.item.serialize())
+        self.assertEqual(item, Item(**DBConnector.select_items_from_cash({'guid': self.item.guid})[0]))
+        DBConnector.delete(item)
+
 
 class DBConnectorTest(unittest.TestCase):
 
@@ -154,6 +168,16 @@ class DBConnectorTest(unittest.TestCase):
     def test_delete(self):
         self.assertEqual(DBConnector.delete(self.item), True)
 
+    def test_ingest(self):
+        DBConnector.init_cash_db(Item())
+        items = [Item(**dict(self.test_data, guid=str(uuid.uuid4()))) for _ in range(3)]
+        self.assertEqual(DBConnector.ingest(items), {'inserted': 3, 'updated': 0, 'unchanged': 0})
+
+        items[0].title = 'Changed title'
+        self.assertEqual(DBConnector.ingest(items), {'inserted': 0, 'updated': 1, 'unchanged': 2})
+        for item in items:
+            DBConnector.delete(item)
+
 
 if __name__ == '__main__':
     unittest.main()
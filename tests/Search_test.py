@@ -0,0 +1,65 @@
+import unittest
+import uuid
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+
+
+class SearchTest(unittest.TestCase):
+
+    def setUp(self):
+        DBConnector.init_cash_db(Item())
+        self.word = 'w' + uuid.uuid4().hex[:12]
+        self.source = f'http://search-test/{self.word}'
+        self.items = [
+            Item(guid=f'{self.source}/1', source=self.source, title=f'{self.word} in the title',
+                 description='Nothing else', pubdate='Wed, 01 Dec 2021 10:00:00 +0000'),
+            Item(guid=f'{self.source}/2', source=self.source, title='Other title',
+                 description=f'Long description with {self.word} somewhere inside the text',
+                 pubdate='Thu, 02 Dec 2021 10:00:00 +0000'),
+            Item(guid=f'{self.source}/3', source=self.source, title='Not found', description='Nothing',
+                 category=[self.word + 'x']),
+        ]
+        DBConnector.ingest(self.items)
+
+    def tearDown(self):
+        for item in self.items:
+            DBConnector.delete(item)
+
+    def search(self, query, parameters=None, limit=0, snippets=False):
+        return list(DBConnector.iter_search_from_cash(query, parameters or dict(), limit, snippets))
+
+    def test_ranking(self):
+        rows = self.search(self.word)
+        self.assertEqual([row['guid'] for row in rows], [f'{self.source}/1', f'{self.source}/2'])
+
+    def test_filters(self):
+        self.assertEqual(len(self.search(self.word, {'source': self.source}, limit=1)), 1)
+        self.assertEqual(len(self.search(self.word, {'filter_date': '2021-12-02'})), 1)
+        self.assertEqual(self.search(self.word, {'source': 'http://other/'}), [])
+
+    def test_snippets(self):
+        row = self.search(self.word, {'guid': f'{self.source}/2'}, snippets=True)[0]
+        self.assertIn(f'[{self.word}]', row['snippet'])
+
+    def test_syntax(self):
+        self.assertEqual(len(self.search(f'{self.word}x OR {self.word}')), 3)
+        self.assertEqual(len(self.search(f'{self.word} "unbalanced')), 0)
+
+    def test_sync(self):
+        self.items[0].title = 'Renamed'
+        DBConnector.ingest(self.items[:1])
+        DBConnector.delete(self.items[1])
+        self.assertEqual(self.search(self.word), [])
+
+    def test_parser_search(self):
+        parser = Parser(limit=5)
+        parser.search = self.word
+        parser.snippets = True
+        items = parser.get_items()
+        self.assertEqual([item.guid for item in items], [f'{self.source}/1', f'{self.source}/2'])
+        self.assertIn('snippet', items[0].serialize())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from reader.db import DBConnector
+from reader.models import Item
+from reader import serve
+from reader.serve import APIServer
+
+
+class ServeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'rss_cash.db'))
+        DBConnector.init_cash_db(Item())
+        DBConnector.ingest([Item(guid=f'serve/{source}/{day}', title=f'Serve {source} {day}', source=source,
+                                 category=['Serve'], pubdate=f'2021-10-{day:02d}T12:00:00+00:00')
+                            for source in ('first', 'second') for day in range(1, 6)])
+        self.server = APIServer(('127.0.0.1', 0), pool_size=4)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def get(self, path, headers=None):
+        try:
+            with urlopen(Request(self.base_url + path, headers=headers or {}), timeout=10) as response:
+                return response.status, response.headers, json.loads(response.read() or b'null')
+        except HTTPError as exp:
+            return exp.code, exp.headers, json.loads(exp.read() or b'null')
+
+    def test_pages(self):
+        status, _, page = self.get('/items?source=first&limit=3')
+        self.assertEqual(status, 200)
+        self.assertEqual([item['guid'] for item in page['items']], [f'serve/first/{day}' for day in range(1, 4)])
+        self.assertEqual(page['items'][0]['category'], 'Serve')
+        _, _, page = self.get(page['next_url'])
+        self.assertEqual([item['guid'] for item in page['items']], ['serve/first/4', 'serve/first/5'])
+        self.assertIsNone(page['next'])
+
+        _, _, page = self.get('/items?date=20211003')
+        self.assertEqual(page['count'], 2)
+        _, _, page = self.get('/items?from=2021-10-04&limit=10')
+        self.assertEqual([item['guid'] for item in page['items']][:2], ['serve/second/5', 'serve/first/5'])
+
+        _, _, summary = self.get('/sources')
+        self.assertEqual([(row['source'], row['items']) for row in summary['sources']], [('first', 5), ('second', 5)])
+
+    def test_etag(self):
+        status, headers, _ = self.get('/items?source=second')
+        status, _, body = self.get('/items?source=second', {'If-None-Match': headers['ETag']})
+        self.assertEqual(status, 304)
+        self.assertIsNone(body)
+
+        DBConnector.ingest([Item(guid='serve/second/9', title='Serve new', source='second',
+                                 pubdate='2021-10-09T12:00:00+00:00')])
+        status, new_headers, page = self.get('/items?source=second', {'If-None-Match': headers['ETag']})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(new_headers['ETag'], headers['ETag'])
+        self.assertEqual(page['count'], 6)
+
+    def test_errors(self):
+        self.assertEqual(self.get('/items?date=2021')[0], 400)
+        self.assertEqual(self.get('/items?limit=0')[0], 400)
+        self.assertEqual(self.get('/items?after=wrong')[0], 400)
+        self.assertEqual(self.get('/unknown')[0], 404)
+
+    def test_concurrent_clients(self):
+        with ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(lambda num: self.get(f'/items?limit={1 + num % 10}'), range(64)))
+        self.assertEqual({status for status, _, _ in results}, {200})
+        self.assertEqual([page['count'] for _, _, page in results], [1 + num % 10 for num in range(64)])
+        self.assertLessEqual(self.server.pool.opened, 4)
+
+    def test_main_arguments(self):
+        with patch('sys.argv', ['rss_reader', 'serve', '--port', '0', '--pool', '2']), \
+                patch.object(serve, 'APIServer') as server:
+            server.return_value.serve_forever.side_effect = KeyboardInterrupt
+            serve.main()
+        server.assert_called_once_with(('127.0.0.1', 0), 2, verbose=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
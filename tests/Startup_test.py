@@ -0,0 +1,25 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = ('requests', 'bs4', 'fpdf', 'colorama', 'lxml', 'sqlite3', 'logging')
+
+CODE = f"""
+import runpy, sys
+sys.argv = ['rss_reader', '--version']
+runpy.run_module('reader', run_name='__main__')
+print(','.join(module for module in {HEAVY_MODULES!r} if module in sys.modules))
+"""
+
+
+class StartupTest(unittest.TestCase):
+
+    def test_version_is_light(self):
+        result = subprocess.run([sys.executable, '-c', CODE], capture_output=True, text=True, check=True)
+        version, imported = result.stdout.splitlines()
+        self.assertEqual(version, '1.5')
+        self.assertEqual(imported, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.models import Item
+from tests.feed_server import make_feed
+
+PROCESSES = 4
+BATCHES = 25
+BATCH_SIZE = 10
+
+
+def _hammer(db_path, worker):
+    """Writes and reads the database from a separate process, returns the number of errors"""
+
+    DBConnector.set_db_path(db_path)
+    DBConnector.init_cash_db(Item())
+    errors = 0
+    for batch in range(BATCHES):
+        items = [Item(guid=f'{worker}-{batch}-{num}', title=f'Item {num}', source='http://hammer/')
+                 for num in range(BATCH_SIZE)]
+        try:
+            DBConnector.ingest(items)
+            DBConnector.select_items_from_cash({'source': 'http://hammer/'}, 5)
+        except Exception:
+            errors += 1
+    return errors
+
+
+class ConnectionTest(unittest.TestCase):
+
+    def test_one_connection_per_process(self):
+        self.assertIs(DBConnector.get_connection(), DBConnector.get_connection())
+
+    def test_wal_mode(self):
+        with DBConnector.SQLite(write=False) as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+
+    def test_db_path_outside_package(self):
+        package_directory = os.path.dirname(os.path.abspath(DBConnector.__file__))
+        self.assertFalse(DBConnector.get_db_path().startswith(package_directory))
+
+    def test_move_legacy_db(self):
+        with tempfile.TemporaryDirectory() as directory:
+            legacy = os.path.join(directory, 'package', 'rss_cash.db')
+            os.mkdir(os.path.dirname(legacy))
+            connection = DBConnector.connect(legacy)
+            connection.execute('PRAGMA journal_mode = DELETE')
+            connection.execute("CREATE TABLE OLD(name TEXT)")
+            connection.close()
+            new = os.path.join(directory, 'cache', 'rss_cash.db')
+            with patch.object(DBConnector, 'LEGACY_DB_PATH', legacy):
+                self.assertTrue(DBConnector.move_legacy_db(new))
+                self.assertFalse(os.path.exists(legacy))
+                connection = DBConnector.connect(new)
+                self.assertIsNotNone(connection.execute("select 1 from sqlite_master where name = 'OLD'").fetchone())
+                connection.close()
+                # the new cache is not replaced by an old one again
+                open(legacy, 'wb').close()
+                self.assertFalse(DBConnector.move_legacy_db(new))
+
+    def test_rollback_on_error(self):
+        DBConnector.init_cash_db(Item())
+        with self.assertRaises(ValueError):
+            with DBConnector.SQLite() as cursor:
+                cursor.execute("INSERT INTO ITEMS(guid) VALUES('rollback-guid')")
+                raise ValueError('rollback')
+        with DBConnector.SQLite(write=False) as cursor:
+            self.assertIsNone(cursor.execute("select guid from ITEMS where guid = 'rollback-guid'").fetchone())
+
+    def test_read_while_writing(self):
+        feed = make_feed('Reader', [{'title': f'Read {num}', 'link': f'http://reader-test/{num}'} for num in range(3)])
+        DBConnector.init_cash_db(Item())
+        Parser('http://reader-test/').parse_feed(feed)
+        writer = DBConnector.connect()
+        writer.execute('BEGIN IMMEDIATE')
+        try:
+            # the cache is read and the known feed is parsed while another process writes
+            start = time.perf_counter()
+            DBConnector.init_cash_db(Item())
+            self.assertEqual(len(DBConnector.select_items_from_cash({'source': 'http://reader-test/'})), 3)
+            self.assertEqual(len(Parser('http://reader-test/').parse_feed(feed)), 3)
+            self.assertLess(time.perf_counter() - start, 5)
+        finally:
+            writer.rollback()
+            writer.close()
+
+    def test_concurrent_processes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        db_path = os.path.join(directory.name, 'hammer.db')
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(PROCESSES) as pool:
+            errors = pool.starmap(_hammer, [(db_path, worker) for worker in range(PROCESSES)])
+
+        self.assertEqual(sum(errors), 0)
+        connection = DBConnector.connect(db_path)
+        count = connection.execute('select count(*) from ITEMS').fetchone()[0]
+        connection.close()
+        self.assertEqual(count, PROCESSES * BATCHES * BATCH_SIZE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+from reader.db import DBConnector
+from reader.functions import Parser
+from reader.watch import Watcher, adapt_interval, backoff_interval, skip_hours_until, MIN_INTERVAL
+from tests.feed_server import FeedServer, make_feed
+
+# 2031-10-10 10:00:00 UTC
+NOW = 1949479200.0
+
+
+def feed(server, count):
+    items = [{'title': f'Watched {num}', 'link': server.url(f'/news/{num}')} for num in range(count)]
+    return make_feed('Watched', items,
+                     channel_extra='<ttl>30</ttl><skipHours><hour>10</hour><hour>11</hour></skipHours>')
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def test_adapt_interval(self):
+        self.assertEqual(adapt_interval(600, 3), 300)
+        self.assertEqual(adapt_interval(600, 0), 900)
+        self.assertEqual(adapt_interval(600, 3, ttl=30), 1800)
+        self.assertEqual(adapt_interval(60, 5), MIN_INTERVAL)
+
+    def test_backoff(self):
+        self.assertEqual([backoff_interval(60, failures) for failures in (1, 2, 3)], [120, 240, 480])
+        self.assertEqual(backoff_interval(60, 30), 24 * 60 * 60)
+
+    def test_skip_hours(self):
+        self.assertEqual(skip_hours_until(NOW + 60, [10, 11]), NOW + 2 * 3600)
+        self.assertEqual(skip_hours_until(NOW + 60, [9]), NOW + 60)
+
+
+class WatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.old_path = DBConnector.get_db_path()
+        DBConnector.set_db_path(os.path.join(self.directory.name, 'watch.db'))
+        self.now = NOW
+        self.watcher = Watcher(Parser(), clock=lambda: self.now)
+
+    def tearDown(self):
+        DBConnector.set_db_path(self.old_path)
+        self.directory.cleanup()
+
+    def test_poll(self):
+        with FeedServer() as server:
+            server.routes['/feed'] = {'body': feed(server, 2), 'headers': {'ETag': '"v1"'}}
+            server.routes['/broken'] = {'status': 500}
+            good, broken = server.url('/feed'), server.url('/broken')
+            self.watcher.add([good, broken])
+
+            self.watcher.run(once=True)
+            feeds = {row['url']: row for row in self.watcher.feeds()}
+            self.assertEqual(feeds[good]['last_new'], 2)
+            self.assertEqual(feeds[good]['ttl'], 30)
+            self.assertEqual(feeds[good]['skip_hours'], '10,11')
+            # the interval is at least the ttl and the skipped hours are jumped over
+            self.assertEqual(feeds[good]['poll_interval'], 1800)
+            self.assertEqual(feeds[good]['next_poll'], NOW + 2 * 3600)
+            self.assertIsNotNone(feeds[good]['last_latency'])
+            self.assertEqual(feeds[broken]['failures'], 1)
+            self.assertEqual(feeds[broken]['next_poll'], NOW + backoff_interval(None, 1))
+            self.assertEqual(self.watcher.due(), [])
+
+            # not modified: no new items, the etag is sent back, the interval grows
+            self.now = NOW + 24 * 3600
+            server.routes['/feed'] = lambda handler: {'status': 304} \
+                if handler.headers.get('If-None-Match') == '"v1"' else {'body': feed(server, 3)}
+            result = self.watcher.poll(self.watcher.due())
+            self.assertEqual(result[good], 0)
+            self.assertIn(('/feed', '"v1"'),
+                          [(path, headers.get('If-None-Match')) for path, headers in server.requests])
+            self.assertIsInstance(result[broken], Exception)
+            feeds = {row['url']: row for row in self.watcher.feeds()}
+            self.assertEqual(feeds[good]['poll_interval'], 2700)
+            self.assertEqual((feeds[good]['polls'], feeds[good]['new_items']), (2, 2))
+            self.assertEqual(feeds[broken]['failures'], 2)
+
+    def test_remove(self):
+        self.watcher.add(['http://example.com/Feed'])
+        self.assertEqual([row['url'] for row in self.watcher.feeds()], ['http://example.com/Feed'])
+        self.watcher.remove(['http://example.com/Feed'])
+        self.assertEqual(self.watcher.feeds(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import tracemalloc
+import unittest
+from io import BytesIO
+from reader.xmlstream import FeedStream, FeedFormatError, FeedVersionError, detect_encoding, charset_from_headers
+from tests.feed_server import make_feed
+
+
+ITEMS = [
+    {'title': 'First &amp; best', 'link': 'http://example.com/1', 'guid': 'guid-1',
+     'pubdate': 'Tue, 26 Oct 2021 12:02:57 +0300', 'categories': ['One', 'Two'],
+     'description': '<p>Text <a href="http://example.com/a">link</a></p>'},
+    {'title': 'Second', 'link': 'http://example.com/2'},
+]
+
+
+def _big_feed(count):
+    item = b'<item><title>Title</title><link>http://example.com/</link>' \
+           b'<description>' + b'x' * 1000 + b'</description></item>'
+    return BytesIO(b'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Big</title>'
+                   + item * count + b'</channel></rss>')
+
+
+class FeedStreamTest(unittest.TestCase):
+
+    def test_items(self):
+        feed = FeedStream(make_feed('Stream', ITEMS, language='ru'))
+        items = list(feed.items())
+        self.assertEqual(items[0], {
+            'language': 'ru', 'link': 'http://example.com/1', 'guid': 'guid-1', 'title': 'First & best',
+            'pubdate': 'Tue, 26 Oct 2021 12:02:57 +0300', 'category': ['One', 'Two'],
+            'html_description': '<p>Text <a href="http://example.com/a">link</a></p>',
+        })
+        self.assertEqual(items[1]['guid'], 'http://example.com/2')
+        self.assertEqual(items[1]['pubdate'], '')
+        self.assertEqual(feed.head['title'], 'Stream')
+
+    def test_namespaced_children(self):
+        xml = b'<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel><item>' \
+              b'<atom:link href="http://example.com/self"/><link>http://example.com/item</link>' \
+              b'</item></channel></rss>'
+        self.assertEqual(next(FeedStream(xml).items())['link'], 'http://example.com/item')
+
+    def test_encoding(self):
+        xml = '<rss version="2.0"><channel><item><title>Новости</title></item></channel></rss>'
+        items = list(FeedStream(xml.encode('cp1251'), 'windows-1251').items())
+        self.assertEqual(items[0]['title'], 'Новости')
+
+        declared = '<?xml version="1.0" encoding="windows-1251"?>' + xml
+        items = list(FeedStream(declared.encode('cp1251'), 'utf-8').items())
+        self.assertEqual(items[0]['title'], 'Новости')
+
+        self.assertIsNone(detect_encoding(b'<?xml version="1.0" encoding="utf-8"?><rss/>', 'cp1251'))
+        self.assertEqual(charset_from_headers({'Content-Type': 'text/xml; charset=UTF-8'}), 'UTF-8')
+
+    def test_raises(self):
+        with self.assertRaises(FeedFormatError):
+            list(FeedStream(b'<!DOCTYPE html><html><body>Not a feed</body></html>').items())
+        with self.assertRaises(FeedFormatError):
+            list(FeedStream(b'').items())
+        with self.assertRaises(FeedVersionError):
+            list(FeedStream(make_feed('Old', version='0.91')).items())
+
+    def test_bounded_memory(self):
+        peaks = []
+        for count in (1000, 10000):
+            stream = _big_feed(count)
+            tracemalloc.start()
+            self.assertEqual(sum(1 for _ in FeedStream(stream).items()), count)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1 +1,11 @@
+import atexit
+import os
+import shutil
+import tempfile
 
+# The tests work with their own cache database, not with the user one. It is removed at the exit,
+# the worker processes of the tests use the database of the main one
+if not os.environ.get('RSS_READER_DB'):
+    _directory = tempfile.mkdtemp(prefix='rss_reader_tests_')
+    atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+    os.environ['RSS_READER_DB'] = os.path.join(_directory, 'rss_cash.db')
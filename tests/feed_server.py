@@ -0,0 +1,79 @@
+""" Local HTTP server which serves fixture feeds for the tests """
+
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def make_feed(title='Test feed', items=(), language='en', version='2.0', channel_extra=''):
+    """The function builds RSS 2.0 XML from the list of dictionaries with item fields"""
+
+    body = ''
+    for item in items:
+        body += '<item>'
+        body += f'<title>{item.get("title", "")}</title>'
+        body += f'<link>{item.get("link", "")}</link>'
+        if item.get('guid'):
+            body += f'<guid>{item["guid"]}</guid>'
+        if item.get('pubdate'):
+            body += f'<pubDate>{item["pubdate"]}</pubDate>'
+        for category in item.get('categories', ()):
+            body += f'<category>{category}</category>'
+        if item.get('description'):
+            body += f'<description><![CDATA[{item["description"]}]]></description>'
+        body += '</item>'
+
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<rss version="{version}"><channel>'
+            f'<title>{title}</title><link>http://example.com/</link>'
+            f'<description>{title}</description><language>{language}</language>'
+            f'{channel_extra}{body}</channel></rss>').encode('utf-8')
+
+
+class FeedServer:
+    """Context manager which runs a threaded HTTP server on a free local port.
+
+    `routes` maps a path to a dictionary with `body`, and optionally `status`,
+    `headers` and `delay` (seconds to sleep before answering)."""
+
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.requests = []
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.server.server_port}{path}'
+
+    def __enter__(self):
+        feed_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                feed_server.requests.append((self.path, dict(self.headers)))
+                route = feed_server.routes.get(self.path)
+                if route is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if callable(route):
+                    route = route(self)
+                time.sleep(route.get('delay', 0))
+                body = route.get('body', b'')
+                self.send_response(route.get('status', 200))
+                for key, value in route.get('headers', {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.server.shutdown()
+        self.server.server_close()